@@ -0,0 +1,102 @@
+"""Compara el bucle escalar de algoritmos con la evaluación vectorizada.
+
+Comprueba además que ambas versiones producen exactamente los mismos
+resultados (con la misma semilla de ``random`` para las alertas inesperadas).
+
+Ejecutar desde ``greenhouse_system/``:
+    python3 benchmarks/bench_algoritmos.py
+"""
+from __future__ import annotations
+
+import random
+import sys
+import timeit
+from pathlib import Path
+
+
+def _asegurar_paquete() -> None:
+    """Garantiza que el paquete ``greenhouse_system`` sea importable."""
+    if "greenhouse_system" in sys.modules:
+        return
+    try:
+        import greenhouse_system  # type: ignore # noqa:F401
+    except ModuleNotFoundError:
+        raiz = str(Path(__file__).resolve().parents[2])
+        if raiz not in sys.path:
+            sys.path.insert(0, raiz)
+
+
+_asegurar_paquete()
+
+from greenhouse_system.middleware import algoritmos_vectorizados, middleware_servidor  # noqa:E402
+
+
+def construir_entradas(zonas: int, especies: int, semilla: int = 7):
+    rnd = random.Random(semilla)
+    clima = {
+        f"Zona_{i}": {
+            "Temperatura": round(22 + rnd.uniform(-3, 3), rnd.choice((1, 2, 3))),
+            "Humedad": round(65 + rnd.uniform(-45, 25), 2),
+            "CO2": round(450 + rnd.uniform(-70, 70), 2),
+            "IntensidadLuz": rnd.choice((800.0, 45.0, round(rnd.uniform(0, 1200), 1))),
+        }
+        for i in range(zonas)
+    }
+    plantas = {
+        f"Especie_{i}": {
+            "Crecimiento": round(rnd.uniform(5, 15), 2),
+            "CantidadFrutos": rnd.randint(0, 40),
+            "CalidadFrutos": round(rnd.uniform(60, 100), 2),
+            "NivelSalud": round(rnd.uniform(70, 100), 2),
+        }
+        for i in range(especies)
+    }
+    riego = {"pH": 6.02, "Conductividad": 1.51, "Flujo": 2.13, "NivelDeposito": 8.4}
+    return clima, plantas, riego
+
+
+def escalar(clima, plantas, riego, hora):
+    # Fuerza el bucle escalar par a par del servidor: sin umbral y sin la
+    # evaluación incremental, cuya caché seguiría caliente entre repeticiones.
+    umbral = middleware_servidor.UMBRAL_VECTORIZADO
+    incremental = middleware_servidor.EVALUACION_INCREMENTAL
+    middleware_servidor.UMBRAL_VECTORIZADO = float("inf")
+    middleware_servidor.EVALUACION_INCREMENTAL = False
+    try:
+        return middleware_servidor.evaluar_pares(clima, plantas, riego, hora)
+    finally:
+        middleware_servidor.UMBRAL_VECTORIZADO = umbral
+        middleware_servidor.EVALUACION_INCREMENTAL = incremental
+
+
+def comprobar(zonas: int, especies: int) -> None:
+    for hora in (3, 12):
+        for riego_presente in (True, False):
+            clima, plantas, riego = construir_entradas(zonas, especies, semilla=zonas * 31 + hora)
+            riego = riego if riego_presente else None
+            random.seed(1234)
+            esperado = escalar(clima, plantas, riego, hora)
+            random.seed(1234)
+            obtenido = algoritmos_vectorizados.evaluar_pares(clima, plantas, riego, hora)
+            assert obtenido == esperado, f"Diferencias con {zonas}x{especies}, hora {hora}"
+
+
+def main() -> None:
+    print(f"{'pares':>8}{'escalar ms':>14}{'numpy ms':>12}{'aceleración':>14}")
+    # 36 y 64 pares rodean el punto de corte (``UMBRAL_VECTORIZADO``).
+    tamanos = ((2, 2, 2_000), (6, 6, 1_000), (8, 8, 500), (12, 12, 200), (50, 50, 20), (200, 200, 3))
+    for zonas, especies, repeticiones in tamanos:
+        comprobar(zonas, especies)
+        clima, plantas, riego = construir_entradas(zonas, especies)
+        t_esc = timeit.timeit(lambda: escalar(clima, plantas, riego, 12), number=repeticiones)
+        t_vec = timeit.timeit(
+            lambda: algoritmos_vectorizados.evaluar_pares(clima, plantas, riego, 12), number=repeticiones
+        )
+        print(
+            f"{zonas * especies:>8}{t_esc / repeticiones * 1e3:>14.3f}"
+            f"{t_vec / repeticiones * 1e3:>12.3f}{t_esc / t_vec:>13.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compara bytes en el cable y coste de CPU de las codificaciones del payload.
+
+Ejecutar desde ``greenhouse_system/``:
+    python3 benchmarks/bench_codificacion.py
+"""
+from __future__ import annotations
+
+import random
+import sys
+import timeit
+from pathlib import Path
+
+
+def _asegurar_paquete() -> None:
+    """Garantiza que el paquete ``greenhouse_system`` sea importable."""
+    if "greenhouse_system" in sys.modules:
+        return
+    try:
+        import greenhouse_system  # type: ignore # noqa:F401
+    except ModuleNotFoundError:
+        raiz = str(Path(__file__).resolve().parents[2])
+        if raiz not in sys.path:
+            sys.path.insert(0, raiz)
+
+
+_asegurar_paquete()
+
+from greenhouse_system.middleware import codificacion  # noqa:E402
+
+VARIANTES = (
+    ("json", None),
+    ("json", "zlib"),
+    ("esquema", None),
+    ("esquema", "zlib"),
+)
+
+
+def construir_payload(zonas: int, especies: int) -> dict:
+    """Payload con la misma forma que el que genera ``middleware_cliente``."""
+    rnd = random.Random(42)
+    clima = {
+        f"Zona_{i}": {
+            "Temperatura": round(22 + rnd.uniform(-2.5, 2.5), 2),
+            "Humedad": round(65 + rnd.uniform(-8, 8), 2),
+            "CO2": round(450 + rnd.uniform(-55, 55), 2),
+            "IntensidadLuz": 800.0,
+            "Presion": round(1013 + rnd.uniform(-5, 5), 2),
+        }
+        for i in range(zonas)
+    }
+    plantas = {
+        f"Especie_{i}": {
+            "Crecimiento": round(rnd.uniform(5, 15), 2),
+            "CantidadFrutos": rnd.randint(0, 40),
+            "CalidadFrutos": round(rnd.uniform(60, 100), 2),
+            "EspeciePlanta": f"Especie_{i}",
+            "NivelSalud": round(rnd.uniform(70, 100), 2),
+        }
+        for i in range(especies)
+    }
+    riego = {
+        "Riego": {
+            "pH": 6.02,
+            "Conductividad": 1.51,
+            "Flujo": 2.13,
+            "NivelDeposito": 78.4,
+            "CaudalHistorico": 1.52,
+        }
+    }
+    return {"clima": clima, "plantas": plantas, "riego": riego, "timestamp": "2025-11-25T16:28:13.512345"}
+
+
+def medir(payload: dict, repeticiones: int) -> None:
+    print(f"{'formato':<16}{'bytes':>10}{'codificar µs':>16}{'decodificar µs':>16}")
+    for formato, compresion in VARIANTES:
+        datos = codificacion.codificar(payload, formato, compresion)
+        assert codificacion.decodificar(datos) == payload
+        t_cod = timeit.timeit(lambda: codificacion.codificar(payload, formato, compresion), number=repeticiones)
+        t_dec = timeit.timeit(lambda: codificacion.decodificar(datos), number=repeticiones)
+        nombre = formato + (f"+{compresion}" if compresion else "")
+        print(
+            f"{nombre:<16}{len(datos):>10}"
+            f"{t_cod / repeticiones * 1e6:>16.1f}{t_dec / repeticiones * 1e6:>16.1f}"
+        )
+
+
+def main() -> None:
+    for zonas, especies, repeticiones in ((2, 2, 20_000), (20, 20, 2_000), (200, 200, 200)):
+        print(f"\n=== {zonas} zonas x {especies} especies ===")
+        medir(construir_payload(zonas, especies), repeticiones)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Tiempo de construcción de las gráficas de series del dashboard.
+
+Compara el camino anterior (filas normalizadas a cadenas ISO, ``_parse_time``
+y ``_safe_float`` por celda y ordenación en Python) con el actual (columnas
+con ``datetime`` nativos ordenadas en SQL y convertidas a arrays de NumPy).
+Para cada tamaño se mide la preparación de columnas, la creación de la figura
+y su serialización a JSON (lo que Dash envía al navegador). No necesita
+MySQL: las filas se generan como las devolvería el conector.
+
+Ejecutar desde ``greenhouse_system/``:
+    python3 benchmarks/bench_graficas.py --filas 50 5000 500000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+def _asegurar_paquete() -> None:
+    """Garantiza que el paquete ``greenhouse_system`` sea importable."""
+    if "greenhouse_system" in sys.modules:
+        return
+    try:
+        import greenhouse_system  # type: ignore # noqa:F401
+    except ModuleNotFoundError:
+        raiz = str(Path(__file__).resolve().parents[2])
+        if raiz not in sys.path:
+            sys.path.insert(0, raiz)
+
+
+_asegurar_paquete()
+
+import plotly.graph_objects as go  # noqa:E402
+import plotly.io as pio  # noqa:E402
+
+from greenhouse_system.dashboard import callbacks  # noqa:E402
+from greenhouse_system.database.database_setup import DataFetcher  # noqa:E402
+
+COLUMNAS = ("id", "zona", "temperatura", "humedad", "co2", "intensidad_luz", "presion", "timestamp")
+
+
+class _Cursor:
+    """Cursor de tuplas mínimo con las filas ya generadas."""
+
+    description = [(nombre,) for nombre in COLUMNAS]
+
+    def __init__(self, filas):
+        self._filas = filas
+
+    def execute(self, query, params=()):
+        pass
+
+    def fetchall(self):
+        return self._filas
+
+
+def generar_filas(total: int, semilla: int = 11):
+    rnd = random.Random(semilla)
+    inicio = datetime(2024, 1, 1)
+    return [
+        (
+            indice,
+            "Zona_A" if indice % 2 else "Zona_B",
+            22 + rnd.uniform(-3, 3),
+            65 + rnd.uniform(-20, 20),
+            None if indice % 97 == 0 else 450 + rnd.uniform(-70, 70),
+            rnd.uniform(0, 1200),
+            1013 + rnd.uniform(-5, 5),
+            inicio + timedelta(seconds=2 * indice),
+        )
+        for indice in range(total)
+    ]
+
+
+def construir_antes(filas) -> go.Figure:
+    """Camino previo: filas de diccionarios con fechas ISO y conversión por celda."""
+    fetcher = DataFetcher()
+    normalizadas = [fetcher._normalise_row(dict(zip(COLUMNAS, fila))) for fila in reversed(filas)]
+    filas_orden = list(reversed(normalizadas))
+    columnas = {clave: [fila.get(clave) for fila in filas_orden] for clave in COLUMNAS}
+    metricas, etiquetas, colores, titulo = callbacks.CLIMA_CHART
+    figura = go.Figure()
+    parseadas = [callbacks._parse_time(valor) for valor in columnas.get("timestamp", [])]
+    orden = sorted((i for i, valor in enumerate(parseadas) if valor), key=lambda i: parseadas[i])
+    tiempos = [callbacks._parse_time(columnas["timestamp"][i]) for i in orden]
+    for metrica, etiqueta, color in zip(metricas, etiquetas, colores):
+        valores = [callbacks._safe_float(columnas[metrica][i]) for i in orden]
+        figura.add_trace(
+            go.Scatter(x=tiempos, y=valores, name=etiqueta, mode="lines+markers", line=dict(color=color, width=2))
+        )
+    figura.update_layout(
+        title=titulo,
+        margin=dict(l=10, r=10, t=40, b=40),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        height=300,
+        xaxis_title="Tiempo",
+    )
+    return figura
+
+
+def construir_ahora(filas) -> go.Figure:
+    """Camino actual: columnas nativas (``_fetch_columns``) y arrays de NumPy."""
+    columnas = DataFetcher._fetch_columns(_Cursor(filas), "SELECT ...")
+    return callbacks._build_line_chart(columnas, *callbacks.CLIMA_CHART)
+
+
+def medir(construir, filas, repeticiones: int):
+    mejor_construccion = mejor_total = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        figura = construir(filas)
+        construido = time.perf_counter()
+        pio.to_json(figura)
+        fin = time.perf_counter()
+        mejor_construccion = min(mejor_construccion, construido - inicio)
+        mejor_total = min(mejor_total, fin - inicio)
+    return mejor_construccion, mejor_total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, nargs="+", default=[50, 5_000, 500_000])
+    args = parser.parse_args()
+
+    print(f"{'filas':>9}{'antes ms':>12}{'+json ms':>12}{'ahora ms':>12}{'+json ms':>12}{'aceleración':>14}")
+    for total in args.filas:
+        filas = generar_filas(total)
+        repeticiones = max(1, min(50, 50_000 // total))
+        antes, antes_json = medir(construir_antes, filas, repeticiones)
+        ahora, ahora_json = medir(construir_ahora, filas, repeticiones)
+        print(
+            f"{total:>9}{antes * 1e3:>12.2f}{antes_json * 1e3:>12.2f}"
+            f"{ahora * 1e3:>12.2f}{ahora_json * 1e3:>12.2f}{antes_json / ahora_json:>13.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Latencia de las consultas habituales con y sin los índices de ``INDICES``.
+
+Crea una base de datos aparte (``greenhouse_bench``), la llena con datos
+sintéticos repartidos en los últimos 30 días y mide cada consulta primero sin
+índices secundarios y después tras ``crear_indices``. Necesita un MySQL
+accesible con la configuración de ``database_setup.CONFIG``.
+
+Ejecutar desde ``greenhouse_system/``:
+    python3 benchmarks/bench_indices.py --filas 1000000 10000000
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+
+def _asegurar_paquete() -> None:
+    """Garantiza que el paquete ``greenhouse_system`` sea importable."""
+    if "greenhouse_system" in sys.modules:
+        return
+    try:
+        import greenhouse_system  # type: ignore # noqa:F401
+    except ModuleNotFoundError:
+        raiz = str(Path(__file__).resolve().parents[2])
+        if raiz not in sys.path:
+            sys.path.insert(0, raiz)
+
+
+_asegurar_paquete()
+
+import mysql.connector  # noqa:E402
+
+from greenhouse_system.database import database_setup  # noqa:E402
+
+BASE_BENCH = "greenhouse_bench"
+TABLAS = ("clima_data", "alertas_criticas")
+# Filas iniciales que se duplican con INSERT ... SELECT hasta llegar al total.
+SEMILLA = 1000
+
+CONSULTAS = {
+    "último clima": "SELECT * FROM clima_data ORDER BY timestamp DESC LIMIT 1",
+    "clima reciente (50)": "SELECT * FROM clima_data ORDER BY timestamp DESC LIMIT 50",
+    "clima de una zona (50)": (
+        "SELECT * FROM clima_data WHERE zona = 'Zona_A' ORDER BY timestamp DESC LIMIT 50"
+    ),
+    "informe clima 24 h": (
+        "SELECT zona, temperatura, humedad, co2, intensidad_luz, presion "
+        "FROM clima_data WHERE timestamp >= NOW() - INTERVAL 1 DAY"
+    ),
+    "alertas 24 h": (
+        "SELECT zona, especie, tipo_alerta, timestamp FROM alertas_criticas "
+        "WHERE timestamp >= NOW() - INTERVAL 1 DAY ORDER BY timestamp ASC"
+    ),
+}
+
+
+def conectar():
+    config = dict(database_setup.CONFIG)
+    config.pop("database")
+    return mysql.connector.connect(**config, autocommit=True)
+
+
+def preparar(cursor, filas: int) -> None:
+    """Recrea las tablas del benchmark sin índices y las llena con ``filas`` filas."""
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {BASE_BENCH}")
+    cursor.execute(f"USE {BASE_BENCH}")
+    for tabla in TABLAS:
+        cursor.execute(f"DROP TABLE IF EXISTS {tabla}")
+        cursor.execute(database_setup.TABLES[tabla])
+
+    aleatorio = "NOW() - INTERVAL FLOOR(RAND() * 30 * 86400) SECOND"
+    cursor.execute(
+        "INSERT INTO clima_data (zona, temperatura, humedad, co2, intensidad_luz, presion, timestamp) "
+        f"WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {SEMILLA}) "
+        "SELECT CONCAT('Zona_', ELT(1 + i % 4, 'A', 'B', 'C', 'D')), 22 + RAND() * 4, 65 + RAND() * 10, "
+        f"450 + RAND() * 50, 800, 1013, {aleatorio} FROM n"
+    )
+    cursor.execute(
+        "INSERT INTO alertas_criticas (zona, especie, tipo_alerta, timestamp) "
+        f"WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {SEMILLA}) "
+        "SELECT CONCAT('Zona_', ELT(1 + i % 4, 'A', 'B', 'C', 'D')), "
+        f"ELT(1 + i % 2, 'Tomates', 'Pimientos'), 'Temperatura fuera de rango', {aleatorio} FROM n"
+    )
+    for tabla, columnas in (
+        ("clima_data", "zona, temperatura, humedad, co2, intensidad_luz, presion"),
+        ("alertas_criticas", "zona, especie, tipo_alerta"),
+    ):
+        actuales = SEMILLA
+        while actuales < filas:
+            lote = min(actuales, filas - actuales)
+            cursor.execute(
+                f"INSERT INTO {tabla} ({columnas}, timestamp) "
+                f"SELECT {columnas}, {aleatorio} FROM {tabla} LIMIT {lote}"
+            )
+            actuales += lote
+        cursor.execute(f"ANALYZE TABLE {tabla}")
+        cursor.fetchall()
+
+
+def medir(cursor, repeticiones: int) -> dict:
+    tiempos = {}
+    for nombre, consulta in CONSULTAS.items():
+        muestras = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            cursor.execute(consulta)
+            cursor.fetchall()
+            muestras.append(time.perf_counter() - inicio)
+        tiempos[nombre] = statistics.median(muestras) * 1e3
+    return tiempos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    cnx = conectar()
+    cursor = cnx.cursor()
+    try:
+        for filas in args.filas:
+            print(f"\n=== {filas:,} filas por tabla ===")
+            preparar(cursor, filas)
+            sin_indices = medir(cursor, args.repeticiones)
+            database_setup.crear_indices(cursor, BASE_BENCH, TABLAS)
+            con_indices = medir(cursor, args.repeticiones)
+            print(f"{'consulta':<26}{'sin índices ms':>16}{'con índices ms':>16}")
+            for nombre in CONSULTAS:
+                print(f"{nombre:<26}{sin_indices[nombre]:>16.1f}{con_indices[nombre]:>16.1f}")
+    finally:
+        cursor.execute(f"DROP DATABASE IF EXISTS {BASE_BENCH}")
+        cursor.close()
+        cnx.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Rendimiento de los callbacks del dashboard según el número de workers.
+
+Arranca el dashboard con gunicorn (``clientes/gunicorn.conf.py``) con 1, 2, 4...
+workers y lanza contra él varios procesos cliente que llaman sin pausa al
+callback de tiempo real (el que refrescan todos los navegadores cada pocos
+segundos) durante un tiempo fijo. Para cada configuración imprime peticiones
+por segundo y latencias p50/p95.
+
+Necesita MySQL con datos (como el middleware en ejecución); sin base de datos
+se mide solo el coste de Dash y de la caché con respuestas de error.
+
+Ejecutar desde ``greenhouse_system/``:
+    python3 benchmarks/bench_workers.py --workers 1 2 4 --clientes 16 --duracion 10
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+HOST = "127.0.0.1"
+
+
+def _peticion(port: int, metodo: str, ruta: str, cuerpo: bytes | None = None) -> Tuple[int, bytes]:
+    conexion = http.client.HTTPConnection(HOST, port, timeout=10)
+    try:
+        cabeceras = {"Content-Type": "application/json"} if cuerpo else {}
+        conexion.request(metodo, ruta, body=cuerpo, headers=cabeceras)
+        respuesta = conexion.getresponse()
+        return respuesta.status, respuesta.read()
+    finally:
+        conexion.close()
+
+
+def esperar_servidor(port: int, limite: float = 30.0) -> None:
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        try:
+            if _peticion(port, "GET", "/_dash-layout")[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"El dashboard no respondió en el puerto {port}")
+
+
+def cuerpo_tiempo_real(port: int) -> bytes:
+    """Construye la petición del callback de tiempo real a partir de ``/_dash-dependencies``."""
+    _, datos = _peticion(port, "GET", "/_dash-dependencies")
+    for dependencia in json.loads(datos):
+        if "kpi-container.children" in dependencia["output"]:
+            salidas = [
+                {"id": salida.split(".")[0], "property": salida.split(".")[1]}
+                for salida in dependencia["output"].strip(".").split("...")
+            ]
+            entradas = [{"id": e["id"], "property": e["property"], "value": None} for e in dependencia["inputs"]]
+            entradas[0]["value"] = 1  # n_intervals
+            return json.dumps(
+                {
+                    "output": dependencia["output"],
+                    "outputs": salidas,
+                    "inputs": entradas,
+                    "state": [],
+                    "changedPropIds": [f"{entradas[0]['id']}.n_intervals"],
+                }
+            ).encode("utf-8")
+    raise RuntimeError("No se encontró el callback de tiempo real")
+
+
+def _cliente(port: int, cuerpo: bytes, duracion: float, resultados) -> None:
+    """Proceso cliente: una conexión keep-alive y peticiones en bucle."""
+    latencias: List[float] = []
+    errores = 0
+    conexion = http.client.HTTPConnection(HOST, port, timeout=30)
+    cabeceras = {"Content-Type": "application/json"}
+    fin = time.monotonic() + duracion
+    while time.monotonic() < fin:
+        inicio = time.perf_counter()
+        try:
+            conexion.request("POST", "/_dash-update-component", body=cuerpo, headers=cabeceras)
+            respuesta = conexion.getresponse()
+            respuesta.read()
+            if respuesta.status != 200:
+                errores += 1
+        except (OSError, http.client.HTTPException):
+            errores += 1
+            conexion.close()
+            conexion = http.client.HTTPConnection(HOST, port, timeout=30)
+            continue
+        latencias.append(time.perf_counter() - inicio)
+    conexion.close()
+    resultados.put((latencias, errores))
+
+
+def medir(workers: int, clientes: int, duracion: float, port: int, threads: int) -> Dict[str, float]:
+    entorno = dict(os.environ)
+    cache_dir = tempfile.mkdtemp(prefix="greenhouse_cache_")
+    entorno["GREENHOUSE_CACHE_DIR"] = cache_dir
+    servidor = subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn",
+            "-c", "clientes/gunicorn.conf.py",
+            "-w", str(workers),
+            "--threads", str(threads),
+            "-b", f"{HOST}:{port}",
+            "--log-level", "warning",
+            "clientes.wsgi:application",
+        ],
+        cwd=BASE_DIR,
+        env=entorno,
+    )
+    try:
+        esperar_servidor(port)
+        cuerpo = cuerpo_tiempo_real(port)
+        # Calentamiento: cada worker importa Dash y abre su pool al recibir peticiones.
+        for _ in range(workers * 4):
+            _peticion(port, "POST", "/_dash-update-component", cuerpo)
+
+        resultados: multiprocessing.Queue = multiprocessing.Queue()
+        procesos = [
+            multiprocessing.Process(target=_cliente, args=(port, cuerpo, duracion, resultados))
+            for _ in range(clientes)
+        ]
+        for proceso in procesos:
+            proceso.start()
+        latencias: List[float] = []
+        errores = 0
+        for _ in procesos:
+            parciales, fallos = resultados.get()
+            latencias.extend(parciales)
+            errores += fallos
+        for proceso in procesos:
+            proceso.join()
+    finally:
+        servidor.terminate()
+        servidor.wait(timeout=15)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    latencias.sort()
+    return {
+        "rps": len(latencias) / duracion,
+        "p50": statistics.median(latencias) * 1e3 if latencias else float("nan"),
+        "p95": latencias[int(len(latencias) * 0.95)] * 1e3 if latencias else float("nan"),
+        "errores": errores,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clientes", type=int, default=16, help="procesos cliente concurrentes")
+    parser.add_argument("--duracion", type=float, default=10.0, help="segundos de carga por configuración")
+    parser.add_argument("--threads", type=int, default=4, help="hilos por worker")
+    parser.add_argument("--port", type=int, default=8060)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8}{'peticiones/s':>15}{'p50 ms':>10}{'p95 ms':>10}{'errores':>10}{'escala':>9}")
+    base = None
+    for workers in args.workers:
+        r = medir(workers, args.clientes, args.duracion, args.port, args.threads)
+        base = base or r["rps"]
+        print(
+            f"{workers:>8}{r['rps']:>15.1f}{r['p50']:>10.1f}{r['p95']:>10.1f}"
+            f"{r['errores']:>10}{r['rps'] / base:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
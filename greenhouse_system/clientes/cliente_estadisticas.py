@@ -6,7 +6,7 @@ Ejecutar desde la terminal:
 from __future__ import annotations
 
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Callable, Dict, Iterable, List, Optional
 
@@ -40,6 +40,7 @@ def _asegurar_paquete() -> None:
 
 _asegurar_paquete()
 
+from greenhouse_system.database import rollups  # noqa:E402
 from greenhouse_system.middleware import database_handler  # noqa:E402
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -266,6 +267,67 @@ def obtener_datos_tabla(tabla: str, dias: int) -> pd.DataFrame:
     return df
 
 
+def consultar_rollups(query: str, params: tuple) -> List[Dict[str, object]]:
+    """Consulta la tabla ``rollups``; lista vacía si no existe o no responde."""
+    conexion = conectar_bd()
+    if conexion is None:
+        return []
+    try:
+        cursor = conexion.cursor(dictionary=True)
+        cursor.execute(query, params)
+        filas = cursor.fetchall()
+        cursor.close()
+        return filas
+    except mysql.connector.Error:
+        return []
+    finally:
+        conexion.close()
+
+
+def obtener_resumen_rollups(tabla: str, dias: int) -> Dict[str, Dict[str, float]]:
+    """Media, extremos y desviación de cada variable de una tabla según los rollups."""
+    conexion = conectar_bd()
+    if conexion is None:
+        return {}
+    try:
+        cursor = conexion.cursor()
+        try:
+            return rollups.resumir(cursor, tabla, datetime.now() - timedelta(days=dias))
+        finally:
+            cursor.close()
+    except mysql.connector.Error:
+        return {}
+    finally:
+        conexion.close()
+
+
+def obtener_medias_diarias(tabla: str, dias: int) -> pd.DataFrame:
+    """Promedio diario de cada variable numérica de una tabla, indexado por día.
+
+    Se lee de los rollups diarios. Si no los hay (base de datos sin la tabla
+    ``rollups`` o sin reconstruir) se calcula sobre los registros crudos.
+    """
+    filas = consultar_rollups(
+        "SELECT bucket AS timestamp, variable, SUM(suma) / SUM(n) AS media FROM rollups "
+        "WHERE granularidad = 'dia' AND tabla = %s AND bucket >= CURDATE() - INTERVAL %s DAY "
+        "GROUP BY bucket, variable",
+        (tabla, dias),
+    )
+    if filas:
+        df = pd.DataFrame(filas)
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        diario = df.pivot(index="timestamp", columns="variable", values="media").astype(float)
+        diario = diario[[col for col in rollups.ESQUEMA[tabla][2] if col in diario.columns]]
+        diario.columns.name = None
+        return diario.sort_index().asfreq("D")
+
+    df = obtener_datos_tabla(tabla, dias)
+    if df.empty:
+        return pd.DataFrame()
+    diario = df.set_index("timestamp").sort_index().resample("D").mean(numeric_only=True)
+    return diario.drop(columns=["id"], errors="ignore")
+
+
 def obtener_series_variable(variable: str, dias: int) -> pd.DataFrame:
     """Recupera una serie temporal para una variable concreta."""
     tabla = VARIABLES_DISPONIBLES[variable]
@@ -282,18 +344,30 @@ def estadisticas_basicas() -> None:
     mostrar_progreso("Consultando datos para estadísticas básicas")
 
     tablas = ["clima_data", "riego_data", "plantas_data"]
+    filas = []
     registros: List[pd.DataFrame] = []
     for tabla in tablas:
+        resumen = obtener_resumen_rollups(tabla, dias)
+        if resumen:
+            for variable, valores in resumen.items():
+                filas.append({
+                    "tabla": tabla,
+                    "variable": variable,
+                    "media": valores["media"],
+                    "maximo": valores["maximo"],
+                    "minimo": valores["minimo"],
+                    "desviacion": valores["desviacion"] if valores["n"] > 1 else 0.0,
+                })
+            continue
         df = obtener_datos_tabla(tabla, dias)
         if not df.empty:
             df["tabla"] = tabla
             registros.append(df)
 
-    if not registros:
+    if not registros and not filas:
         print("⚠️ No se encontraron datos en el período solicitado.")
         return
 
-    filas = []
     for df in registros:
         tabla = df["tabla"].iloc[0]
         numeric = df.select_dtypes(include="number").drop(columns=["id"], errors="ignore")
@@ -337,13 +411,12 @@ def tendencias_temporales() -> None:
     tipo = obtener_tipo_grafico()
 
     mostrar_progreso(f"Generando tendencia para {variable}")
-    serie = obtener_series_variable(variable, dias)
-    if serie.empty:
+    medias = obtener_medias_diarias(VARIABLES_DISPONIBLES[variable], dias)
+    if variable not in medias.columns:
         print("⚠️ No hay datos disponibles para la variable en el período seleccionado.")
         return
 
-    serie.set_index("timestamp", inplace=True)
-    diaria = serie.resample("D").mean().dropna()
+    diaria = medias[[variable]].dropna()
     if diaria.empty:
         print("⚠️ Los datos disponibles no permiten generar la tendencia solicitada.")
         return
@@ -381,12 +454,10 @@ def heatmap_correlaciones() -> None:
 
     combinado: Optional[pd.DataFrame] = None
     for tabla, columnas in tablas.items():
-        df = obtener_datos_tabla(tabla, dias)
-        if df.empty:
+        diario = obtener_medias_diarias(tabla, dias)
+        if diario.empty:
             continue
-        df = df.set_index("timestamp").sort_index()
-        diario = df.resample("D").mean().drop(columns=["id"], errors="ignore")
-        diario = diario[columnas].dropna(how="all")
+        diario = diario.reindex(columns=columnas).dropna(how="all")
         if diario.empty:
             continue
         if combinado is None:
@@ -452,12 +523,15 @@ def comparativa_variables() -> None:
     mostrar_progreso("Generando comparativa normalizada")
 
     combinado: Optional[pd.DataFrame] = None
+    medias: Dict[str, pd.DataFrame] = {}
     for variable in variables:
-        serie = obtener_series_variable(variable, dias)
-        if serie.empty:
+        tabla = VARIABLES_DISPONIBLES[variable]
+        if tabla not in medias:
+            medias[tabla] = obtener_medias_diarias(tabla, dias)
+        if variable not in medias[tabla].columns or medias[tabla][variable].dropna().empty:
             print(f"⚠️ Sin datos para {variable}, se omitirá.")
             continue
-        serie = serie.set_index("timestamp").resample("D").mean().rename(columns={variable: variable})
+        serie = medias[tabla][[variable]]
         if combinado is None:
             combinado = serie
         else:
@@ -495,10 +569,9 @@ def tabla_resumen_diario() -> None:
     resumen: Optional[pd.DataFrame] = None
     tablas = ["clima_data", "riego_data", "plantas_data"]
     for tabla in tablas:
-        df = obtener_datos_tabla(tabla, dias)
-        if df.empty:
+        diario = obtener_medias_diarias(tabla, dias)
+        if diario.empty:
             continue
-        diario = df.set_index("timestamp").resample("D").mean().drop(columns=["id"], errors="ignore")
         diario.columns = [f"{tabla}_{col}" for col in diario.columns]
         if resumen is None:
             resumen = diario
@@ -577,8 +650,7 @@ def analisis_riego() -> None:
     decorar_figura(fig_scatter, "Relación pH - Conductividad")
     guardar_figura(fig_scatter, "ph_conductividad", [f"{dias}dias"])
 
-    df.set_index("timestamp", inplace=True)
-    diario = df[["nivel_deposito", "flujo"]].resample("D").mean()
+    diario = obtener_medias_diarias("riego_data", dias).reindex(columns=["nivel_deposito", "flujo"])
     fig_nivel, ax_nivel = plt.subplots(figsize=(11, 5))
     ax_nivel.plot(diario.index, diario["nivel_deposito"], color=COLORES.get("nivel_deposito", "#2EC4B6"), marker="o")
     ax_nivel.set_xlabel("Fecha")
@@ -596,13 +668,12 @@ def evolucion_plantas() -> None:
     dias = obtener_entero("¿Número de días para analizar crecimiento?", default=60)
     mostrar_progreso("Recopilando datos de crecimiento y salud")
 
-    plantas = obtener_datos_tabla("plantas_data", dias)
+    plantas = obtener_medias_diarias("plantas_data", dias)
     if plantas.empty:
         print("⚠️ No hay datos de plantas en el rango solicitado.")
         return
 
-    plantas.set_index("timestamp", inplace=True)
-    diario_plantas = plantas[["crecimiento", "nivel_salud", "calidad_frutos"]].resample("D").mean()
+    diario_plantas = plantas.reindex(columns=["crecimiento", "nivel_salud", "calidad_frutos"])
 
     fig_crecimiento, ax_crecimiento = plt.subplots(figsize=(11, 5))
     ax_crecimiento.plot(diario_plantas.index, diario_plantas["crecimiento"], color=COLORES.get("crecimiento", "#45B7D1"), marker="o")
@@ -612,10 +683,9 @@ def evolucion_plantas() -> None:
     decorar_figura(fig_crecimiento, "Evolución del crecimiento de plantas")
     guardar_figura(fig_crecimiento, "crecimiento_plantas", [f"{dias}dias"])
 
-    clima = obtener_datos_tabla("clima_data", dias)
+    clima = obtener_medias_diarias("clima_data", dias)
     if not clima.empty:
-        clima.set_index("timestamp", inplace=True)
-        diario_clima = clima[["temperatura", "humedad"]].resample("D").mean()
+        diario_clima = clima.reindex(columns=["temperatura", "humedad"])
         combinado = diario_plantas.join(diario_clima, how="inner").dropna()
         fig_salud, ax_salud = plt.subplots(figsize=(9, 6))
         scatter = ax_salud.scatter(
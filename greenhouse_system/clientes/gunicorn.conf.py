@@ -0,0 +1,49 @@
+"""Configuración de gunicorn para servir el dashboard con varios workers.
+
+Cada worker es un proceso independiente que importa la aplicación después del
+``fork`` (``preload_app = False``), de modo que crea su propio pool de
+conexiones MySQL, su propia caché y su propia suscripción a los eventos del
+middleware. Lo que sí se comparte entre workers:
+
+- La caché de consultas, en disco (``GREENHOUSE_CACHE_DIR``, privado del
+  usuario): cada CACHE_TTL segundos solo un worker consulta MySQL y el resto
+  lee su resultado.
+- La generación de informes, serializada con un bloqueo de fichero en el
+  directorio de informes (ver ``informes/latex_generator.py``).
+
+Los workers son de hilos (``gthread``): cada navegador mantiene abierta una
+conexión SSE en ``/eventos`` que ocupa un hilo mientras dura. Cada worker
+admite como mucho ``threads // 2`` conexiones SSE (``GREENHOUSE_SSE_MAX``) para
+no quedarse sin hilos para los callbacks; a partir de ahí los navegadores
+usan el sondeo periódico. Con más navegadores en push, subir ``threads`` o
+``workers`` (``workers * threads // 2`` conexiones SSE en total).
+
+Cualquier valor se puede sobrescribir en la línea de órdenes (``-w 4``,
+``-b 0.0.0.0:8050``...) o con variables de entorno ``GREENHOUSE_*``.
+"""
+import multiprocessing
+import os
+import tempfile
+
+bind = os.environ.get("GREENHOUSE_BIND", "127.0.0.1:8050")
+workers = int(os.environ.get("GREENHOUSE_WORKERS", min(4, multiprocessing.cpu_count())))
+worker_class = "gthread"
+threads = int(os.environ.get("GREENHOUSE_THREADS", 8))
+preload_app = False
+
+# Un informe con pdflatex puede tardar más que el límite por defecto (30 s).
+timeout = 120
+graceful_timeout = 10
+keepalive = 5
+
+# Un directorio por usuario: la caché lo crea con permisos 0700 y no lo usa si
+# es de otro usuario (sus ficheros se leen con pickle).
+_usuario = os.getuid() if hasattr(os, "getuid") else os.getpid()
+cache_dir = os.environ.get(
+    "GREENHOUSE_CACHE_DIR", os.path.join(tempfile.gettempdir(), f"greenhouse_cache_{_usuario}")
+)
+raw_env = [f"GREENHOUSE_CACHE_DIR={cache_dir}"]
+
+accesslog = None
+errorlog = "-"
+loglevel = "info"
@@ -0,0 +1,14 @@
+"""Punto de entrada WSGI del dashboard para servidores con varios procesos.
+
+Ejecutar desde ``greenhouse_system/`` (configuración en ``clientes/gunicorn.conf.py``):
+    gunicorn -c clientes/gunicorn.conf.py clientes.wsgi:application
+"""
+from __future__ import annotations
+
+try:
+    from greenhouse_system.clientes.app import server
+except ModuleNotFoundError:
+    # ``clientes.app`` añade la raíz del proyecto a ``sys.path`` al importarse.
+    from clientes.app import server  # type: ignore
+
+application = server
@@ -0,0 +1,62 @@
+// Modo push: recibe los eventos del middleware por SSE (/eventos, ver
+// dashboard/eventos.py) y los escribe en push-store. Mientras el canal está
+// conectado los dcc.Interval quedan desactivados; si se pierde, se reactivan
+// y el dashboard vuelve al sondeo periódico.
+(function () {
+    var INTERVALOS = ["interval-component", "interval-history", "interval-alerts"];
+
+    var pushActivo = false;
+
+    function setProps(id, props) {
+        // dcc.Interval y dcc.Store no tienen nodo en el DOM: el layout está
+        // listo cuando existe el contenedor de KPI.
+        if (!window.dash_clientside || !window.dash_clientside.set_props || !document.getElementById("kpi-container")) {
+            return false;
+        }
+        window.dash_clientside.set_props(id, props);
+        return true;
+    }
+
+    function modoPush(activo) {
+        pushActivo = activo;
+        var aplicado = INTERVALOS.map(function (id) {
+            return setProps(id, {disabled: activo});
+        });
+        // El primer estado puede llegar antes de que Dash haya dibujado el layout.
+        if (aplicado.indexOf(false) !== -1) {
+            setTimeout(function () {
+                if (pushActivo === activo) {
+                    modoPush(activo);
+                }
+            }, 500);
+        }
+    }
+
+    function conectar() {
+        if (!window.EventSource) {
+            return;
+        }
+        var fuente = new EventSource("/eventos");
+        fuente.addEventListener("estado", function (mensaje) {
+            modoPush(JSON.parse(mensaje.data).conectado);
+        });
+        fuente.addEventListener("datos", function (mensaje) {
+            setProps("push-store", {data: JSON.parse(mensaje.data)});
+        });
+        // EventSource reintenta por sí mismo; mientras tanto, sondeo. Tras un
+        // 503 (servidor sin huecos para más conexiones) no reintenta: se
+        // vuelve a probar pasado un minuto.
+        fuente.onerror = function () {
+            modoPush(false);
+            if (fuente.readyState === EventSource.CLOSED) {
+                setTimeout(conectar, 60000);
+            }
+        };
+    }
+
+    if (document.readyState === "loading") {
+        document.addEventListener("DOMContentLoaded", conectar);
+    } else {
+        conectar();
+    }
+})();
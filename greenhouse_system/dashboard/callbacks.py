@@ -1,15 +1,68 @@
 """Dash callbacks powering the greenhouse dashboard."""
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
 
-from dash import Dash, Input, Output, dcc, html, no_update
+from dash import Dash, Input, Output, State, ctx, dcc, html, no_update
 from dash.exceptions import PreventUpdate
+import numpy as np
 import plotly.graph_objects as go
 
+from greenhouse_system.database.cache import obtener_cache
 from greenhouse_system.database.database_setup import DataFetcher
+from greenhouse_system.database.downsampling import fechas, numeros
+from greenhouse_system.dashboard.eventos import CanalEventos, registrar_ruta
 from greenhouse_system.informes.latex_generator import ReportGenerator
+from greenhouse_system.informes.trabajos import ESTADOS_ACTIVOS, ColaInformes
+
+HISTORY_LIMIT = 50
+PROCESSED_LIMIT = 50
+# Caché compartida por todas las pestañas (y, con CACHE_DIR, por todos los
+# workers): cada CACHE_TTL segundos se consulta MySQL una sola vez. La
+# configuración de gunicorn (clientes/gunicorn.conf.py) fija CACHE_DIR con la
+# variable de entorno GREENHOUSE_CACHE_DIR.
+CACHE_TTL = 2.0
+CACHE_DIR: Optional[str] = os.environ.get("GREENHOUSE_CACHE_DIR") or None
+# Periodos del selector de rango y puntos máximos por traza al dibujarlos.
+RANGES = {"1h": timedelta(hours=1), "24h": timedelta(days=1), "7d": timedelta(days=7)}
+MAX_POINTS = 500
+# Modo push: el dashboard se suscribe a los eventos del middleware servidor en
+# PUSH_HOST:PUSH_PORT y los navegadores solo refrescan cuando llegan datos.
+# Con un periodo largo seleccionado, las gráficas se rehacen como mucho cada
+# RANGE_PUSH_REFRESH segundos.
+PUSH_ENABLED = True
+PUSH_HOST = "127.0.0.1"
+PUSH_PORT = 5001
+# Cada conexión SSE ocupa un hilo del worker: como mucho la mitad de los hilos
+# (GREENHOUSE_THREADS en gunicorn.conf.py), para que queden hilos para los callbacks.
+PUSH_MAX_CLIENTS = int(
+    os.environ.get("GREENHOUSE_SSE_MAX", max(1, int(os.environ.get("GREENHOUSE_THREADS", 8)) // 2))
+)
+RANGE_PUSH_REFRESH = 30.0
+# Tabla de la que sale cada gráfica en vivo.
+CHART_TABLES = {"clima": "clima_data", "riego": "riego_data", "historical": "resultados_funciones"}
+# Tablas que afectan a cada panel, para ignorar los eventos que no le tocan.
+REALTIME_TABLES = {"clima_data", "riego_data", "plantas_data", "resultados_funciones"}
+HISTORY_TABLES = {"clima_data", "riego_data", "resultados_funciones"}
+ALERT_TABLES = {"alertas_criticas"}
+
+# Gráficas de series: (métricas, etiquetas, colores, título).
+CLIMA_CHART = (
+    ["humedad", "co2", "presion"],
+    ["Humedad (%)", "CO₂ (ppm)", "Presión (hPa)"],
+    ["#1d3557", "#457b9d", "#a8dadc"],
+    "Clima ambiente",
+)
+RIEGO_CHART = (
+    ["flujo", "caudal_historico"],
+    ["Flujo", "Caudal histórico"],
+    ["#2a9d8f", "#264653"],
+    "Dinámica de riego",
+)
+HISTORICAL_METRICS = ["indice_estres", "eficiencia_luz", "rendimiento_frutos", "necesidad_riego"]
 
 
 def _safe_float(value: Optional[Any]) -> Optional[float]:
@@ -53,18 +106,29 @@ def _build_indicator(title: str, value: Optional[float], min_val: float, max_val
     return dcc.Graph(figure=fig, className="indicator-graph", config={"displayModeBar": False})
 
 
-def _build_line_chart(rows: List[Dict[str, Any]], metrics: List[str], labels: List[str], colors: List[str], title: str):
-    fig = go.Figure()
-    
-    # Asegurar que las filas con timestamp válido están ordenadas
-    valid_rows = [row for row in rows if _parse_time(row.get("timestamp"))]
-    rows_sorted = sorted(valid_rows, key=lambda r: _parse_time(r.get("timestamp")))
-    
-    timestamps = [_parse_time(row.get("timestamp")) for row in rows_sorted]
-
-    for metric, label, color in zip(metrics, labels, colors):
-        values = [_safe_float(row.get(metric)) for row in rows_sorted]
-        fig.add_trace(
+def _chart_points(columns: Dict[str, List[Any]], metrics: List[str]) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """Eje temporal (``datetime64``) y valores (float, NaN si faltan) de ``metrics``.
+
+    Las columnas ya llegan ordenadas por tiempo desde SQL; solo se descartan
+    las filas sin fecha válida.
+    """
+    x = fechas(columns.get("timestamp") or [])
+    series = [numeros(columns[metric]) if columns.get(metric) else np.full(len(x), np.nan) for metric in metrics]
+    valid = ~np.isnat(x)
+    if not valid.all():
+        x = x[valid]
+        series = [values[valid] for values in series]
+    return x, series
+
+
+def _build_line_chart(
+    columns: Dict[str, List[Any]], metrics: List[str], labels: List[str], colors: List[str], title: str
+) -> go.Figure:
+    timestamps, series = _chart_points(columns, metrics)
+    # Trazas y layout en una sola construcción: add_trace/update_layout validan
+    # la figura entera en cada llamada.
+    return go.Figure(
+        data=[
             go.Scatter(
                 x=timestamps,
                 y=values,
@@ -72,16 +136,61 @@ def _build_line_chart(rows: List[Dict[str, Any]], metrics: List[str], labels: Li
                 mode="lines+markers",
                 line=dict(color=color, width=2),
             )
-        )
-
-    fig.update_layout(
-        title=title,
-        margin=dict(l=10, r=10, t=40, b=40),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-        height=300,
-        xaxis_title="Tiempo",
+            for values, label, color in zip(series, labels, colors)
+        ],
+        layout=dict(
+            title=title,
+            margin=dict(l=10, r=10, t=40, b=40),
+            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+            height=300,
+            xaxis_title="Tiempo",
+        ),
     )
-    return dcc.Graph(figure=fig, className="line-chart", config={"displayModeBar": False})
+
+
+def _extend_data(x: np.ndarray, series: List[np.ndarray], max_points: int):
+    """Valor de ``extendData`` que añade ``x``/``series`` a las primeras trazas, o ``no_update``."""
+    if not len(x):
+        return no_update
+    x_values = np.datetime_as_string(x, unit="ms").tolist()
+    # NaN no es JSON válido: los huecos se envían como null.
+    y_values = [np.where(np.isnan(values), None, values).tolist() for values in series]
+    return dict(x=[x_values] * len(series), y=y_values), list(range(len(series))), max_points
+
+
+def _unseen(columns: Dict[str, List[Any]], seen: set) -> Dict[str, List[Any]]:
+    """Filas de ``columns`` cuyo ``id`` no está en ``seen``."""
+    ids = columns.get("id") or []
+    keep = [index for index, value in enumerate(ids) if value not in seen]
+    if len(keep) == len(ids):
+        return columns
+    return {key: [values[index] for index in keep] for key, values in columns.items()}
+
+
+def _valid_times(columns: Dict[str, List[Any]]) -> np.ndarray:
+    times = fechas(columns.get("timestamp") or [])
+    return times[~np.isnat(times)]
+
+
+def _last_time(columns: Dict[str, List[Any]], previous: Optional[str]) -> Optional[str]:
+    """Fecha más reciente dibujada (ISO) tras añadir ``columns``."""
+    times = _valid_times(columns)
+    if not times.size:
+        return previous
+    latest = times.max()
+    if previous is not None:
+        latest = max(latest, np.datetime64(previous, "us"))
+    return str(latest)
+
+
+def _starts_before(columns: Dict[str, List[Any]], last_time: Optional[str]) -> bool:
+    """``True`` si alguna fila de ``columns`` es anterior a ``last_time``."""
+    times = _valid_times(columns)
+    return last_time is not None and bool(times.size) and times.min() < np.datetime64(last_time, "us")
+
+
+def _extend_line_chart(columns: Dict[str, List[Any]], metrics: List[str], max_points: int):
+    return _extend_data(*_chart_points(columns, metrics), max_points)
 
 
 def _build_progress(label: str, value: Optional[float], max_value: float, unit: str = ""):
@@ -139,16 +248,17 @@ def _build_alert_cards(alerts: List[Dict[str, Any]], empty_message: str):
     return cards
 
 
-def _build_kpis(latest: Dict[str, Optional[Dict[str, Any]]], processed: List[Dict[str, Any]]):
+def _build_kpis(latest: Dict[str, Optional[Dict[str, Any]]], processed: Dict[str, List[Any]]):
     clima = latest.get("clima") or {}
     riego = latest.get("riego") or {}
     plantas = latest.get("plantas") or {}
-    procesado = processed[0] if processed else {}
+    # Las columnas procesadas van de la fila más antigua a la más nueva.
+    estres_columna = processed.get("indice_estres") or [None]
 
     temperatura = _safe_float(clima.get("temperatura"))
     ph = _safe_float(riego.get("ph"))
     salud = _safe_float(plantas.get("nivel_salud"))
-    estres = _safe_float(procesado.get("indice_estres"))
+    estres = _safe_float(estres_columna[-1])
 
     cards = [
         html.Div(
@@ -171,27 +281,26 @@ def _build_kpis(latest: Dict[str, Optional[Dict[str, Any]]], processed: List[Dic
     return cards
 
 
-def _build_historical(processed: List[Dict[str, Any]]) -> go.Figure:
-    figure = go.Figure()
-    if not processed:
-        figure.update_layout(title="Sin datos históricos", height=320)
-        return figure
+def _historical_series(processed: Dict[str, List[Any]]) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """Eje temporal y valores de las trazas de ``_build_historical``, en su orden."""
+    timestamps, (estres, eficiencia, rendimiento, necesidad) = _chart_points(processed, HISTORICAL_METRICS)
+    necesidad = (np.nan_to_num(necesidad) != 0).astype(float)
+    return timestamps, [estres, eficiencia, rendimiento, necesidad]
 
-    rows = list(reversed(processed))
-    timestamps = [_parse_time(row.get("timestamp")) for row in rows]
 
-    estres = [_safe_float(row.get("indice_estres")) for row in rows]
-    eficiencia = [_safe_float(row.get("eficiencia_luz")) for row in rows]
-    rendimiento = [_safe_float(row.get("rendimiento_frutos")) for row in rows]
-    necesidad_riego = [1 if row.get("necesidad_riego") else 0 for row in rows]
+def _extend_historical(processed: Dict[str, List[Any]], max_points: int):
+    return _extend_data(*_historical_series(processed), max_points)
 
-    figure.add_trace(
-        go.Scatter(x=timestamps, y=estres, name="Índice estrés", mode="lines+markers", line=dict(color="#e76f51"))
-    )
-    figure.add_trace(
-        go.Scatter(x=timestamps, y=eficiencia, name="Eficiencia luz", mode="lines+markers", line=dict(color="#2a9d8f"))
-    )
-    figure.add_trace(
+
+def _build_historical(processed: Dict[str, List[Any]]) -> go.Figure:
+    if not processed.get("timestamp"):
+        return go.Figure(layout=dict(title="Sin datos históricos", height=320))
+
+    timestamps, (estres, eficiencia, rendimiento, necesidad_riego) = _historical_series(processed)
+
+    traces = [
+        go.Scatter(x=timestamps, y=estres, name="Índice estrés", mode="lines+markers", line=dict(color="#e76f51")),
+        go.Scatter(x=timestamps, y=eficiencia, name="Eficiencia luz", mode="lines+markers", line=dict(color="#2a9d8f")),
         go.Bar(
             x=timestamps,
             y=rendimiento,
@@ -199,9 +308,7 @@ def _build_historical(processed: List[Dict[str, Any]]) -> go.Figure:
             marker_color="#264653",
             opacity=0.6,
             yaxis="y2",
-        )
-    )
-    figure.add_trace(
+        ),
         go.Scatter(
             x=timestamps,
             y=necesidad_riego,
@@ -209,11 +316,11 @@ def _build_historical(processed: List[Dict[str, Any]]) -> go.Figure:
             mode="lines",
             line=dict(color="#f4a261", dash="dash"),
             yaxis="y3",
-        )
-    )
+        ),
+    ]
 
     # Reservamos espacio a la derecha para colocar los ejes secundarios sin perder proporción.
-    figure.update_layout(
+    layout = dict(
         title="Indicadores procesados",
         height=360,
         margin=dict(l=20, r=130, t=50, b=40),
@@ -236,33 +343,65 @@ def _build_historical(processed: List[Dict[str, Any]]) -> go.Figure:
         ),
         xaxis=dict(domain=[0, 0.86], title="Tiempo"),
     )
-    return figure
+    return go.Figure(data=traces, layout=layout)
 
 
-def register_callbacks(app: Dash) -> None:
-    fetcher = DataFetcher()
-    report_generator = ReportGenerator()
+def _push_skips(event: Optional[Dict[str, Any]], tables: set) -> bool:
+    """True si el callback lo ha disparado un evento push sin tablas de ``tables``."""
+    if ctx.triggered_id != "push-store":
+        return False
+    return not tables.intersection((event or {}).get("tablas") or {})
+
+
+def _report_progress(job: Dict[str, Any]) -> html.Div:
+    return html.Div(
+        [
+            html.Progress(value=str(job.get("progreso", 0)), max="100"),
+            html.Span(f"{job.get('mensaje', 'En cola')}..."),
+        ],
+        className="report-progress",
+    )
 
+
+def register_callbacks(app: Dash) -> None:
+    cache = obtener_cache(CACHE_TTL, CACHE_DIR)
+    fetcher = DataFetcher(cache=cache)
+    if PUSH_ENABLED:
+        # Cada lote nuevo invalida la caché: los callbacks que dispara leen ya sus filas.
+        # El ``momento`` del evento es la versión compartida con el resto de workers.
+        channel = CanalEventos(
+            PUSH_HOST,
+            PUSH_PORT,
+            al_recibir=lambda evento: cache.invalidar(str(evento.get("momento", ""))),
+            max_clientes=PUSH_MAX_CLIENTS,
+        )
+        registrar_ruta(app.server, channel)
+        channel.iniciar()
+    # Los informes se generan en segundo plano; el estado de cada trabajo está
+    # en disco y cualquier worker puede responder a la consulta de progreso.
+    report_jobs = ColaInformes(ReportGenerator())
+
+    # Cada panel tiene su propio intervalo (ver layout.py) y solo hace sus
+    # consultas: los valores actuales y los KPI se refrescan rápido, las
+    # gráficas y las alertas a menor ritmo, y un panel lento no retrasa al resto.
     @app.callback(
         [
             Output("clima-data", "children"),
             Output("riego-data", "children"),
+            Output("riego-stats", "children"),
             Output("plantas-data", "children"),
-            Output("alert-zone-a", "children"),
-            Output("alert-zone-b", "children"),
             Output("kpi-container", "children"),
             Output("clima-zone", "children"),
-            Output("historical-charts", "figure"),
         ],
         Input("interval-component", "n_intervals"),
+        Input("push-store", "data"),
     )
-    def update_dashboard(_):
+    def update_realtime(_, event):
+        if _push_skips(event, REALTIME_TABLES):
+            raise PreventUpdate
         latest = fetcher.get_latest_sensor_data()
-        processed = fetcher.get_processed_data(limit=50)
-        alerts = fetcher.get_active_alerts()
-        clima_history = fetcher.get_recent_data("clima_data")
-        riego_history = fetcher.get_recent_data("riego_data")
-        plantas_history = fetcher.get_recent_data("plantas_data")
+        processed = fetcher.get_processed_data(limit=1)
+        estres = processed[0].get("indice_estres") if processed else None
 
         clima_latest = latest.get("clima") or {}
         riego_latest = latest.get("riego") or {}
@@ -270,13 +409,6 @@ def register_callbacks(app: Dash) -> None:
 
         clima_children = [
             _build_indicator("Temperatura", _safe_float(clima_latest.get("temperatura")), 0, 40, " °C"),
-            _build_line_chart(
-                clima_history,
-                ["humedad", "co2", "presion"],
-                ["Humedad (%)", "CO₂ (ppm)", "Presión (hPa)"],
-                ["#1d3557", "#457b9d", "#a8dadc"],
-                "Clima ambiente",
-            ),
         ]
 
         flujo = _safe_float(riego_latest.get("flujo"))
@@ -287,22 +419,10 @@ def register_callbacks(app: Dash) -> None:
             _build_indicator("pH", _safe_float(riego_latest.get("ph")), 0, 14),
             _build_indicator("Conductividad (mS/cm)", _safe_float(riego_latest.get("conductividad")), 0, 3),
             _build_progress("Nivel depósito", nivel, 100, "%"),
-            _build_line_chart(
-                riego_history,
-                ["flujo", "caudal_historico"],
-                ["Flujo", "Caudal histórico"],
-                ["#2a9d8f", "#264653"],
-                "Dinámica de riego",
-            ),
-            html.Div(
-                [
-                    html.P(f"Flujo actual: {flujo:.2f} L/min" if flujo is not None else "Flujo actual: N/D"),
-                    html.P(
-                        f"Caudal acumulado: {caudal:.2f} L" if caudal is not None else "Caudal acumulado: N/D"
-                    ),
-                ],
-                className="riego-stats",
-            ),
+        ]
+        riego_stats = [
+            html.P(f"Flujo actual: {flujo:.2f} L/min" if flujo is not None else "Flujo actual: N/D"),
+            html.P(f"Caudal acumulado: {caudal:.2f} L" if caudal is not None else "Caudal acumulado: N/D"),
         ]
 
         crecimiento = _safe_float(plantas_latest.get("crecimiento"))
@@ -327,60 +447,206 @@ def register_callbacks(app: Dash) -> None:
             ),
         ]
 
-        alerts_by_zone: Dict[str, List[Dict[str, Any]]] = {"zona_a": [], "zona_b": []}
-        for alert in alerts:
-            zone = (alert.get("zona") or "").lower()
-            if zone in alerts_by_zone:
-                alerts_by_zone[zone].append(alert)
-
-        zone_a_children = _build_alert_cards(alerts_by_zone["zona_a"], "Sin alertas en Zona A")
-        zone_b_children = _build_alert_cards(alerts_by_zone["zona_b"], "Sin alertas en Zona B")
-        kpi_children = _build_kpis(latest, processed)
+        kpi_children = _build_kpis(latest, {"indice_estres": [estres]})
         zone_text = clima_latest.get("zona", "N/D")
-        historical_figure = _build_historical(processed)
 
         return (
             clima_children,
             riego_children,
+            riego_stats,
             plantas_children,
-            zone_a_children,
-            zone_b_children,
             kpi_children,
             zone_text,
+        )
+
+    @app.callback(
+        [
+            Output("clima-chart", "figure"),
+            Output("clima-chart", "extendData"),
+            Output("riego-chart", "figure"),
+            Output("riego-chart", "extendData"),
+            Output("historical-charts", "figure"),
+            Output("historical-charts", "extendData"),
+            Output("dashboard-store", "data"),
+        ],
+        Input("interval-history", "n_intervals"),
+        Input("range-selector", "value"),
+        Input("push-store", "data"),
+        State("dashboard-store", "data"),
+    )
+    def update_history(_, selected_range, event, stored):
+        if _push_skips(event, HISTORY_TABLES):
+            raise PreventUpdate
+        window = RANGES.get(selected_range)
+        if window is not None:
+            stored = stored or {}
+            if (
+                ctx.triggered_id == "push-store"
+                and stored.get("range") == selected_range
+                and time.time() - stored.get("built", 0) < RANGE_PUSH_REFRESH
+            ):
+                raise PreventUpdate
+            # Periodo largo: figuras completas, reducidas en DataFetcher. El
+            # store sin ids hace que al volver a "En vivo" se recreen.
+            clima = fetcher.get_range_series("clima_data", window, CLIMA_CHART[0], MAX_POINTS)
+            riego = fetcher.get_range_series("riego_data", window, RIEGO_CHART[0], MAX_POINTS)
+            processed = fetcher.get_range_series("resultados_funciones", window, HISTORICAL_METRICS, MAX_POINTS)
+            return (
+                _build_line_chart(clima, *CLIMA_CHART),
+                no_update,
+                _build_line_chart(riego, *RIEGO_CHART),
+                no_update,
+                _build_historical(processed),
+                no_update,
+                {"range": selected_range, "built": time.time()},
+            )
+
+        # Solo se piden las filas posteriores a los ids ya vistos (más el solape
+        # de DataFetcher.HISTORY_OVERLAP_IDS, que se descarta por id): las
+        # gráficas se crean completas la primera vez (o mientras no tengan
+        # datos) y después solo reciben los puntos nuevos con ``extendData``,
+        # limitadas a los últimos N puntos.
+        stored = stored or {}
+        history = fetcher.get_dashboard_history(
+            history_limit=HISTORY_LIMIT,
+            processed_limit=PROCESSED_LIMIT,
+            since_ids=stored.get("last_ids"),
+        )
+        ready = dict(stored.get("charts") or {})
+        seen = {table: set(ids) for table, ids in (stored.get("seen") or {}).items()}
+        last_times = dict(stored.get("last_times") or {})
+        full: Dict[str, Any] = {}
+
+        def full_window() -> Dict[str, Any]:
+            if not full:
+                full.update(fetcher.get_dashboard_history(history_limit=HISTORY_LIMIT, processed_limit=PROCESSED_LIMIT))
+            return full
+
+        def chart_outputs(name: str, pick, build, extend):
+            known = seen.setdefault(CHART_TABLES[name], set())
+            columns = _unseen(pick(history), known)
+            known.update(columns.get("id") or [])
+            if ready.get(name):
+                if not columns.get("timestamp"):
+                    return no_update, no_update
+                if _starts_before(columns, last_times.get(name)):
+                    # Filas anteriores a lo ya dibujado (un lote confirmado tarde o
+                    # reenviado desde el spool): extendData las pondría al final.
+                    columns = pick(full_window())
+                    known.update(columns.get("id") or [])
+                    last_times[name] = _last_time(columns, last_times.get(name))
+                    return build(columns), no_update
+                last_times[name] = _last_time(columns, last_times.get(name))
+                return no_update, extend(columns)
+            if not columns.get("timestamp") and name in ready:
+                return no_update, no_update
+            ready[name] = bool(columns.get("timestamp"))
+            last_times[name] = _last_time(columns, None)
+            return build(columns), no_update
+
+        clima_figure, clima_extend = chart_outputs(
+            "clima",
+            lambda data: data["history"]["clima_data"],
+            lambda columns: _build_line_chart(columns, *CLIMA_CHART),
+            lambda columns: _extend_line_chart(columns, CLIMA_CHART[0], HISTORY_LIMIT),
+        )
+        riego_figure, riego_extend = chart_outputs(
+            "riego",
+            lambda data: data["history"]["riego_data"],
+            lambda columns: _build_line_chart(columns, *RIEGO_CHART),
+            lambda columns: _extend_line_chart(columns, RIEGO_CHART[0], HISTORY_LIMIT),
+        )
+        historical_figure, historical_extend = chart_outputs(
+            "historical",
+            lambda data: data["processed"],
+            _build_historical,
+            lambda columns: _extend_historical(columns, PROCESSED_LIMIT),
+        )
+        last_ids = history["last_ids"]
+        # Solo hace falta recordar los ids que el solape puede volver a traer.
+        store = {
+            "last_ids": last_ids,
+            "charts": ready,
+            "seen": {
+                table: sorted(i for i in ids if i > last_ids.get(table, 0) - fetcher.HISTORY_OVERLAP_IDS)
+                for table, ids in seen.items()
+            },
+            "last_times": last_times,
+        }
+
+        return (
+            clima_figure,
+            clima_extend,
+            riego_figure,
+            riego_extend,
             historical_figure,
+            historical_extend,
+            store,
         )
 
     @app.callback(
-        [Output("report-status", "children"), Output("download-informe", "data")],
+        [Output("alert-zone-a", "children"), Output("alert-zone-b", "children")],
+        Input("interval-alerts", "n_intervals"),
+        Input("push-store", "data"),
+    )
+    def update_alerts(_, event):
+        if _push_skips(event, ALERT_TABLES):
+            raise PreventUpdate
+        alerts_by_zone: Dict[str, List[Dict[str, Any]]] = {"zona_a": [], "zona_b": []}
+        for alert in fetcher.get_active_alerts():
+            zone = (alert.get("zona") or "").lower()
+            if zone in alerts_by_zone:
+                alerts_by_zone[zone].append(alert)
+
+        zone_a_children = _build_alert_cards(alerts_by_zone["zona_a"], "Sin alertas en Zona A")
+        zone_b_children = _build_alert_cards(alerts_by_zone["zona_b"], "Sin alertas en Zona B")
+        return zone_a_children, zone_b_children
+
+    @app.callback(
+        [
+            Output("report-status", "children"),
+            Output("download-informe", "data"),
+            Output("report-job", "data"),
+            Output("interval-report", "disabled"),
+        ],
         Input("btn-generar-informe", "n_clicks"),
+        Input("interval-report", "n_intervals"),
+        State("report-job", "data"),
         prevent_initial_call=True,
     )
-    def generar_informe(n_clicks):
-        if not n_clicks:
+    def generar_informe(n_clicks, _, job_id):
+        # El botón encola el trabajo y activa interval-report; cada tick consulta
+        # su estado hasta que termina y entonces se descarga el fichero.
+        if ctx.triggered_id == "btn-generar-informe":
+            if not n_clicks:
+                raise PreventUpdate
+            job_id = report_jobs.enviar(compile_pdf=True)
+        if not job_id:
             raise PreventUpdate
 
-        try:
-            result = report_generator.generate_daily_report(compile_pdf=True)
-            pdf_path = result.get("pdf")
-            tex_path = result["tex"]
-            nombre = pdf_path.name if pdf_path else tex_path.name
+        job = report_jobs.estado(job_id)
+        if job is None:
+            return html.Span("El trabajo del informe ya no existe.", className="status-error"), no_update, None, True
+        if job["estado"] in ESTADOS_ACTIVOS:
+            return _report_progress(job), no_update, job_id, False
+        if job["estado"] == "error":
+            mensaje = html.Span(f"Error al generar el informe: {job['error']}", className="status-error")
+            return mensaje, no_update, None, True
+
+        pdf_path = job["rutas"].get("pdf")
+        tex_path = job["rutas"]["tex"]
+        if pdf_path:
+            terminado = datetime.fromtimestamp(job["actualizado"]).strftime("%d/%m/%Y %H:%M")
             mensaje = html.Span(
-                f"Informe generado el {datetime.now().strftime('%d/%m/%Y %H:%M')}: {nombre}",
+                f"Informe generado el {terminado}: {os.path.basename(pdf_path)}",
                 className="status-ok",
             )
-            download_path = pdf_path or tex_path
-            return mensaje, dcc.send_file(str(download_path))
-        except RuntimeError as exc:
-            # Si no hay PDF disponible, intenta devolver al menos el archivo LaTeX.
-            try:
-                result = report_generator.generate_daily_report(compile_pdf=False)
-                tex_path = result["tex"]
-                mensaje = html.Span(
-                    f"Informe LaTeX generado (PDF no disponible): {tex_path.name}",
-                    className="status-warning",
-                )
-                return mensaje, dcc.send_file(str(tex_path))
-            except Exception:  # pragma: no cover - error inesperado
-                return html.Span(str(exc), className="status-error"), no_update
-        except Exception as exc:  # pragma: no cover - error inesperado
-            return html.Span(f"Error al generar el informe: {exc}", className="status-error"), no_update
\ No newline at end of file
+        else:
+            # Si no hay PDF disponible, se entrega el archivo LaTeX ya escrito
+            # junto con el motivo (normalmente el error de pdflatex).
+            motivo = f" {job['aviso']}" if job.get("aviso") else ""
+            mensaje = html.Span(
+                f"Informe LaTeX generado (PDF no disponible): {os.path.basename(tex_path)}.{motivo}",
+                className="status-warning",
+            )
+        return mensaje, dcc.send_file(pdf_path or tex_path), None, True
@@ -0,0 +1,156 @@
+"""Modo push del dashboard: eventos del middleware reenviados a los navegadores.
+
+``CanalEventos`` se suscribe al publicador del middleware servidor
+(middleware/publicador.py) y reenvía cada evento a los navegadores abiertos
+mediante Server-Sent Events en ``/eventos``. En el navegador,
+``assets/eventos.js`` escribe el evento en ``push-store`` (lo que dispara los
+callbacks afectados) y desactiva los ``dcc.Interval`` mientras la conexión
+está activa. Un dashboard sin datos nuevos no hace ninguna consulta.
+
+Si el middleware no está disponible se emite ``estado`` con
+``conectado: false`` y el navegador vuelve al sondeo periódico.
+
+Cada navegador conectado ocupa un hilo del servidor mientras dura la conexión.
+Por eso cada proceso admite como mucho ``max_clientes`` conexiones; las
+siguientes reciben un 503 y esos navegadores siguen con el sondeo.
+"""
+from __future__ import annotations
+
+import json
+import queue
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from flask import Flask, Response
+
+HOST = "127.0.0.1"
+PORT = 5001
+# Segundos entre reintentos de conexión con el middleware.
+REINTENTO = 2.0
+# Comentario SSE periódico para que proxies y navegador no cierren la conexión.
+LATIDO = 15.0
+# Eventos pendientes por navegador; si se llena se descartan (el siguiente
+# evento vuelve a disparar la misma consulta).
+MAX_PENDIENTES = 100
+# Conexiones SSE simultáneas por proceso (ver ``max_clientes``).
+MAX_CLIENTES = 4
+
+
+class CanalEventos:
+    """Suscripción al publicador del middleware y difusión por SSE."""
+
+    def __init__(
+        self,
+        host: str = HOST,
+        port: int = PORT,
+        al_recibir: Optional[Callable[[Dict[str, Any]], None]] = None,
+        max_clientes: int = MAX_CLIENTES,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.al_recibir = al_recibir
+        self.max_clientes = max_clientes
+        self.conectado = False
+        self._clientes: List[queue.Queue] = []
+        self._lock = threading.Lock()
+        self._hilo: Optional[threading.Thread] = None
+        self._secuencia = 0
+
+    def iniciar(self) -> None:
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._escuchar, name="canal_eventos", daemon=True)
+            self._hilo.start()
+
+    def suscribir(self) -> Optional[queue.Queue]:
+        """Registra un navegador; ``None`` si ya hay ``max_clientes`` conectados."""
+        cola: queue.Queue = queue.Queue(maxsize=MAX_PENDIENTES)
+        with self._lock:
+            if len(self._clientes) >= self.max_clientes:
+                return None
+            self._clientes.append(cola)
+        return cola
+
+    def cancelar(self, cola: queue.Queue) -> None:
+        with self._lock:
+            if cola in self._clientes:
+                self._clientes.remove(cola)
+
+    def flujo_sse(self, cola: queue.Queue) -> Iterator[str]:
+        """Mensajes SSE para el navegador de ``cola``: estado inicial y después cada evento."""
+        try:
+            yield _mensaje("estado", {"conectado": self.conectado})
+            while True:
+                try:
+                    tipo, datos = cola.get(timeout=LATIDO)
+                except queue.Empty:
+                    yield ": latido\n\n"
+                    continue
+                yield _mensaje(tipo, datos)
+        finally:
+            self.cancelar(cola)
+
+    def _difundir(self, tipo: str, datos: Dict[str, Any]) -> None:
+        with self._lock:
+            clientes = list(self._clientes)
+        for cola in clientes:
+            try:
+                cola.put_nowait((tipo, datos))
+            except queue.Full:
+                pass
+
+    def _cambiar_estado(self, conectado: bool) -> None:
+        if conectado != self.conectado:
+            self.conectado = conectado
+            self._difundir("estado", {"conectado": conectado})
+
+    def _escuchar(self) -> None:
+        while True:
+            try:
+                with socket.create_connection((self.host, self.port), timeout=REINTENTO) as conexion:
+                    conexion.settimeout(None)
+                    self._cambiar_estado(True)
+                    with conexion.makefile("r", encoding="utf-8") as lineas:
+                        for linea in lineas:
+                            self._recibir(linea)
+            except OSError:
+                pass
+            self._cambiar_estado(False)
+            time.sleep(REINTENTO)
+
+    def _recibir(self, linea: str) -> None:
+        try:
+            evento = json.loads(linea)
+        except ValueError:
+            return
+        if self.al_recibir is not None:
+            self.al_recibir(evento)
+        # La secuencia hace que cada evento cambie ``push-store`` aunque se repitan las tablas.
+        self._secuencia += 1
+        evento["secuencia"] = self._secuencia
+        self._difundir("datos", evento)
+
+
+def _mensaje(tipo: str, datos: Dict[str, Any]) -> str:
+    return f"event: {tipo}\ndata: {json.dumps(datos, default=str)}\n\n"
+
+
+def registrar_ruta(server: Flask, canal: CanalEventos, ruta: str = "/eventos") -> None:
+    """Expone ``canal`` como flujo SSE en ``ruta`` del servidor Flask de Dash."""
+
+    def eventos() -> Response:
+        cola = canal.suscribir()
+        if cola is None:
+            # EventSource no reintenta tras un 503: el navegador se queda en sondeo.
+            return Response("Demasiadas conexiones de eventos", status=503, headers={"Retry-After": "60"})
+        respuesta = Response(
+            canal.flujo_sse(cola),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        # Libera el hueco aunque el flujo no llegue a empezar.
+        respuesta.call_on_close(lambda: canal.cancelar(cola))
+        return respuesta
+
+    server.add_url_rule(ruta, "eventos", eventos)
@@ -1,12 +1,26 @@
 """Dash layout for the greenhouse realtime dashboard."""
 from dash import dcc, html
 
+# Ritmo de refresco de cada panel (ms): valores actuales y KPI, gráficas de
+# series y alertas.
+FAST_INTERVAL_MS = 2_000
+HISTORY_INTERVAL_MS = 5_000
+ALERTS_INTERVAL_MS = 10_000
+# Consulta del progreso de un informe en curso (solo activo mientras hay uno).
+REPORT_INTERVAL_MS = 1_000
+
 
 def create_layout() -> html.Div:
     return html.Div(
         [
             dcc.Location(id="app-url"),
-            dcc.Interval(id="interval-component", interval=2_000, n_intervals=0),
+            dcc.Interval(id="interval-component", interval=FAST_INTERVAL_MS, n_intervals=0),
+            dcc.Interval(id="interval-history", interval=HISTORY_INTERVAL_MS, n_intervals=0),
+            dcc.Interval(id="interval-alerts", interval=ALERTS_INTERVAL_MS, n_intervals=0),
+            # Ventana de historial del navegador; cada refresco solo trae las filas nuevas.
+            dcc.Store(id="dashboard-store", storage_type="memory"),
+            # Último evento recibido en modo push (assets/eventos.js).
+            dcc.Store(id="push-store", storage_type="memory"),
             html.Header(
                 [
                     html.H1("Invernadero Inteligente - Monitorización OPC UA"),
@@ -18,6 +32,20 @@ def create_layout() -> html.Div:
                 className="page-header",
             ),
             html.Div(id="kpi-container", className="kpi-section"),
+            # "En vivo" sigue la ventana incremental; el resto de periodos se
+            # dibuja reducido a un número máximo de puntos por traza.
+            dcc.RadioItems(
+                id="range-selector",
+                options=[
+                    {"label": "En vivo", "value": "live"},
+                    {"label": "Última hora", "value": "1h"},
+                    {"label": "24 horas", "value": "24h"},
+                    {"label": "7 días", "value": "7d"},
+                ],
+                value="live",
+                inline=True,
+                className="range-selector",
+            ),
             html.Div(
                 [
                     html.Div(
@@ -26,6 +54,7 @@ def create_layout() -> html.Div:
                             html.P("Zona", className="section-label"),
                             html.Div(id="clima-zone", className="zone-badge"),
                             html.Div(id="clima-data", className="sensor-content"),
+                            dcc.Graph(id="clima-chart", className="line-chart", config={"displayModeBar": False}),
                         ],
                         className="sensor-column clima-column",
                     ),
@@ -33,6 +62,8 @@ def create_layout() -> html.Div:
                         [
                             html.H2("Riego"),
                             html.Div(id="riego-data", className="sensor-content"),
+                            dcc.Graph(id="riego-chart", className="line-chart", config={"displayModeBar": False}),
+                            html.Div(id="riego-stats", className="riego-stats"),
                         ],
                         className="sensor-column riego-column",
                     ),
@@ -89,6 +120,9 @@ def create_layout() -> html.Div:
                     ),
                     html.Div(id="report-status", className="report-status"),
                     dcc.Download(id="download-informe"),
+                    # Id del trabajo en segundo plano (informes/trabajos.py).
+                    dcc.Store(id="report-job", storage_type="memory"),
+                    dcc.Interval(id="interval-report", interval=REPORT_INTERVAL_MS, disabled=True),
                 ],
                 className="report-section",
             ),
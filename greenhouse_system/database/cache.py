@@ -0,0 +1,238 @@
+"""Caché con caducidad (TTL) compartida delante de ``DataFetcher``.
+
+Con varias pestañas del dashboard abiertas, todas piden los mismos datos en
+cada refresco. ``CacheTTL`` guarda el resultado de cada lectura (clave:
+consulta y parámetros) durante ``ttl`` segundos y agrupa las peticiones
+concurrentes: si varios hilos piden a la vez una clave caducada, solo uno
+consulta la base de datos y el resto espera su resultado.
+
+Con ``directorio`` los resultados se comparten también entre procesos (varios
+workers del servidor web) mediante ficheros en ese directorio. Un bloqueo
+``fcntl.flock`` por clave hace que solo un worker consulte MySQL por clave y
+periodo; sin ``fcntl`` (Windows) los ficheros se comparten igualmente, pero
+sin agrupar las consultas entre procesos. Los ficheros se leen con ``pickle``,
+así que el directorio debe ser privado: se crea con permisos 0700 y, si ya
+existe y pertenece a otro usuario o lo pueden escribir otros, la caché no se
+comparte en disco.
+
+``invalidar`` solo descarta las entradas del proceso que la llama. Para que
+los ficheros compartidos tampoco valgan, se le pasa una ``version`` creciente
+(el ``momento`` del evento de nuevos datos, igual para todos los workers):
+cada fichero guarda la versión con la que se calculó y los anteriores a la
+versión actual se tratan como caducados. Nada se borra, así que el primer
+worker que recibe el evento recalcula y el resto lee su resultado.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import stat
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore
+
+# Alineado con el refresco del dashboard (2 s) y el vaciado del buffer de
+# inserciones del middleware (``FLUSH_INTERVALO``): dentro de ese plazo no
+# llegan datos nuevos que mostrar.
+TTL_POR_DEFECTO = 2.0
+MAX_ENTRADAS = 256
+
+_SIN_VALOR = object()
+_caches: Dict[Tuple[int, float, Optional[str]], "CacheTTL"] = {}
+_caches_lock = threading.Lock()
+
+
+class _Pendiente:
+    """Cálculo en curso de una clave, al que esperan las peticiones agrupadas."""
+
+    def __init__(self) -> None:
+        self.evento = threading.Event()
+        self.valor: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class CacheTTL:
+    """Resultados por clave durante ``ttl`` segundos, con agrupación de fallos y métricas."""
+
+    def __init__(
+        self,
+        ttl: float = TTL_POR_DEFECTO,
+        directorio: Optional[Path | str] = None,
+        max_entradas: int = MAX_ENTRADAS,
+    ) -> None:
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.directorio = Path(directorio) if directorio else None
+        if self.directorio is not None and not _directorio_privado(self.directorio):
+            print(
+                f"[AVISO] {self.directorio} no es un directorio privado del usuario actual; "
+                "la caché no se compartirá entre procesos"
+            )
+            self.directorio = None
+        self.version = ""
+        self._entradas: Dict[Hashable, Tuple[float, Any]] = {}
+        self._pendientes: Dict[Hashable, _Pendiente] = {}
+        self._lock = threading.Lock()
+        self._metricas = {
+            "aciertos": 0,
+            "aciertos_disco": 0,
+            "fallos": 0,
+            "agrupadas": 0,
+        }
+
+    def obtener(self, clave: Hashable, calcular: Callable[[], Any]) -> Any:
+        """Devuelve el valor de ``clave`` o lo calcula con ``calcular()``.
+
+        El valor devuelto se comparte entre llamadas: no debe modificarse.
+        """
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and time.monotonic() - entrada[0] < self.ttl:
+                self._metricas["aciertos"] += 1
+                return entrada[1]
+            pendiente = self._pendientes.get(clave)
+            propio = pendiente is None
+            if propio:
+                pendiente = _Pendiente()
+                self._pendientes[clave] = pendiente
+                self._metricas["fallos"] += 1
+            else:
+                self._metricas["agrupadas"] += 1
+
+        if not propio:
+            pendiente.evento.wait()
+            if pendiente.error is not None:
+                raise pendiente.error
+            return pendiente.valor
+
+        version = self.version
+        try:
+            pendiente.valor = self._calcular(clave, calcular, version)
+            with self._lock:
+                # Si se ha invalidado durante el cálculo, el valor puede no incluir los datos nuevos.
+                if self.version == version:
+                    self._guardar(clave, pendiente.valor)
+        except BaseException as exc:
+            pendiente.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._pendientes.pop(clave, None)
+            pendiente.evento.set()
+        return pendiente.valor
+
+    def invalidar(self, version: Optional[str] = None) -> None:
+        """Descarta las entradas en memoria de este proceso.
+
+        Con ``version`` mayor que la actual, los ficheros de ``directorio``
+        escritos con una versión anterior dejan de ser válidos.
+        """
+        with self._lock:
+            self._entradas.clear()
+            if version is not None and version > self.version:
+                self.version = version
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Devuelve aciertos (en memoria y en disco), fallos y peticiones agrupadas."""
+        with self._lock:
+            datos: Dict[str, Any] = dict(self._metricas)
+            datos["entradas"] = len(self._entradas)
+        consultas = datos["aciertos"] + datos["fallos"] + datos["agrupadas"]
+        datos["tasa_aciertos"] = (datos["aciertos"] + datos["agrupadas"]) / consultas if consultas else 0.0
+        datos["ttl"] = self.ttl
+        return datos
+
+    def _guardar(self, clave: Hashable, valor: Any) -> None:
+        ahora = time.monotonic()
+        self._entradas[clave] = (ahora, valor)
+        if len(self._entradas) <= self.max_entradas:
+            return
+        for vieja in [c for c, (momento, _) in self._entradas.items() if ahora - momento >= self.ttl]:
+            del self._entradas[vieja]
+        while len(self._entradas) > self.max_entradas:
+            del self._entradas[min(self._entradas, key=lambda c: self._entradas[c][0])]
+
+    def _calcular(self, clave: Hashable, calcular: Callable[[], Any], version: str) -> Any:
+        if self.directorio is None:
+            return calcular()
+        ruta = self.directorio / f"{hashlib.sha1(repr(clave).encode('utf-8')).hexdigest()}.pkl"
+        valor = self._leer_disco(ruta, version)
+        if valor is _SIN_VALOR:
+            with bloqueo_exclusivo(ruta.with_suffix(".lock")):
+                # Otro worker puede haberlo calculado mientras se esperaba el bloqueo.
+                valor = self._leer_disco(ruta, version)
+                if valor is _SIN_VALOR:
+                    valor = calcular()
+                    self._escribir_disco(ruta, version, valor)
+                    return valor
+        with self._lock:
+            self._metricas["aciertos_disco"] += 1
+        return valor
+
+    def _leer_disco(self, ruta: Path, version: str) -> Any:
+        try:
+            if time.time() - ruta.stat().st_mtime >= self.ttl:
+                return _SIN_VALOR
+            with ruta.open("rb") as fichero:
+                version_fichero, valor = pickle.load(fichero)
+        except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+            return _SIN_VALOR
+        # Un fichero de una versión posterior (otro worker recibió antes el evento) también vale.
+        return valor if version_fichero >= version else _SIN_VALOR
+
+    @staticmethod
+    def _escribir_disco(ruta: Path, version: str, valor: Any) -> None:
+        temporal = ruta.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with temporal.open("wb") as fichero:
+                pickle.dump((version, valor), fichero, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporal, ruta)
+        except (OSError, pickle.PicklingError):
+            temporal.unlink(missing_ok=True)
+
+
+def _directorio_privado(directorio: Path) -> bool:
+    """Crea ``directorio`` con permisos 0700 y comprueba que solo lo controla este usuario."""
+    try:
+        directorio.mkdir(mode=0o700, parents=True, exist_ok=True)
+        info = directorio.lstat()
+    except OSError:
+        return False
+    if not stat.S_ISDIR(info.st_mode):
+        return False
+    if not hasattr(os, "getuid"):  # pragma: no cover - Windows, sin permisos POSIX
+        return True
+    return info.st_uid == os.getuid() and not info.st_mode & 0o077
+
+
+@contextmanager
+def bloqueo_exclusivo(ruta: Path) -> Iterator[None]:
+    """Bloqueo entre procesos sobre el fichero ``ruta`` (sin efecto si no hay ``fcntl``)."""
+    if fcntl is None:
+        yield
+        return
+    with Path(ruta).open("a+b") as fichero:
+        fcntl.flock(fichero.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fichero.fileno(), fcntl.LOCK_UN)
+
+
+def obtener_cache(ttl: float = TTL_POR_DEFECTO, directorio: Optional[Path | str] = None) -> CacheTTL:
+    """Devuelve la caché del proceso actual para ``ttl`` y ``directorio``, creándola si hace falta."""
+    clave = (os.getpid(), ttl, str(directorio) if directorio else None)
+    with _caches_lock:
+        cache = _caches.get(clave)
+        if cache is None:
+            cache = CacheTTL(ttl, directorio)
+            _caches[clave] = cache
+        return cache
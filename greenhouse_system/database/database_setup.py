@@ -1,10 +1,24 @@
+import argparse
 from contextlib import contextmanager
-from datetime import datetime
+from datetime import datetime, timedelta
 from decimal import Decimal
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errorcode
+
+try:
+    from greenhouse_system.database import downsampling, estado_actual, particiones, rollups
+    from greenhouse_system.database.cache import CacheTTL
+    from greenhouse_system.database.pool import obtener_pool
+except ModuleNotFoundError:
+    # Ejecución directa como script (`python3 database/database_setup.py`)
+    import downsampling  # type: ignore
+    import estado_actual  # type: ignore
+    import particiones  # type: ignore
+    import rollups  # type: ignore
+    from cache import CacheTTL  # type: ignore
+    from pool import obtener_pool  # type: ignore
 
 CONFIG = {
     "host": "127.0.0.1",
@@ -79,8 +93,69 @@ TABLES['alertas_criticas'] = (
     ") ENGINE=InnoDB"
 )
 
+# Agregados por minuto/hora/día que mantiene el middleware (ver rollups.py).
+TABLES['rollups'] = rollups.DDL
+
+# Última muestra de cada zona/especie, para el dashboard (ver estado_actual.py).
+TABLES['estado_actual'] = estado_actual.DDL
+
+# Índices secundarios por tabla: ``(nombre, columnas)``. Todas las lecturas
+# (dashboard, informes, cliente de estadísticas) filtran u ordenan por
+# ``timestamp``, a veces junto con zona/especie. El índice de alertas cubre
+# todas las columnas que se consultan, así que no hace falta leer la fila.
+INDICES = {
+    "clima_data": [
+        ("idx_clima_timestamp", "timestamp"),
+        ("idx_clima_zona_timestamp", "zona, timestamp"),
+    ],
+    "plantas_data": [
+        ("idx_plantas_timestamp", "timestamp"),
+        ("idx_plantas_especie_timestamp", "especie, timestamp"),
+    ],
+    "riego_data": [
+        ("idx_riego_timestamp", "timestamp"),
+    ],
+    "resultados_funciones": [
+        ("idx_resultados_timestamp", "timestamp"),
+        ("idx_resultados_zona_especie_timestamp", "zona, especie, timestamp"),
+    ],
+    "alertas_criticas": [
+        ("idx_alertas_timestamp_cubre", "timestamp, zona, especie, tipo_alerta"),
+        ("idx_alertas_zona_especie_timestamp", "zona, especie, timestamp"),
+    ],
+}
+
+
+def crear_indices(
+    cursor, database: str = CONFIG["database"], tablas: Optional[Iterable[str]] = None
+) -> List[str]:
+    """Crea los índices de ``INDICES`` que aún no existan. Devuelve los creados.
+
+    Es idempotente: sirve tanto para una base de datos nueva como para migrar
+    una existente (``python3 database/database_setup.py``).
+    """
+    cursor.execute(
+        "SELECT table_name, index_name FROM information_schema.statistics WHERE table_schema = %s",
+        (database,),
+    )
+    existentes = {(tabla.lower(), indice) for tabla, indice in cursor.fetchall()}
+    creados = []
+    for tabla in tablas or INDICES:
+        for nombre, columnas in INDICES[tabla]:
+            if (tabla, nombre) in existentes:
+                continue
+            print(f"Creando índice {nombre} en {tabla}...")
+            cursor.execute(f"CREATE INDEX {nombre} ON {tabla} ({columnas})")
+            creados.append(nombre)
+    return creados
+
 
-def crear_base_datos():
+def crear_base_datos(particionar: Optional[str] = None):
+    """Crea la base de datos, las tablas y los índices que falten.
+
+    Con ``particionar`` (``"dia"`` o ``"mes"``) además particiona por fecha las
+    tablas de ``particiones.TABLAS_PARTICIONADAS`` que aún no lo estén.
+    """
     try:
         # Crear la BD si no existe
         cnx = mysql.connector.connect(
@@ -100,6 +175,10 @@ def crear_base_datos():
         for name, ddl in TABLES.items():
             print(f"Creando tabla {name}...")
             cursor.execute(ddl)
+        crear_indices(cursor)
+        if particionar:
+            for tabla in particiones.TABLAS_PARTICIONADAS:
+                particiones.particionar_tabla(cursor, CONFIG["database"], tabla, particionar)
         cnx.commit()
         cursor.close()
         cnx.close()
@@ -111,16 +190,53 @@ def crear_base_datos():
 class DataFetcher:
     """Encapsula operaciones de lectura contra la base de datos del invernadero."""
 
-    def __init__(self, config: Optional[Dict[str, Any]] = None) -> None:
+    LATEST_QUERIES = {
+        "clima": "SELECT * FROM clima_data ORDER BY timestamp DESC LIMIT 1",
+        "riego": "SELECT * FROM riego_data ORDER BY timestamp DESC LIMIT 1",
+        "plantas": "SELECT * FROM plantas_data ORDER BY timestamp DESC LIMIT 1",
+    }
+    HISTORY_TABLES = ("clima_data", "riego_data", "plantas_data")
+    # Las lecturas incrementales (``since_ids``) repiten los últimos
+    # HISTORY_OVERLAP_IDS ids ya vistos: con varios hilos de escritura en el
+    # middleware, un lote con ids menores puede confirmarse después de otro
+    # con ids mayores que ya se leyó. El llamador descarta los repetidos por id.
+    HISTORY_OVERLAP_IDS = 200
+    PROCESSED_COLUMNS = (
+        "id, zona, especie, indice_estres, rendimiento_frutos, eficiencia_luz, "
+        "necesidad_riego, ajuste_nutricion, timestamp"
+    )
+    PROCESSED_QUERY = (
+        f"SELECT {PROCESSED_COLUMNS} FROM resultados_funciones ORDER BY timestamp DESC LIMIT %s"
+    )
+    # Periodos de hasta RAW_RANGE se leen de las tablas crudas; los más largos,
+    # del mínimo y el máximo de cada intervalo de los rollups. En ambos casos se
+    # reducen a DOWNSAMPLE_POINTS por métrica.
+    RAW_RANGE = timedelta(hours=1)
+    DOWNSAMPLE_POINTS = 500
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, cache: Optional[CacheTTL] = None) -> None:
         self._config = config or DEFAULT_CONFIG
+        # Caché compartida opcional (database/cache.py): las lecturas públicas
+        # se sirven de ella mientras no caduquen.
+        self._cache = cache
+        # El esquema no cambia mientras el proceso está en marcha: cada
+        # consulta a information_schema se hace una sola vez.
+        self._columns_cache: Dict[Tuple[str, str], bool] = {}
+
+    def _cached(self, key: Tuple[Any, ...], load):
+        if self._cache is None:
+            return load()
+        return self._cache.obtener((self._config.get("host"), self._config.get("database"), *key), load)
+
+    def cache_statistics(self) -> Dict[str, Any]:
+        """Aciertos, fallos y peticiones agrupadas de la caché (vacío si no hay caché)."""
+        return self._cache.estadisticas() if self._cache is not None else {}
 
     @contextmanager
     def _connection(self):
-        cnx = mysql.connector.connect(**self._config)
-        try:
+        # Conexión prestada del pool compartido del proceso; al cerrarla vuelve al pool.
+        with obtener_pool(self._config).conexion() as cnx:
             yield cnx
-        finally:
-            cnx.close()
 
     def _fetchone(self, cursor, query: str, params: Optional[Iterable[Any]] = None) -> Optional[Dict[str, Any]]:
         cursor.execute(query, params or ())
@@ -143,31 +259,285 @@ class DataFetcher:
                 normalised[key] = value
         return normalised
 
-    def get_latest_sensor_data(self) -> Dict[str, Optional[Dict[str, Any]]]:
-        """Devuelve los registros más recientes de clima, riego y plantas."""
-        latest_queries = {
-            "clima": "SELECT * FROM clima_data ORDER BY timestamp DESC LIMIT 1",
-            "riego": "SELECT * FROM riego_data ORDER BY timestamp DESC LIMIT 1",
-            "plantas": "SELECT * FROM plantas_data ORDER BY timestamp DESC LIMIT 1",
+    @staticmethod
+    def _fetch_columns(cursor, query: str, params: Optional[Iterable[Any]] = None) -> Dict[str, List[Any]]:
+        """Resultado de ``query`` como ``{columna: [valores]}`` con tipos nativos.
+
+        ``cursor`` debe devolver tuplas. A diferencia de ``_fetchall`` las
+        fechas se quedan como ``datetime`` (sin pasar por ISO), listas para
+        convertirlas en arrays de NumPy; solo los ``Decimal`` pasan a float.
+        """
+        cursor.execute(query, params or ())
+        rows = cursor.fetchall() or []
+        names = [description[0] for description in cursor.description or ()]
+        columns: Dict[str, List[Any]] = {name: list(values) for name, values in zip(names, zip(*rows))}
+        for name, values in columns.items():
+            if isinstance(next((value for value in values if value is not None), None), Decimal):
+                columns[name] = [float(value) if value is not None else None for value in values]
+        return columns if rows else {name: [] for name in names}
+
+    @staticmethod
+    def merge_columns(
+        window: Dict[str, List[Any]], delta: Dict[str, List[Any]], limit: int
+    ) -> Dict[str, List[Any]]:
+        """Añade ``delta`` a ``window`` (ambos por columnas) y conserva las últimas ``limit`` filas.
+
+        Las filas de ``delta`` cuyo ``id`` ya está en ``window`` (el solape de
+        ``HISTORY_OVERLAP_IDS``) se descartan, y el resultado se ordena por
+        ``timestamp``: una fila confirmada tarde o reenviada desde el spool
+        queda en su sitio y no al final.
+        """
+        if not delta:
+            return window
+        window_size = len(next(iter(window.values()), []))
+        delta_size = len(next(iter(delta.values()), []))
+        merged = {
+            key: (window.get(key) or [None] * window_size) + (delta.get(key) or [None] * delta_size)
+            for key in dict.fromkeys([*window, *delta])
         }
-        payload: Dict[str, Optional[Dict[str, Any]]] = {key: None for key in latest_queries}
+        ids = merged.get("id") or [None] * (window_size + delta_size)
+        seen = {value for value in ids[:window_size] if value is not None}
+        keep = list(range(window_size)) + [
+            index for index in range(window_size, window_size + delta_size) if ids[index] not in seen
+        ]
+        times = merged.get("timestamp")
+        if times is not None:
+            keep.sort(key=lambda index: (times[index] is None, times[index] or datetime.min, ids[index] or 0))
+        return {key: [values[index] for index in keep][-limit:] for key, values in merged.items()}
+
+    def _window_columns(
+        self, cursor, table: str, columns: str, limit: int, since_id: Optional[int]
+    ) -> Dict[str, List[Any]]:
+        """Últimas ``limit`` filas de ``table`` o, con ``since_id``, las posteriores a ese id.
+
+        Con ``since_id`` se repiten además los ``HISTORY_OVERLAP_IDS`` ids
+        anteriores, por si alguno se confirmó después de leerlo. Por columnas y
+        ya ordenadas por ``timestamp`` de la más antigua a la más nueva (la
+        subconsulta elige las filas y MySQL las ordena).
+        """
+        if since_id is None:
+            inner = f"SELECT {columns} FROM {table} ORDER BY timestamp DESC LIMIT %s"
+            params: Tuple[Any, ...] = (limit,)
+        else:
+            inner = f"SELECT {columns} FROM {table} WHERE id > %s ORDER BY id DESC LIMIT %s"
+            params = (since_id - self.HISTORY_OVERLAP_IDS, limit + self.HISTORY_OVERLAP_IDS)
+        return self._fetch_columns(cursor, f"SELECT * FROM ({inner}) AS ventana ORDER BY timestamp, id", params)
+
+    def _read_state(self, cnx) -> Dict[str, List[Dict[str, Any]]]:
+        cursor = cnx.cursor()
+        try:
+            return {
+                table: [self._normalise_row(row) for row in rows]
+                for table, rows in estado_actual.leer(cursor).items()
+            }
+        except Error as err:
+            # Sin la tabla (el middleware aún no la ha creado) se usa la consulta directa.
+            if err.errno != errorcode.ER_NO_SUCH_TABLE:
+                print(f"[DataFetcher] Error leyendo el estado actual: {err}")
+            return {}
+        finally:
+            cursor.close()
+
+    def _read_latest(self, cnx) -> Dict[str, Optional[Dict[str, Any]]]:
+        payload: Dict[str, Optional[Dict[str, Any]]] = {key: None for key in self.LATEST_QUERIES}
+        state = self._read_state(cnx)
+        for key in self.LATEST_QUERIES:
+            rows = state.get(f"{key}_data")
+            if rows:
+                payload[key] = rows[0]
+        pending = [key for key, row in payload.items() if row is None]
+        if pending:
+            cursor = cnx.cursor(dictionary=True)
+            for key in pending:
+                payload[key] = self._fetchone(cursor, self.LATEST_QUERIES[key])
+            cursor.close()
+        return payload
+
+    def _alerts_query(self, cursor) -> str:
+        if self._column_exists(cursor, "alertas_criticas", "resolved"):
+            return (
+                "SELECT zona, especie, tipo_alerta, timestamp FROM alertas_criticas "
+                "WHERE resolved = FALSE ORDER BY timestamp DESC LIMIT %s"
+            )
+        return (
+            "SELECT zona, especie, tipo_alerta, timestamp FROM alertas_criticas "
+            "ORDER BY timestamp DESC LIMIT %s"
+        )
+
+    def get_latest_sensor_data(self) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Devuelve los registros más recientes de clima, riego y plantas.
+
+        Se leen de ``estado_actual`` con una sola consulta; las tablas que aún
+        no tienen estado (base de datos anterior) se consultan directamente.
+        """
+        return self._cached(("latest",), self._load_latest_sensor_data)
+
+    def _load_latest_sensor_data(self) -> Dict[str, Optional[Dict[str, Any]]]:
+        payload: Dict[str, Optional[Dict[str, Any]]] = {key: None for key in self.LATEST_QUERIES}
         try:
             with self._connection() as cnx:
-                cursor = cnx.cursor(dictionary=True)
-                for key, query in latest_queries.items():
-                    payload[key] = self._fetchone(cursor, query)
-                cursor.close()
+                payload = self._read_latest(cnx)
         except Error as err:
             # Mantener trazas simples para depuración de despliegues.
             print(f"[DataFetcher] Error leyendo los datos más recientes: {err}")
         return payload
 
+    def get_latest_state(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Última muestra de cada zona/especie por tabla, de la más nueva a la más antigua."""
+        return self._cached(("latest_state",), self._load_latest_state)
+
+    def _load_latest_state(self) -> Dict[str, List[Dict[str, Any]]]:
+        state: Dict[str, List[Dict[str, Any]]] = {}
+        try:
+            with self._connection() as cnx:
+                state = self._read_state(cnx)
+        except Error as err:
+            print(f"[DataFetcher] Error leyendo el estado actual: {err}")
+        return state
+
+    def get_dashboard_snapshot(
+        self,
+        history_limit: int = 50,
+        processed_limit: int = 50,
+        alert_limit: int = 20,
+        since_ids: Optional[Dict[str, int]] = None,
+    ) -> Dict[str, Any]:
+        """Todos los datos de un refresco del dashboard con una sola conexión.
+
+        Devuelve:
+
+        * ``latest``: como ``get_latest_sensor_data``.
+        * ``history``: por tabla de sensores, ``{columna: [valores]}`` de las
+          últimas ``history_limit`` filas, de la más antigua a la más nueva
+          (ordenadas en SQL, con las fechas como ``datetime``).
+        * ``processed``: igual para ``resultados_funciones``.
+        * ``alerts``: como ``get_active_alerts`` (filas, de la más nueva a la más antigua).
+        * ``last_ids``: mayor ``id`` leído por tabla.
+
+        Con ``since_ids`` (el ``last_ids`` del refresco anterior) las tablas
+        incluidas solo devuelven las filas nuevas y las del solape
+        ``HISTORY_OVERLAP_IDS``; el llamador mantiene la ventana completa con
+        ``merge_columns``, que descarta las repetidas.
+
+        Con caché, todos los llamadores comparten la ventana completa y las
+        filas nuevas de cada uno se filtran en memoria.
+        """
+        if self._cache is None:
+            return self._load_dashboard_snapshot(history_limit, processed_limit, alert_limit, since_ids)
+        snapshot = self._cached(
+            ("dashboard_snapshot", history_limit, processed_limit, alert_limit),
+            lambda: self._load_dashboard_snapshot(history_limit, processed_limit, alert_limit),
+        )
+        return self._snapshot_since(snapshot, since_ids or {})
+
+    def _snapshot_since(self, snapshot: Dict[str, Any], since_ids: Dict[str, int]) -> Dict[str, Any]:
+        """Copia de ``snapshot`` con solo las filas posteriores a ``since_ids`` (con solape)."""
+        if not since_ids:
+            return snapshot
+
+        def after(columns: Dict[str, List[Any]], since_id: Optional[int]) -> Dict[str, List[Any]]:
+            if since_id is None:
+                return columns
+            since_id -= self.HISTORY_OVERLAP_IDS
+            keep = [index for index, value in enumerate(columns.get("id", [])) if value is not None and value > since_id]
+            return {key: [values[index] for index in keep] for key, values in columns.items()}
+
+        last_ids = dict(since_ids)
+        for table, last_id in snapshot["last_ids"].items():
+            last_ids[table] = max(last_id, since_ids.get(table, 0))
+        return {
+            **snapshot,
+            "history": {table: after(columns, since_ids.get(table)) for table, columns in snapshot["history"].items()},
+            "processed": after(snapshot["processed"], since_ids.get("resultados_funciones")),
+            "last_ids": last_ids,
+        }
+
+    def get_dashboard_history(
+        self,
+        history_limit: int = 50,
+        processed_limit: int = 50,
+        since_ids: Optional[Dict[str, int]] = None,
+    ) -> Dict[str, Any]:
+        """Solo las series de ``get_dashboard_snapshot``: ``history``, ``processed`` y ``last_ids``.
+
+        Para los paneles que se refrescan a otro ritmo que los valores
+        actuales y las alertas. Como allí, con ``since_ids`` se repiten los
+        ids del solape y el llamador descarta los que ya tiene.
+        """
+        if self._cache is None:
+            return self._load_dashboard_snapshot(history_limit, processed_limit, 0, since_ids, live=False)
+        snapshot = self._cached(
+            ("dashboard_history", history_limit, processed_limit),
+            lambda: self._load_dashboard_snapshot(history_limit, processed_limit, 0, live=False),
+        )
+        return self._snapshot_since(snapshot, since_ids or {})
+
+    def _load_dashboard_snapshot(
+        self,
+        history_limit: int,
+        processed_limit: int,
+        alert_limit: int,
+        since_ids: Optional[Dict[str, int]] = None,
+        live: bool = True,
+    ) -> Dict[str, Any]:
+        # ``live=False`` omite los últimos valores y las alertas.
+        since_ids = since_ids or {}
+        snapshot: Dict[str, Any] = {
+            "latest": {key: None for key in self.LATEST_QUERIES},
+            "history": {table: {} for table in self.HISTORY_TABLES},
+            "processed": {},
+            "alerts": [],
+            "last_ids": dict(since_ids),
+        }
+        if not live:
+            del snapshot["latest"], snapshot["alerts"]
+        try:
+            with self._connection() as cnx:
+                state = self._read_state(cnx) if live else {}
+                cursor = cnx.cursor(dictionary=True)
+                columns_cursor = cnx.cursor()
+                for table in self.HISTORY_TABLES:
+                    history = self._window_columns(columns_cursor, table, "*", history_limit, since_ids.get(table))
+                    snapshot["history"][table] = history
+                    self._update_last_id(snapshot["last_ids"], table, history.get("id", []))
+                    if not live:
+                        continue
+                    # Sin estado_actual, la fila más reciente del historial hace de último valor.
+                    key = table.replace("_data", "")
+                    if state.get(table):
+                        snapshot["latest"][key] = state[table][0]
+                    elif history.get("id"):
+                        snapshot["latest"][key] = self._normalise_row({name: values[-1] for name, values in history.items()})
+                    elif table in since_ids:
+                        snapshot["latest"][key] = self._fetchone(cursor, self.LATEST_QUERIES[key])
+                processed = self._window_columns(
+                    columns_cursor, "resultados_funciones", self.PROCESSED_COLUMNS,
+                    processed_limit, since_ids.get("resultados_funciones"),
+                )
+                snapshot["processed"] = processed
+                self._update_last_id(snapshot["last_ids"], "resultados_funciones", processed.get("id", []))
+                if live:
+                    snapshot["alerts"] = self._fetchall(cursor, self._alerts_query(cursor), (alert_limit,))
+                columns_cursor.close()
+                cursor.close()
+        except Error as err:
+            print(f"[DataFetcher] Error leyendo los datos del dashboard: {err}")
+        return snapshot
+
+    @staticmethod
+    def _update_last_id(last_ids: Dict[str, int], table: str, ids: List[Optional[int]]) -> None:
+        ids = [value for value in ids if value is not None]
+        if ids:
+            last_ids[table] = max(ids + [last_ids.get(table, 0)])
+
     def get_recent_data(self, table: str, limit: int = 50) -> List[Dict[str, Any]]:
         """Devuelve registros históricos ordenados de más nuevo a más antiguo."""
         allowed_tables = {"clima_data", "riego_data", "plantas_data"}
         if table not in allowed_tables:
             raise ValueError(f"Tabla no permitida: {table}")
+        return self._cached(("recent_data", table, limit), lambda: self._load_recent_data(table, limit))
 
+    def _load_recent_data(self, table: str, limit: int) -> List[Dict[str, Any]]:
         query = f"SELECT * FROM {table} ORDER BY timestamp DESC LIMIT %s"
         rows: List[Dict[str, Any]] = []
         try:
@@ -181,16 +551,14 @@ class DataFetcher:
 
     def get_processed_data(self, limit: int = 100) -> List[Dict[str, Any]]:
         """Devuelve resultados procesados por el middleware."""
-        query = (
-            "SELECT zona, especie, indice_estres, rendimiento_frutos, eficiencia_luz, "
-            "necesidad_riego, ajuste_nutricion, timestamp "
-            "FROM resultados_funciones ORDER BY timestamp DESC LIMIT %s"
-        )
+        return self._cached(("processed_data", limit), lambda: self._load_processed_data(limit))
+
+    def _load_processed_data(self, limit: int) -> List[Dict[str, Any]]:
         rows: List[Dict[str, Any]] = []
         try:
             with self._connection() as cnx:
                 cursor = cnx.cursor(dictionary=True)
-                rows = self._fetchall(cursor, query, (limit,))
+                rows = self._fetchall(cursor, self.PROCESSED_QUERY, (limit,))
                 cursor.close()
         except Error as err:
             print(f"[DataFetcher] Error leyendo datos procesados: {err}")
@@ -198,36 +566,214 @@ class DataFetcher:
 
     def get_active_alerts(self, limit: int = 20) -> List[Dict[str, Any]]:
         """Devuelve alertas no resueltas, si la columna existe."""
+        return self._cached(("active_alerts", limit), lambda: self._load_active_alerts(limit))
+
+    def _load_active_alerts(self, limit: int) -> List[Dict[str, Any]]:
         alerts: List[Dict[str, Any]] = []
         try:
             with self._connection() as cnx:
                 cursor = cnx.cursor(dictionary=True)
-                resolved_exists = self._column_exists(cursor, "alertas_criticas", "resolved")
-                if resolved_exists:
-                    query = (
-                        "SELECT zona, especie, tipo_alerta, timestamp FROM alertas_criticas "
-                        "WHERE resolved = FALSE ORDER BY timestamp DESC LIMIT %s"
+                alerts = self._fetchall(cursor, self._alerts_query(cursor), (limit,))
+                cursor.close()
+        except Error as err:
+            print(f"[DataFetcher] Error leyendo alertas: {err}")
+        return alerts
+
+    def get_rollup_summary(
+        self, table: str, since: datetime, until: Optional[datetime] = None
+    ) -> Dict[str, Dict[str, float]]:
+        """Media, mínimo, máximo y desviación de cada variable de ``table`` desde los rollups."""
+        if table not in rollups.ESQUEMA:
+            raise ValueError(f"Tabla no permitida: {table}")
+        summary: Dict[str, Dict[str, float]] = {}
+        try:
+            with self._connection() as cnx:
+                cursor = cnx.cursor()
+                summary = rollups.resumir(cursor, table, since, until)
+                cursor.close()
+        except Error as err:
+            print(f"[DataFetcher] Error leyendo el resumen de {table}: {err}")
+        return summary
+
+    def get_rollup_series(
+        self,
+        table: str,
+        since: datetime,
+        until: Optional[datetime] = None,
+        granularity: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Media por intervalo y variable de ``table``, de más antiguo a más nuevo.
+
+        Si no se indica ``granularity`` se usa la más fina que no supere 500
+        intervalos en el periodo.
+        """
+        if table not in rollups.ESQUEMA:
+            raise ValueError(f"Tabla no permitida: {table}")
+        until = until or datetime.now()
+        granularity = granularity or rollups.granularidad_para(since, until)
+        rows: List[Dict[str, Any]] = []
+        try:
+            with self._connection() as cnx:
+                cursor = cnx.cursor(dictionary=True)
+                rows = self._fetchall(
+                    cursor,
+                    rollups.consulta_serie(granularity),
+                    (table, rollups.truncar(since, granularity), until),
+                )
+                cursor.close()
+        except Error as err:
+            print(f"[DataFetcher] Error leyendo la serie agregada de {table}: {err}")
+        return rows
+
+    def get_range_series(
+        self,
+        table: str,
+        window: timedelta,
+        metrics: Sequence[str],
+        max_points: int = DOWNSAMPLE_POINTS,
+    ) -> Dict[str, List[Any]]:
+        """Serie de ``metrics`` de ``table`` en la última ``window``, por columnas.
+
+        Devuelve ``{columna: [valores]}`` de más antiguo a más nuevo, con como
+        mucho ``max_points`` puntos por métrica (``downsampling.reducir``).
+        """
+        if table not in rollups.ESQUEMA:
+            raise ValueError(f"Tabla no permitida: {table}")
+        unknown = set(metrics) - set(rollups.ESQUEMA[table][2])
+        if unknown:
+            raise ValueError(f"Métricas no permitidas en {table}: {', '.join(sorted(unknown))}")
+        return self._cached(
+            ("range_series", table, window.total_seconds(), tuple(metrics), max_points),
+            lambda: self._load_range_series(table, window, list(metrics), max_points),
+        )
+
+    def _load_range_series(
+        self, table: str, window: timedelta, metrics: List[str], max_points: int
+    ) -> Dict[str, List[Any]]:
+        until = datetime.now()
+        since = until - window
+        columns: Dict[str, List[Any]] = {"timestamp": [], **{metric: [] for metric in metrics}}
+        try:
+            with self._connection() as cnx:
+                cursor = cnx.cursor()
+                if window > self.RAW_RANGE:
+                    # Mínimo y máximo de cada intervalo (la media aplanaría los picos)
+                    # como dos puntos, al inicio y a mitad del intervalo; LTTB elige
+                    # después entre ellos.
+                    granularity = rollups.granularidad_para(since, until, max_points * 10)
+                    cursor.execute(
+                        rollups.consulta_serie(granularity),
+                        (table, rollups.truncar(since, granularity), until),
                     )
-                    alerts = self._fetchall(cursor, query, (limit,))
+                    by_bucket: Dict[datetime, Dict[str, Tuple[Any, Any]]] = {}
+                    for bucket, variable, _mean, minimum, maximum, _n in cursor.fetchall():
+                        if variable in metrics:
+                            by_bucket.setdefault(bucket, {})[variable] = (minimum, maximum)
+                    columns = self._envelope_columns(by_bucket, metrics, rollups.DURACION[granularity] / 2)
                 else:
-                    query = (
-                        "SELECT zona, especie, tipo_alerta, timestamp FROM alertas_criticas "
-                        "ORDER BY timestamp DESC LIMIT %s"
+                    columns = self._fetch_columns(
+                        cursor,
+                        f"SELECT timestamp, {', '.join(metrics)} FROM {table} "
+                        "WHERE timestamp >= %s AND timestamp < %s ORDER BY timestamp",
+                        (since, until),
                     )
-                    alerts = self._fetchall(cursor, query, (limit,))
                 cursor.close()
         except Error as err:
-            print(f"[DataFetcher] Error leyendo alertas: {err}")
-        return alerts
+            print(f"[DataFetcher] Error leyendo la serie de {table}: {err}")
+        return downsampling.reducir(columns, metrics, max_points)
+
+    @staticmethod
+    def _envelope_columns(
+        by_bucket: Dict[datetime, Dict[str, Tuple[Any, Any]]], metrics: List[str], half: timedelta
+    ) -> Dict[str, List[Any]]:
+        """Dos filas por intervalo con el mínimo y el máximo de cada métrica.
+
+        En cada intervalo va primero el extremo más cercano al valor anterior,
+        para que la línea no zigzaguee más de lo que lo hicieron los datos.
+        """
+        columns: Dict[str, List[Any]] = {"timestamp": [], **{metric: [] for metric in metrics}}
+        last: Dict[str, Optional[float]] = {metric: None for metric in metrics}
+        for bucket, values in by_bucket.items():
+            columns["timestamp"] += [bucket, bucket + half]
+            for metric in metrics:
+                low, high = (None if value is None else float(value) for value in values.get(metric, (None, None)))
+                previous = last[metric]
+                if previous is not None and low is not None and abs(previous - high) < abs(previous - low):
+                    low, high = high, low
+                columns[metric] += [low, high]
+                if high is not None:
+                    last[metric] = high
+        return columns
 
     def _column_exists(self, cursor, table: str, column: str) -> bool:
+        cached = self._columns_cache.get((table, column))
+        if cached is not None:
+            return cached
         query = (
             "SELECT COUNT(*) as total FROM information_schema.columns "
             "WHERE table_schema = %s AND table_name = %s AND column_name = %s"
         )
         cursor.execute(query, (self._config["database"], table, column))
         result = cursor.fetchone()
-        return bool(result and result.get("total"))
+        exists = bool(result and result.get("total"))
+        self._columns_cache[(table, column)] = exists
+        return exists
+
+
+def reconstruir_rollups() -> None:
+    """Recalcula la tabla ``rollups`` a partir de los datos crudos existentes."""
+    try:
+        cnx = mysql.connector.connect(**CONFIG)
+        try:
+            cursor = cnx.cursor()
+            rollups.reconstruir(cursor)
+            cnx.commit()
+            cursor.close()
+        finally:
+            cnx.close()
+        print("Rollups reconstruidos correctamente.")
+    except mysql.connector.Error as err:
+        print("Error:", err)
+
+
+def aplicar_retencion(dias: int = particiones.DIAS_RETENCION) -> None:
+    """Crea los periodos futuros y elimina las particiones caducadas."""
+    try:
+        cnx = mysql.connector.connect(**CONFIG)
+        try:
+            resumen = particiones.mantener_particiones(cnx, CONFIG["database"], dias)
+        finally:
+            cnx.close()
+    except mysql.connector.Error as err:
+        print("Error:", err)
+        return
+    for tabla, cambios in resumen.items():
+        print(f"{tabla}: creadas {cambios['creadas']}, eliminadas {cambios['eliminadas']}")
+    if not resumen:
+        print("No hay particiones que crear ni eliminar.")
+
 
 if __name__ == "__main__":
-    crear_base_datos()
+    parser = argparse.ArgumentParser(description="Crea y mantiene la base de datos del invernadero.")
+    parser.add_argument(
+        "--particionar",
+        choices=particiones.GRANULARIDADES,
+        help="particiona por día o por mes las tablas de series temporales",
+    )
+    parser.add_argument(
+        "--retencion",
+        type=int,
+        metavar="DIAS",
+        help="elimina las particiones con datos de hace más de DIAS días",
+    )
+    parser.add_argument(
+        "--reconstruir-rollups",
+        action="store_true",
+        help="recalcula los agregados por minuto/hora/día desde las tablas crudas",
+    )
+    args = parser.parse_args()
+    crear_base_datos(args.particionar)
+    if args.reconstruir_rollups:
+        reconstruir_rollups()
+    if args.retencion is not None:
+        aplicar_retencion(args.retencion)
@@ -0,0 +1,101 @@
+"""Reducción de series temporales para periodos largos del dashboard.
+
+Con periodos de horas o días, las tablas crudas (una muestra cada 2 s por
+zona) o incluso los rollups por minuto devuelven miles de puntos por traza.
+``reducir`` los limita a un presupuesto fijo con Largest-Triangle-Three-Buckets
+(LTTB): cada intervalo conserva el punto que forma el triángulo de mayor área
+con sus vecinos, así que los picos y valles se mantienen aunque se descarte la
+mayor parte de las filas. El coste de dibujar y transferir la gráfica queda
+acotado sea cual sea el periodo.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def lttb(x: Sequence[float], y: Sequence[float], umbral: int) -> np.ndarray:
+    """Índices de los ``umbral`` puntos que LTTB conserva de la serie ``x``/``y``.
+
+    ``x`` debe estar ordenado de forma creciente y no contener NaN. Con
+    ``umbral`` menor que 3 o mayor o igual que el número de puntos se
+    devuelven todos los índices.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if umbral < 3 or umbral >= n:
+        return np.arange(n)
+
+    # ``umbral - 2`` intervalos entre el primer y el último punto, que se
+    # conservan siempre; el último "intervalo siguiente" es el punto final.
+    bordes = np.append(np.floor(np.linspace(1, n - 1, umbral - 1)).astype(np.intp), n)
+    indices = np.empty(umbral, dtype=np.intp)
+    indices[0], indices[-1] = 0, n - 1
+    elegido = 0
+    for cubo in range(umbral - 2):
+        inicio, fin = bordes[cubo], bordes[cubo + 1]
+        media_x = x[fin:bordes[cubo + 2]].mean()
+        media_y = y[fin:bordes[cubo + 2]].mean()
+        ax, ay = x[elegido], y[elegido]
+        areas = np.abs((ax - media_x) * (y[inicio:fin] - ay) - (ax - x[inicio:fin]) * (media_y - ay))
+        elegido = inicio + int(np.argmax(areas))
+        indices[cubo + 1] = elegido
+    return indices
+
+
+def fechas(tiempos: Sequence[Any]) -> np.ndarray:
+    """``datetime`` (o cadenas ISO) como ``datetime64[us]``; NaT donde no hay fecha válida."""
+    # pandas convierte listas de ``datetime`` en C, bastante más rápido que ``np.asarray``.
+    return np.asarray(pd.to_datetime(list(tiempos), errors="coerce", format="ISO8601"), dtype="datetime64[us]")
+
+
+def segundos(tiempos: Sequence[Any]) -> np.ndarray:
+    """Fechas como segundos en float; NaN donde no hay fecha válida."""
+    momentos = fechas(tiempos)
+    resultado = momentos.astype(np.int64) / 1e6
+    resultado[np.isnat(momentos)] = np.nan
+    return resultado
+
+
+def numeros(valores: Sequence[Any]) -> np.ndarray:
+    """Valores como array float; ``None`` y lo que no es numérico pasan a NaN."""
+    try:
+        return np.asarray(valores, dtype=float)
+    except (TypeError, ValueError):
+        return np.array([_numero(valor) for valor in valores], dtype=float)
+
+
+def _numero(valor: Any) -> float:
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def reducir(columnas: Dict[str, List[Any]], metricas: Sequence[str], max_puntos: int) -> Dict[str, List[Any]]:
+    """Subconjunto de las filas de ``columnas`` con como mucho ``max_puntos`` por métrica.
+
+    ``columnas`` es ``{columna: [valores]}`` ordenado por ``timestamp`` de
+    más antiguo a más nuevo. Las métricas comparten eje temporal, así que el
+    presupuesto se reparte entre ellas y se conserva la unión de los puntos
+    que LTTB elige para cada una.
+    """
+    tiempos = columnas.get("timestamp") or []
+    if len(tiempos) <= max_puntos or not metricas:
+        return columnas
+
+    x = segundos(tiempos)
+    presupuesto = max(3, max_puntos // len(metricas))
+    conservados = set()
+    for metrica in metricas:
+        y = numeros(columnas.get(metrica, []))
+        if len(y) != len(x):
+            continue
+        validos = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+        conservados.update(validos[lttb(x[validos], y[validos], presupuesto)].tolist())
+
+    orden = sorted(conservados)
+    return {columna: [valores[indice] for indice in orden] for columna, valores in columnas.items()}
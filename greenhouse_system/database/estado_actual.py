@@ -0,0 +1,89 @@
+"""Últimos valores conocidos de cada zona/especie, mantenidos por el middleware.
+
+El dashboard necesita en cada refresco la lectura más reciente de clima, riego
+y plantas. En lugar de buscarla con ``ORDER BY timestamp DESC LIMIT 1`` sobre
+tablas que no paran de crecer, el middleware servidor guarda en
+``estado_actual`` una fila por tabla y zona/especie con los valores de la
+última muestra (``UPSERT``, en la misma transacción que las inserciones). La
+tabla tiene tantas filas como zonas y especies, así que leerla no depende del
+volumen histórico.
+
+Una muestra más antigua que la guardada (p. ej. reenviada desde el spool del
+middleware cliente) no sustituye a la actual.
+"""
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DDL = (
+    "CREATE TABLE IF NOT EXISTS estado_actual ("
+    "  tabla VARCHAR(32) NOT NULL,"
+    "  clave VARCHAR(100) NOT NULL DEFAULT '',"
+    "  valores JSON NOT NULL,"
+    "  timestamp DATETIME NOT NULL,"
+    "  PRIMARY KEY (tabla, clave)"
+    ") ENGINE=InnoDB"
+)
+
+# ``valores`` se asigna antes que ``timestamp``: MySQL evalúa las asignaciones
+# en orden, así que la comparación usa todavía el timestamp guardado.
+UPSERT = (
+    "INSERT INTO estado_actual (tabla, clave, valores, timestamp) "
+    "VALUES (%s, %s, %s, %s) "
+    "ON DUPLICATE KEY UPDATE "
+    "valores = IF(VALUES(timestamp) >= timestamp, VALUES(valores), valores), "
+    "timestamp = GREATEST(timestamp, VALUES(timestamp))"
+)
+
+# Columnas de la tupla de valores de ``database_handler.QUERIES`` (sin el
+# timestamp final) y posición de la clave zona/especie, si la hay.
+COLUMNAS: Dict[str, Tuple[Optional[int], Tuple[str, ...]]] = {
+    "clima_data": (0, ("zona", "temperatura", "humedad", "co2", "intensidad_luz", "presion")),
+    "plantas_data": (0, ("especie", "crecimiento", "cantidad_frutos", "calidad_frutos", "nivel_salud")),
+    "riego_data": (None, ("ph", "conductividad", "flujo", "nivel_deposito", "caudal_historico")),
+}
+
+
+def filas_upsert(filas_por_tabla: Dict[str, Sequence[tuple]]) -> List[tuple]:
+    """Filas de ``UPSERT`` con la muestra más reciente de cada tabla y clave del lote."""
+    ultimas: Dict[Tuple[str, str], tuple] = {}
+    for tabla, filas in filas_por_tabla.items():
+        if tabla not in COLUMNAS:
+            continue
+        posicion_clave, columnas = COLUMNAS[tabla]
+        for valores in filas:
+            momento = valores[-1] if isinstance(valores[-1], datetime) else datetime.now()
+            clave = "" if posicion_clave is None or valores[posicion_clave] is None else str(valores[posicion_clave])
+            previa = ultimas.get((tabla, clave))
+            if previa is None or momento >= previa[1]:
+                ultimas[(tabla, clave)] = (dict(zip(columnas, valores)), momento)
+    # Orden estable de claves, como en los rollups, para no interbloquear lotes concurrentes.
+    return [
+        (tabla, clave, json.dumps(valores, default=str), momento)
+        for (tabla, clave), (valores, momento) in sorted(ultimas.items())
+    ]
+
+
+def leer(cursor, tablas: Optional[Iterable[str]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Estado actual por tabla: ``{tabla: [fila, ...]}``, de la más nueva a la más antigua.
+
+    Cada fila contiene las columnas de la tabla original más ``timestamp``.
+    ``cursor`` debe devolver tuplas (no diccionarios).
+    """
+    tablas = list(tablas or COLUMNAS)
+    marcadores = ", ".join(["%s"] * len(tablas))
+    cursor.execute(
+        "SELECT tabla, valores, timestamp FROM estado_actual "
+        f"WHERE tabla IN ({marcadores}) ORDER BY timestamp DESC",
+        tablas,
+    )
+    estado: Dict[str, List[Dict[str, Any]]] = {tabla: [] for tabla in tablas}
+    for tabla, valores, momento in cursor.fetchall():
+        if isinstance(valores, (bytes, bytearray)):
+            valores = valores.decode("utf-8")
+        fila = json.loads(valores) if isinstance(valores, str) else dict(valores)
+        fila["timestamp"] = momento
+        estado[tabla].append(fila)
+    return estado
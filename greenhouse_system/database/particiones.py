@@ -0,0 +1,222 @@
+"""Particionado por rango de fechas y retención de las tablas de series temporales.
+
+Las tablas de ``TABLAS_PARTICIONADAS`` se particionan con
+``PARTITION BY RANGE (TO_DAYS(timestamp))``, una partición por día o por mes:
+
+* ``phistorico`` guarda lo anterior al primer periodo al particionar una
+  tabla que ya tenía datos.
+* ``p<AAAAMMDD>`` / ``p<AAAAMM>`` cubren cada periodo; siempre se mantienen
+  ``PARTICIONES_FUTURAS`` periodos creados por adelantado.
+* ``pmax`` (``MAXVALUE``) recoge cualquier fila posterior.
+
+El mantenimiento detecta la granularidad de cada tabla a partir de sus
+particiones (``detectar_granularidad``), así que una tabla particionada por
+mes sigue recibiendo particiones mensuales.
+
+Las consultas por rango de ``timestamp`` solo leen las particiones afectadas y
+la retención elimina particiones completas con ``DROP PARTITION`` (operación
+de metadatos) en lugar de borrar fila a fila con ``DELETE``.
+
+MySQL exige que la columna de particionado forme parte de la clave primaria,
+así que al particionar la clave pasa a ser ``(id, timestamp)`` y ``timestamp``
+deja de admitir NULL. Particionar una tabla existente la reconstruye entera.
+"""
+from __future__ import annotations
+
+import re
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+TABLAS_PARTICIONADAS = ("clima_data", "plantas_data", "riego_data", "resultados_funciones")
+GRANULARIDADES = ("dia", "mes")
+GRANULARIDAD = "dia"
+PARTICIONES_FUTURAS = 3
+DIAS_RETENCION = 90
+
+_HISTORICO = "phistorico"
+_MAXIMO = "pmax"
+# TO_DAYS() de MySQL cuenta desde el año 0; ``date.toordinal`` desde el año 1.
+_DESFASE_TO_DAYS = 365
+
+
+def to_days(fecha: date) -> int:
+    """Equivalente en Python de ``TO_DAYS(fecha)`` de MySQL."""
+    return fecha.toordinal() + _DESFASE_TO_DAYS
+
+
+def from_days(dias: int) -> date:
+    return date.fromordinal(dias - _DESFASE_TO_DAYS)
+
+
+def inicio_periodo(fecha: date, granularidad: str) -> date:
+    return fecha.replace(day=1) if granularidad == "mes" else fecha
+
+
+def siguiente_periodo(inicio: date, granularidad: str) -> date:
+    if granularidad == "mes":
+        return (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return inicio + timedelta(days=1)
+
+
+def nombre_particion(inicio: date, granularidad: str) -> str:
+    return inicio.strftime("p%Y%m" if granularidad == "mes" else "p%Y%m%d")
+
+
+def _definicion(nombre: str, limite: date) -> str:
+    return f"PARTITION {nombre} VALUES LESS THAN ({to_days(limite)})"
+
+
+def _periodos(desde: date, hasta: date, granularidad: str) -> List[str]:
+    """Definiciones de partición para cada periodo que empieza en ``[desde, hasta]``."""
+    definiciones = []
+    inicio = desde
+    while inicio <= hasta:
+        siguiente = siguiente_periodo(inicio, granularidad)
+        definiciones.append(_definicion(nombre_particion(inicio, granularidad), siguiente))
+        inicio = siguiente
+    return definiciones
+
+
+def _objetivo(hoy: date, granularidad: str, futuras: int) -> date:
+    """Inicio del último periodo que debe existir ya."""
+    inicio = inicio_periodo(hoy, granularidad)
+    for _ in range(futuras):
+        inicio = siguiente_periodo(inicio, granularidad)
+    return inicio
+
+
+def listar_particiones(cursor, database: str, tabla: str) -> List[Tuple[str, Optional[int]]]:
+    """``(nombre, límite TO_DAYS)`` de cada partición, en orden; ``None`` para MAXVALUE."""
+    cursor.execute(
+        "SELECT partition_name, partition_description FROM information_schema.partitions "
+        "WHERE table_schema = %s AND table_name = %s AND partition_name IS NOT NULL "
+        "ORDER BY partition_ordinal_position",
+        (database, tabla),
+    )
+    particiones = []
+    for nombre, descripcion in cursor.fetchall():
+        limite = None if str(descripcion).upper() == "MAXVALUE" else int(descripcion)
+        particiones.append((nombre, limite))
+    return particiones
+
+
+def detectar_granularidad(particiones: List[Tuple[str, Optional[int]]]) -> Optional[str]:
+    """Granularidad de una tabla ya particionada; ``None`` si no se puede deducir.
+
+    Se usa el nombre de las particiones de periodo (``p<AAAAMMDD>`` o
+    ``p<AAAAMM>``) y, si no hay ninguna, sus límites: un límite que no cae en
+    día 1 solo es posible por día.
+    """
+    for nombre, _ in particiones:
+        if re.fullmatch(r"p\d{8}", nombre):
+            return "dia"
+        if re.fullmatch(r"p\d{6}", nombre):
+            return "mes"
+    limites = [from_days(limite) for _, limite in particiones if limite is not None]
+    if any(limite.day != 1 for limite in limites):
+        return "dia"
+    if len(limites) > 1 and all((b - a).days >= 28 for a, b in zip(limites, limites[1:])):
+        return "mes"
+    return None
+
+
+def particionar_tabla(
+    cursor,
+    database: str,
+    tabla: str,
+    granularidad: str = GRANULARIDAD,
+    futuras: int = PARTICIONES_FUTURAS,
+    hoy: Optional[date] = None,
+) -> bool:
+    """Particiona ``tabla`` si aún no lo está. Devuelve ``True`` si la ha modificado."""
+    if granularidad not in GRANULARIDADES:
+        raise ValueError(f"Granularidad no soportada: {granularidad}")
+    if listar_particiones(cursor, database, tabla):
+        return False
+    hoy = hoy or date.today()
+    primero = inicio_periodo(hoy, granularidad)
+
+    print(f"Particionando {tabla} por {granularidad}...")
+    cursor.execute(
+        f"ALTER TABLE {tabla} "
+        "MODIFY timestamp DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+        "DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp)"
+    )
+    definiciones = [_definicion(_HISTORICO, primero)]
+    definiciones += _periodos(primero, _objetivo(hoy, granularidad, futuras), granularidad)
+    definiciones.append(f"PARTITION {_MAXIMO} VALUES LESS THAN MAXVALUE")
+    cursor.execute(
+        f"ALTER TABLE {tabla} PARTITION BY RANGE (TO_DAYS(timestamp)) ({', '.join(definiciones)})"
+    )
+    return True
+
+
+def crear_particiones_futuras(
+    cursor,
+    database: str,
+    tabla: str,
+    granularidad: Optional[str] = None,
+    futuras: int = PARTICIONES_FUTURAS,
+    hoy: Optional[date] = None,
+) -> List[str]:
+    """Divide ``pmax`` para que existan los próximos ``futuras`` periodos.
+
+    Sin ``granularidad`` se usa la de las particiones existentes.
+    """
+    particiones = listar_particiones(cursor, database, tabla)
+    granularidad = granularidad or detectar_granularidad(particiones) or GRANULARIDAD
+    limites = [limite for _, limite in particiones if limite is not None]
+    if not limites:
+        return []
+    desde = from_days(max(limites))
+    definiciones = _periodos(desde, _objetivo(hoy or date.today(), granularidad, futuras), granularidad)
+    if not definiciones:
+        return []
+    definiciones.append(f"PARTITION {_MAXIMO} VALUES LESS THAN MAXVALUE")
+    cursor.execute(
+        f"ALTER TABLE {tabla} REORGANIZE PARTITION {_MAXIMO} INTO ({', '.join(definiciones)})"
+    )
+    return [definicion.split()[1] for definicion in definiciones[:-1]]
+
+
+def aplicar_retencion(
+    cursor, database: str, tabla: str, dias: int = DIAS_RETENCION, hoy: Optional[date] = None
+) -> List[str]:
+    """Elimina las particiones cuyos datos son todos anteriores a ``dias`` días."""
+    corte = to_days((hoy or date.today()) - timedelta(days=dias))
+    caducadas = [
+        nombre
+        for nombre, limite in listar_particiones(cursor, database, tabla)
+        if limite is not None and limite <= corte
+    ]
+    if caducadas:
+        cursor.execute(f"ALTER TABLE {tabla} DROP PARTITION {', '.join(caducadas)}")
+    return caducadas
+
+
+def mantener_particiones(
+    cnx,
+    database: str,
+    dias: Optional[int] = DIAS_RETENCION,
+    granularidad: Optional[str] = None,
+    futuras: int = PARTICIONES_FUTURAS,
+) -> Dict[str, Dict[str, List[str]]]:
+    """Tarea periódica: crea periodos futuros y aplica la retención.
+
+    Las tablas sin particionar se ignoran. Sin ``granularidad`` cada tabla
+    conserva la suya (ver ``detectar_granularidad``). ``dias=None`` desactiva
+    la retención. Devuelve las particiones creadas y eliminadas por tabla.
+    """
+    resumen: Dict[str, Dict[str, List[str]]] = {}
+    cursor = cnx.cursor()
+    try:
+        for tabla in TABLAS_PARTICIONADAS:
+            if not listar_particiones(cursor, database, tabla):
+                continue
+            creadas = crear_particiones_futuras(cursor, database, tabla, granularidad, futuras)
+            eliminadas = aplicar_retencion(cursor, database, tabla, dias) if dias is not None else []
+            if creadas or eliminadas:
+                resumen[tabla] = {"creadas": creadas, "eliminadas": eliminadas}
+    finally:
+        cursor.close()
+    return resumen
@@ -0,0 +1,125 @@
+"""Pool de conexiones MySQL compartido por todos los accesos a la base de datos.
+
+``database_handler.conectar()``, ``DataFetcher`` y ``ReportGenerator`` obtienen
+sus conexiones de aquí, de modo que las consultas en régimen estacionario
+reutilizan conexiones abiertas en lugar de repetir el handshake TCP y la
+autenticación contra MySQL.
+
+La salud de cada conexión la comprueba el propio conector al prestarla
+(``MySQLConnectionPool.get_connection`` reconecta si ``is_connected()``
+falla y, si no puede, la devuelve a la cola), así que aquí no se repite el
+ping.
+"""
+from __future__ import annotations
+
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from mysql.connector import errors, pooling
+
+# Conexiones abiertas por proceso (el conector admite como máximo 32).
+TAMANO_POOL = 5
+# Segundos que se espera a que se libere una conexión antes de fallar.
+ESPERA_MAXIMA = 5.0
+
+_contador_nombres = itertools.count(1)
+_pools: Dict[Tuple[int, Tuple[Tuple[str, Any], ...]], "PoolConexiones"] = {}
+_pools_lock = threading.Lock()
+
+
+class PoolConexiones:
+    """Envuelve ``MySQLConnectionPool`` con espera ante agotamiento y métricas."""
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        tamano: int = TAMANO_POOL,
+        espera_maxima: float = ESPERA_MAXIMA,
+    ) -> None:
+        self._config = dict(config)
+        self.tamano = tamano
+        self.espera_maxima = espera_maxima
+        self._pool: Optional[pooling.MySQLConnectionPool] = None
+        self._lock = threading.Lock()
+        self._metricas = {
+            "prestamos": 0,
+            "agotamientos": 0,
+            "espera_total_s": 0.0,
+        }
+
+    def _asegurar_pool(self) -> pooling.MySQLConnectionPool:
+        # El pool se crea en el primer uso: crearlo abre todas las conexiones.
+        with self._lock:
+            if self._pool is None:
+                self._pool = pooling.MySQLConnectionPool(
+                    pool_name=f"greenhouse_{next(_contador_nombres)}",
+                    pool_size=self.tamano,
+                    pool_reset_session=True,
+                    **self._config,
+                )
+            return self._pool
+
+    def obtener_conexion(self):
+        """Presta una conexión del pool; ``close()`` la devuelve al pool.
+
+        Si todas las conexiones están en uso se espera hasta ``espera_maxima``
+        segundos antes de propagar ``mysql.connector.errors.PoolError``.
+        """
+        pool = self._asegurar_pool()
+        inicio = time.monotonic()
+        agotado = False
+        while True:
+            try:
+                cnx = pool.get_connection()
+                break
+            except errors.PoolError:
+                if not agotado:
+                    agotado = True
+                    self._incrementar("agotamientos")
+                if time.monotonic() - inicio >= self.espera_maxima:
+                    self._incrementar("espera_total_s", time.monotonic() - inicio)
+                    raise
+                time.sleep(0.01)
+
+        if agotado:
+            self._incrementar("espera_total_s", time.monotonic() - inicio)
+        self._incrementar("prestamos")
+        return cnx
+
+    @contextmanager
+    def conexion(self) -> Iterator[Any]:
+        cnx = self.obtener_conexion()
+        try:
+            yield cnx
+        finally:
+            cnx.close()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Devuelve contadores de uso del pool (préstamos, agotamientos y tiempo de espera)."""
+        with self._lock:
+            datos = dict(self._metricas)
+        datos["tamano"] = self.tamano
+        return datos
+
+    def _incrementar(self, clave: str, cantidad: float = 1) -> None:
+        with self._lock:
+            self._metricas[clave] += cantidad
+
+
+def obtener_pool(config: Dict[str, Any], tamano: int = TAMANO_POOL) -> PoolConexiones:
+    """Devuelve el pool del proceso actual para ``config``, creándolo si hace falta.
+
+    Los pools se indexan también por PID: tras un ``fork`` el proceso hijo crea
+    sus propias conexiones en lugar de compartir los sockets del padre.
+    """
+    clave = (os.getpid(), tuple(sorted(config.items())))
+    with _pools_lock:
+        pool = _pools.get(clave)
+        if pool is None:
+            pool = PoolConexiones(config, tamano=tamano)
+            _pools[clave] = pool
+        return pool
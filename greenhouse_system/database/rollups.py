@@ -0,0 +1,271 @@
+"""Agregados continuos (rollups) de las series temporales por minuto, hora y día.
+
+Por cada variable numérica y cada zona/especie, la tabla ``rollups`` guarda
+en cada intervalo el número de muestras, la suma, el mínimo, el máximo y la
+suma de cuadrados. Con eso se obtienen media, extremos y desviación típica de
+cualquier periodo sin leer las filas crudas.
+
+El middleware los mantiene al escribir cada lote (``acumular`` + ``UPSERT`` en
+la misma transacción que las inserciones). Los lectores piden un periodo y
+``tramos`` lo descompone en los intervalos más gruesos que encajan: días
+completos en el centro, horas y minutos en los extremos.
+
+Los rollups por minuto se purgan pasados ``DIAS_RETENCION_MINUTOS`` días; los
+periodos más antiguos se resuelven con precisión de hora.
+"""
+from __future__ import annotations
+
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+GRANULARIDADES = ("minuto", "hora", "dia")
+DIAS_RETENCION_MINUTOS = 7
+
+DDL = (
+    "CREATE TABLE IF NOT EXISTS rollups ("
+    "  granularidad ENUM('minuto', 'hora', 'dia') NOT NULL,"
+    "  tabla VARCHAR(32) NOT NULL,"
+    "  variable VARCHAR(32) NOT NULL,"
+    "  clave VARCHAR(100) NOT NULL DEFAULT '',"
+    "  bucket DATETIME NOT NULL,"
+    "  n INT NOT NULL,"
+    "  suma DOUBLE NOT NULL,"
+    "  minimo DOUBLE NOT NULL,"
+    "  maximo DOUBLE NOT NULL,"
+    "  suma_cuadrados DOUBLE NOT NULL,"
+    "  PRIMARY KEY (granularidad, tabla, variable, clave, bucket),"
+    "  KEY idx_rollups_bucket (granularidad, bucket)"
+    ") ENGINE=InnoDB"
+)
+
+UPSERT = (
+    "INSERT INTO rollups "
+    "(granularidad, tabla, variable, clave, bucket, n, suma, minimo, maximo, suma_cuadrados) "
+    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s) "
+    "ON DUPLICATE KEY UPDATE "
+    "n = n + VALUES(n), "
+    "suma = suma + VALUES(suma), "
+    "minimo = LEAST(minimo, VALUES(minimo)), "
+    "maximo = GREATEST(maximo, VALUES(maximo)), "
+    "suma_cuadrados = suma_cuadrados + VALUES(suma_cuadrados)"
+)
+
+# Por tabla: posiciones de la clave (zona/especie) en la tupla de valores de
+# ``database_handler.QUERIES``, expresión SQL equivalente y posición de cada
+# variable. El timestamp es siempre el último valor.
+ESQUEMA: Dict[str, Tuple[Tuple[int, ...], str, Dict[str, int]]] = {
+    "clima_data": (
+        (0,), "COALESCE(zona, '')",
+        {"temperatura": 1, "humedad": 2, "co2": 3, "intensidad_luz": 4, "presion": 5},
+    ),
+    "plantas_data": (
+        (0,), "COALESCE(especie, '')",
+        {"crecimiento": 1, "cantidad_frutos": 2, "calidad_frutos": 3, "nivel_salud": 4},
+    ),
+    "riego_data": (
+        (), "''",
+        {"ph": 0, "conductividad": 1, "flujo": 2, "nivel_deposito": 3, "caudal_historico": 4},
+    ),
+    "resultados_funciones": (
+        (0, 1), "CONCAT(COALESCE(zona, ''), '/', COALESCE(especie, ''))",
+        {"indice_estres": 2, "rendimiento_frutos": 3, "eficiencia_luz": 4, "necesidad_riego": 5},
+    ),
+}
+
+DURACION = {"minuto": timedelta(minutes=1), "hora": timedelta(hours=1), "dia": timedelta(days=1)}
+
+_FORMATO_SQL = {"minuto": "%Y-%m-%d %H:%i:00", "hora": "%Y-%m-%d %H:00:00", "dia": "%Y-%m-%d 00:00:00"}
+
+Tramo = Tuple[str, datetime, datetime]
+
+
+def truncar(momento: datetime, granularidad: str) -> datetime:
+    """Inicio del intervalo de ``granularidad`` que contiene ``momento``."""
+    momento = momento.replace(second=0, microsecond=0)
+    if granularidad in ("hora", "dia"):
+        momento = momento.replace(minute=0)
+    if granularidad == "dia":
+        momento = momento.replace(hour=0)
+    return momento
+
+
+def _redondear_arriba(momento: datetime, granularidad: str) -> datetime:
+    inicio = truncar(momento, granularidad)
+    if inicio == momento:
+        return inicio
+    return inicio + DURACION[granularidad]
+
+
+def acumular(filas_por_tabla: Dict[str, Sequence[tuple]]) -> List[tuple]:
+    """Agrega las filas de un lote en filas de ``UPSERT`` (una por intervalo y serie)."""
+    agregados: Dict[tuple, List[float]] = {}
+    for tabla, filas in filas_por_tabla.items():
+        if tabla not in ESQUEMA or not filas:
+            continue
+        posiciones_clave, _, variables = ESQUEMA[tabla]
+        for valores in filas:
+            momento = valores[-1] if isinstance(valores[-1], datetime) else datetime.now()
+            clave = "/".join("" if valores[i] is None else str(valores[i]) for i in posiciones_clave)
+            buckets = [(granularidad, truncar(momento, granularidad)) for granularidad in GRANULARIDADES]
+            for variable, posicion in variables.items():
+                valor = valores[posicion]
+                if isinstance(valor, bool):
+                    valor = float(valor)
+                if not isinstance(valor, (int, float)) or math.isnan(valor):
+                    continue
+                for granularidad, bucket in buckets:
+                    actual = agregados.get((granularidad, tabla, variable, clave, bucket))
+                    if actual is None:
+                        agregados[(granularidad, tabla, variable, clave, bucket)] = [
+                            1, valor, valor, valor, valor * valor,
+                        ]
+                    else:
+                        actual[0] += 1
+                        actual[1] += valor
+                        actual[2] = min(actual[2], valor)
+                        actual[3] = max(actual[3], valor)
+                        actual[4] += valor * valor
+    # Orden estable de claves: dos lotes concurrentes bloquean las filas de
+    # ``rollups`` en el mismo orden y se evitan interbloqueos.
+    return [clave + tuple(valores) for clave, valores in sorted(agregados.items())]
+
+
+def tramos(desde: datetime, hasta: datetime, limite_minutos: Optional[datetime] = None) -> List[Tramo]:
+    """Descompone ``[desde, hasta)`` en intervalos ``(granularidad, inicio, fin)``.
+
+    Se usan los intervalos más gruesos posibles. ``desde`` se redondea al
+    minuto; los tramos por minuto anteriores a ``limite_minutos`` (ya
+    purgados) se amplían a horas completas.
+    """
+    inicio = truncar(desde, "minuto")
+    hora_1, dia_1 = _redondear_arriba(inicio, "hora"), _redondear_arriba(inicio, "dia")
+    hora_n, dia_n = truncar(hasta, "hora"), truncar(hasta, "dia")
+
+    if dia_1 < dia_n:
+        candidatos = [
+            ("minuto", inicio, hora_1), ("hora", hora_1, dia_1), ("dia", dia_1, dia_n),
+            ("hora", dia_n, hora_n), ("minuto", hora_n, hasta),
+        ]
+    elif hora_1 < hora_n:
+        candidatos = [("minuto", inicio, hora_1), ("hora", hora_1, hora_n), ("minuto", hora_n, hasta)]
+    else:
+        candidatos = [("minuto", inicio, hasta)]
+
+    resultado: List[Tramo] = []
+    for granularidad, tramo_inicio, tramo_fin in candidatos:
+        if tramo_inicio >= tramo_fin:
+            continue
+        if granularidad == "minuto" and limite_minutos is not None and tramo_inicio < limite_minutos:
+            granularidad = "hora"
+            tramo_inicio = truncar(tramo_inicio, "hora")
+            tramo_fin = _redondear_arriba(tramo_fin, "hora")
+        resultado.append((granularidad, tramo_inicio, tramo_fin))
+    return resultado
+
+
+def _condicion_tramos(tramos_: Iterable[Tramo]) -> Tuple[str, List[Any]]:
+    condiciones, parametros = [], []
+    for granularidad, inicio, fin in tramos_:
+        condiciones.append("(granularidad = %s AND bucket >= %s AND bucket < %s)")
+        parametros.extend((granularidad, inicio, fin))
+    return " OR ".join(condiciones), parametros
+
+
+def estadisticas(n: float, suma: float, minimo: float, maximo: float, suma_cuadrados: float) -> Dict[str, float]:
+    """Media, extremos y desviación típica poblacional a partir de los agregados."""
+    n, suma, suma_cuadrados = float(n), float(suma), float(suma_cuadrados)
+    media = suma / n
+    varianza = max(suma_cuadrados / n - media * media, 0.0)
+    return {
+        "n": int(n),
+        "media": media,
+        "minimo": float(minimo),
+        "maximo": float(maximo),
+        "desviacion": math.sqrt(varianza),
+    }
+
+
+def resumir(
+    cursor,
+    tabla: str,
+    desde: datetime,
+    hasta: Optional[datetime] = None,
+    por_clave: bool = False,
+) -> Dict[Any, Dict[str, float]]:
+    """Estadísticas de cada variable de ``tabla`` en ``[desde, hasta)``.
+
+    Devuelve ``{variable: {...}}`` o, con ``por_clave``, ``{(variable, clave): {...}}``.
+    ``cursor`` debe devolver tuplas (no diccionarios).
+    """
+    hasta = hasta or datetime.now() + timedelta(minutes=1)
+    limite = datetime.now() - timedelta(days=DIAS_RETENCION_MINUTOS)
+    condicion, parametros = _condicion_tramos(tramos(desde, hasta, limite))
+    if not condicion:
+        return {}
+    agrupacion = "variable, clave" if por_clave else "variable"
+    cursor.execute(
+        f"SELECT {agrupacion}, SUM(n), SUM(suma), MIN(minimo), MAX(maximo), SUM(suma_cuadrados) "
+        f"FROM rollups WHERE tabla = %s AND ({condicion}) GROUP BY {agrupacion}",
+        [tabla, *parametros],
+    )
+    resumen: Dict[Any, Dict[str, float]] = {}
+    for fila in cursor.fetchall():
+        clave = tuple(fila[:2]) if por_clave else fila[0]
+        agregados = fila[2:] if por_clave else fila[1:]
+        if agregados[0]:
+            resumen[clave] = estadisticas(*agregados)
+    return resumen
+
+
+def consulta_serie(granularidad: str) -> str:
+    """SQL de la media por intervalo y variable de una tabla (parámetros: tabla, desde, hasta)."""
+    if granularidad not in GRANULARIDADES:
+        raise ValueError(f"Granularidad no soportada: {granularidad}")
+    return (
+        "SELECT bucket AS timestamp, variable, SUM(suma) / SUM(n) AS media, "
+        "MIN(minimo) AS minimo, MAX(maximo) AS maximo, SUM(n) AS n "
+        "FROM rollups "
+        f"WHERE granularidad = '{granularidad}' AND tabla = %s AND bucket >= %s AND bucket < %s "
+        "GROUP BY bucket, variable ORDER BY bucket"
+    )
+
+
+def granularidad_para(desde: datetime, hasta: datetime, max_puntos: int = 500) -> str:
+    """Granularidad más fina con la que el periodo no supera ``max_puntos`` intervalos."""
+    segundos = (hasta - desde).total_seconds()
+    if segundos / 60 <= max_puntos:
+        return "minuto"
+    if segundos / 3600 <= max_puntos:
+        return "hora"
+    return "dia"
+
+
+def purgar_minutos(cursor, dias: int = DIAS_RETENCION_MINUTOS) -> int:
+    """Elimina los rollups por minuto con más de ``dias`` días. Devuelve las filas borradas."""
+    cursor.execute(
+        "DELETE FROM rollups WHERE granularidad = 'minuto' AND bucket < %s",
+        (truncar(datetime.now() - timedelta(days=dias), "minuto"),),
+    )
+    return cursor.rowcount
+
+
+def reconstruir(cursor, tablas: Optional[Iterable[str]] = None) -> None:
+    """Recalcula los rollups desde las tablas crudas (p. ej. en una base de datos existente)."""
+    limite_minutos = truncar(datetime.now() - timedelta(days=DIAS_RETENCION_MINUTOS), "minuto")
+    for tabla in tablas or ESQUEMA:
+        _, clave_sql, variables = ESQUEMA[tabla]
+        cursor.execute("DELETE FROM rollups WHERE tabla = %s", (tabla,))
+        for granularidad in GRANULARIDADES:
+            filtro = f" AND timestamp >= '{limite_minutos:%Y-%m-%d %H:%M:%S}'" if granularidad == "minuto" else ""
+            for variable in variables:
+                print(f"Reconstruyendo rollups de {tabla}.{variable} ({granularidad})...")
+                cursor.execute(
+                    "INSERT INTO rollups "
+                    "(granularidad, tabla, variable, clave, bucket, n, suma, minimo, maximo, suma_cuadrados) "
+                    f"SELECT '{granularidad}', '{tabla}', '{variable}', {clave_sql}, "
+                    f"DATE_FORMAT(timestamp, '{_FORMATO_SQL[granularidad]}'), COUNT({variable}), "
+                    f"SUM({variable}), MIN({variable}), MAX({variable}), SUM({variable} * {variable}) "
+                    f"FROM {tabla} WHERE {variable} IS NOT NULL AND timestamp IS NOT NULL{filtro} "
+                    "GROUP BY 4, 5"
+                )
@@ -5,12 +5,18 @@ from collections import defaultdict
 from datetime import datetime, timedelta
 from pathlib import Path
 import subprocess
-from typing import Dict, Iterable, List, Sequence, Tuple
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple
+
+import mysql.connector
 
 try:
+    from greenhouse_system.database import rollups
+    from greenhouse_system.database.cache import bloqueo_exclusivo
     from greenhouse_system.middleware import database_handler as db
 except ModuleNotFoundError:
     # Fallback si se ejecuta el script desde dentro del paquete sin resolución absoluta
+    from database import rollups  # type: ignore
+    from database.cache import bloqueo_exclusivo  # type: ignore
     from middleware import database_handler as db  # type: ignore
 
 
@@ -42,18 +48,27 @@ class ReportGenerator:
 
         Returns:
             Diccionario con las rutas del informe LaTeX y, si se solicita, del PDF.
+
+        Con varios workers del dashboard, las generaciones en ``output_dir`` se
+        hacen de una en una (bloqueo de fichero): ``pdflatex`` no admite dos
+        compilaciones simultáneas en el mismo directorio.
         """
+        with bloqueo_exclusivo(self.output_dir / ".informe.lock"):
+            return self._generate_daily_report(output_filename, compile_pdf)
 
+    def _generate_daily_report(self, output_filename: str | None, compile_pdf: bool) -> Dict[str, Path]:
         since = datetime.now() - timedelta(hours=24)
-        clima = self._fetch_data(
+        # Las estadísticas salen de los rollups; si aún no existen (base de
+        # datos anterior a ellos) se calculan sobre las filas crudas.
+        clima = self._fetch_summary("clima_data", since) or self._fetch_data(
             "SELECT zona, temperatura, humedad, co2, intensidad_luz, presion FROM clima_data WHERE timestamp >= %s",
             (since,),
         )
-        riego = self._fetch_data(
+        riego = self._fetch_summary("riego_data", since) or self._fetch_data(
             "SELECT ph, conductividad, flujo, nivel_deposito, caudal_historico FROM riego_data WHERE timestamp >= %s",
             (since,),
         )
-        plantas = self._fetch_data(
+        plantas = self._fetch_summary("plantas_data", since) or self._fetch_data(
             "SELECT especie, crecimiento, cantidad_frutos, calidad_frutos, nivel_salud FROM plantas_data WHERE timestamp >= %s",
             (since,),
         )
@@ -86,8 +101,23 @@ class ReportGenerator:
             paths["pdf"] = pdf_path
         return paths
 
-    def create_sensor_tables(self, data: Dict[str, Sequence[Dict[str, float]]]) -> str:
-        """Devuelve las tablas LaTeX para las métricas de clima, riego y plantas."""
+    def compile_report(self, tex_path: Path) -> Path:
+        """Compila con ``pdflatex`` un informe ya escrito y devuelve la ruta del PDF.
+
+        Permite reintentar el PDF reutilizando el ``.tex`` sin volver a consultar
+        la base de datos.
+        """
+        with bloqueo_exclusivo(self.output_dir / ".informe.lock"):
+            return self._compile_pdf(Path(tex_path))
+
+    def create_sensor_tables(
+        self, data: Dict[str, Sequence[Dict[str, float]] | Mapping[str, Dict[str, float]]]
+    ) -> str:
+        """Devuelve las tablas LaTeX para las métricas de clima, riego y plantas.
+
+        Cada entrada de ``data`` puede ser la lista de filas crudas o el resumen
+        por variable de ``rollups.resumir``.
+        """
         secciones: List[str] = []
 
         clima = data.get("clima", [])
@@ -171,20 +201,39 @@ class ReportGenerator:
         finally:
             cnx.close()
 
+    def _fetch_summary(self, tabla: str, since: datetime) -> Dict[str, Dict[str, float]]:
+        cnx = db.conectar()
+        try:
+            cursor = cnx.cursor()
+            try:
+                return rollups.resumir(cursor, tabla, since)
+            except mysql.connector.Error:
+                return {}
+            finally:
+                cursor.close()
+        finally:
+            cnx.close()
+
     def _build_stats_table(
         self,
         titulo: str,
-        registros: Sequence[Dict[str, object]],
+        registros: Sequence[Dict[str, object]] | Mapping[str, Dict[str, float]],
         campos: Iterable[Tuple[str, str]],
     ) -> str:
         filas = []
         for campo, etiqueta in campos:
-            valores = [row[campo] for row in registros if row.get(campo) is not None]
-            if not valores:
-                continue
-            promedio = sum(valores) / len(valores)
-            minimo = min(valores)
-            maximo = max(valores)
+            if isinstance(registros, Mapping):
+                resumen = registros.get(campo)
+                if not resumen:
+                    continue
+                promedio, minimo, maximo = resumen["media"], resumen["minimo"], resumen["maximo"]
+            else:
+                valores = [row[campo] for row in registros if row.get(campo) is not None]
+                if not valores:
+                    continue
+                promedio = sum(valores) / len(valores)
+                minimo = min(valores)
+                maximo = max(valores)
             filas.append(
                 f"{self._escape_tex(etiqueta)} & {self._format_valor(promedio)} & {self._format_valor(minimo)} & {self._format_valor(maximo)} \\\\"
             )
@@ -234,7 +283,8 @@ class ReportGenerator:
     @staticmethod
     def _resolve_basename(output_filename: str | None) -> str:
         if not output_filename:
-            return f"informe_{datetime.now().strftime('%Y%m%d_%H%M')}"
+            # Con segundos: dos peticiones del mismo minuto no se sobrescriben.
+            return f"informe_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         filename = Path(output_filename)
         return filename.stem if filename.suffix else str(filename)
 
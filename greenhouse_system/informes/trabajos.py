@@ -0,0 +1,164 @@
+"""Cola de trabajos para generar informes en segundo plano.
+
+El dashboard ya no genera el informe dentro del callback: ``ColaInformes.enviar``
+crea un trabajo con un identificador y lo ejecuta en un pool de hilos (las
+consultas y ``pdflatex`` esperan a MySQL o a otro proceso, así que no hace
+falta un proceso aparte). El navegador consulta ``estado`` periódicamente
+hasta que el trabajo termina y entonces descarga el fichero.
+
+El estado de cada trabajo se guarda como JSON en ``<output_dir>/.trabajos``,
+de modo que con varios workers cualquiera de ellos puede responder a la
+consulta de progreso. Dos peticiones iguales mientras la primera sigue en
+curso (varias pestañas, doble clic) comparten el mismo trabajo. Si falla la
+compilación del PDF, el trabajo termina con el ``.tex`` ya escrito en lugar
+de volver a generar el informe.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    from greenhouse_system.database.cache import bloqueo_exclusivo
+    from greenhouse_system.informes.latex_generator import ReportGenerator
+except ModuleNotFoundError:
+    # Fallback si se ejecuta el script desde dentro del paquete sin resolución absoluta
+    from database.cache import bloqueo_exclusivo  # type: ignore
+    from informes.latex_generator import ReportGenerator  # type: ignore
+
+ESTADOS_ACTIVOS = ("pendiente", "generando", "compilando")
+# Un trabajo activo sin cambios durante este tiempo se da por perdido (p. ej.
+# el worker que lo ejecutaba se reinició): ``estado`` lo devuelve como error y
+# deja de agrupar peticiones nuevas.
+CADUCIDAD = 600.0
+# Los ficheros de estado de trabajos terminados se borran pasado este tiempo.
+CONSERVAR = 24 * 3600.0
+
+_ID_VALIDO = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ColaInformes:
+    """Trabajos de ``ReportGenerator`` en segundo plano con estado compartido en disco."""
+
+    def __init__(
+        self,
+        generador: ReportGenerator | None = None,
+        hilos: int = 1,
+        directorio: Path | str | None = None,
+    ) -> None:
+        self.generador = generador or ReportGenerator()
+        self.directorio = Path(directorio) if directorio else self.generador.output_dir / ".trabajos"
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="informes")
+
+    def enviar(self, *, compile_pdf: bool = True, output_filename: str | None = None) -> str:
+        """Encola un informe y devuelve el id del trabajo.
+
+        Si ya hay un trabajo activo con los mismos parámetros (en este proceso o
+        en otro worker) se devuelve su id en lugar de crear otro.
+        """
+        clave = f"{output_filename or 'diario'}:{'pdf' if compile_pdf else 'tex'}"
+        with bloqueo_exclusivo(self.directorio / ".cola.lock"):
+            self._limpiar()
+            activo = self._buscar_activo(clave)
+            if activo is not None:
+                return activo["id"]
+            trabajo: Dict[str, Any] = {
+                "id": uuid.uuid4().hex,
+                "clave": clave,
+                "estado": "pendiente",
+                "progreso": 0,
+                "mensaje": "En cola",
+                "rutas": {},
+                "aviso": None,
+                "error": None,
+                "creado": time.time(),
+                "actualizado": time.time(),
+            }
+            self._guardar(trabajo)
+        self._executor.submit(self._ejecutar, trabajo, output_filename, compile_pdf)
+        return trabajo["id"]
+
+    def estado(self, trabajo_id: str) -> Optional[Dict[str, Any]]:
+        """Estado actual del trabajo, o ``None`` si no existe.
+
+        Un trabajo activo que lleva ``CADUCIDAD`` segundos sin cambios se
+        devuelve con estado ``error``: nadie lo va a terminar.
+        """
+        if not trabajo_id or not _ID_VALIDO.match(trabajo_id):
+            return None
+        trabajo = self._leer(self.directorio / f"{trabajo_id}.json")
+        if trabajo is not None and self._caducado(trabajo):
+            trabajo.update(
+                estado="error",
+                error="el trabajo dejó de avanzar (se reinició el proceso que lo generaba)",
+                mensaje="Informe abandonado",
+            )
+        return trabajo
+
+    def cerrar(self, esperar: bool = True) -> None:
+        self._executor.shutdown(wait=esperar)
+
+    def _ejecutar(self, trabajo: Dict[str, Any], output_filename: str | None, compile_pdf: bool) -> None:
+        self._actualizar(trabajo, estado="generando", progreso=10, mensaje="Consultando datos y escribiendo LaTeX")
+        try:
+            tex_path = self.generador.generate_daily_report(output_filename)["tex"]
+        except Exception as exc:  # pragma: no cover - error inesperado
+            self._actualizar(trabajo, estado="error", error=str(exc), mensaje="Error al generar el informe")
+            return
+
+        rutas = {"tex": str(tex_path)}
+        if compile_pdf:
+            self._actualizar(trabajo, estado="compilando", progreso=60, rutas=rutas, mensaje="Compilando PDF")
+            try:
+                rutas["pdf"] = str(self.generador.compile_report(tex_path))
+            except RuntimeError as exc:
+                # Sin PDF el informe LaTeX sigue siendo válido: se entrega tal cual.
+                trabajo["aviso"] = str(exc)
+        self._actualizar(trabajo, estado="completado", progreso=100, rutas=rutas, mensaje="Informe generado")
+
+    def _actualizar(self, trabajo: Dict[str, Any], **cambios: Any) -> None:
+        trabajo.update(cambios, actualizado=time.time())
+        self._guardar(trabajo)
+
+    def _guardar(self, trabajo: Dict[str, Any]) -> None:
+        # Escritura atómica: quien consulta nunca lee un JSON a medias.
+        ruta = self.directorio / f"{trabajo['id']}.json"
+        temporal = ruta.with_suffix(f".{os.getpid()}.tmp")
+        temporal.write_text(json.dumps(trabajo), encoding="utf-8")
+        os.replace(temporal, ruta)
+
+    @staticmethod
+    def _leer(ruta: Path) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(ruta.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _trabajos(self) -> Iterator[Dict[str, Any]]:
+        for ruta in self.directorio.glob("*.json"):
+            trabajo = self._leer(ruta)
+            if trabajo is not None:
+                yield trabajo
+
+    @staticmethod
+    def _caducado(trabajo: Dict[str, Any]) -> bool:
+        return trabajo["estado"] in ESTADOS_ACTIVOS and trabajo["actualizado"] <= time.time() - CADUCIDAD
+
+    def _buscar_activo(self, clave: str) -> Optional[Dict[str, Any]]:
+        for trabajo in self._trabajos():
+            if trabajo["clave"] == clave and trabajo["estado"] in ESTADOS_ACTIVOS and not self._caducado(trabajo):
+                return trabajo
+        return None
+
+    def _limpiar(self) -> None:
+        limite = time.time() - CONSERVAR
+        for trabajo in self._trabajos():
+            if trabajo["actualizado"] < limite:
+                (self.directorio / f"{trabajo['id']}.json").unlink(missing_ok=True)
@@ -33,6 +33,7 @@ kill_port 4841
 kill_port 4842
 kill_port 4843
 kill_port 5000
+kill_port 5001
 
 echo "Puertos libres. Continuando..."
 echo ""
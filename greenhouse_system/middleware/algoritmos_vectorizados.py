@@ -0,0 +1,188 @@
+"""Versiones con NumPy de los algoritmos de ``algoritmos.py``.
+
+Cada función acepta arrays (o escalares) que se combinan por broadcasting, de
+modo que una matriz zonas x especies se evalúa en una sola llamada en lugar de
+en un bucle anidado de Python. Los resultados son idénticos a los de las
+versiones escalares:
+
+* ``max``/``min`` se emulan con ``np.where`` siguiendo la misma regla que las
+  funciones de Python (devuelven el primer argumento salvo que el segundo sea
+  estrictamente mayor/menor), incluso con NaN.
+* ``round(x, 2)`` de Python redondea el valor binario exacto; ``np.round`` no,
+  así que los valores muy próximos a un empate se redondean con ``round``.
+* ``alerta_critica`` consume ``random.random()`` solo para los pares sin otra
+  alerta y en el mismo orden que el bucle zonas -> especies.
+"""
+from __future__ import annotations
+
+import random
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Distancia a x.xx5 por debajo de la cual se delega en ``round`` de Python.
+_MARGEN_EMPATE = 1e-6
+
+
+def _max(a, b):
+    """``max(a, b)`` de Python elemento a elemento."""
+    return np.where(b > a, b, a)
+
+
+def _min(a, b):
+    """``min(a, b)`` de Python elemento a elemento."""
+    return np.where(b < a, b, a)
+
+
+def redondear(valores, decimales: int = 2) -> np.ndarray:
+    """``round(x, decimales)`` de Python elemento a elemento."""
+    valores = np.asarray(valores, dtype=float)
+    escala = 10.0 ** decimales
+    escalados = valores * escala
+    resultado = np.round(escalados) / escala
+    # Fuera de los casi-empates, redondear x*100 decide el mismo decimal que el
+    # redondeo exacto; en ellos el error de x*100 puede cambiar el resultado.
+    dudosos = np.abs(np.abs(escalados - np.floor(escalados)) - 0.5) < _MARGEN_EMPATE
+    if dudosos.any():
+        resultado = np.array(resultado, dtype=float)
+        for indice in zip(*np.nonzero(dudosos)):
+            resultado[indice] = round(float(valores[indice]), decimales)
+    return resultado
+
+
+# 1. Índice de estrés
+def indice_estres(temperatura, humedad, co2, nivel_salud) -> np.ndarray:
+    temp_factor = _max(0, _min((temperatura - 20) / 4, 1))
+    hum_factor = _max(0, _min(np.abs(humedad - 65) / 20, 1))
+    co2_factor = _max(0, _min(np.abs(co2 - 450) / 200, 1))
+    salud_factor = _max(0, 1 - nivel_salud / 100)
+
+    estres = (temp_factor + hum_factor + co2_factor + salud_factor) / 4
+    return redondear(estres, 2)
+
+
+# 2. Rendimiento de frutos
+def rendimiento_frutos(cantidad_frutos, calidad_frutos, crecimiento) -> np.ndarray:
+    return redondear(cantidad_frutos * (calidad_frutos / 100) * (crecimiento / 15), 2)
+
+
+# 3. Eficiencia de luz (la hora es la misma para todo el lote)
+def eficiencia_luz(intensidad_luz, hora: int, crecimiento) -> np.ndarray:
+    if 8 <= hora <= 18:
+        eficiencia = _min(1, intensidad_luz / 1000 * (crecimiento / 15))
+    else:
+        eficiencia = _min(0.2, intensidad_luz / 200 * (crecimiento / 15))
+    return redondear(eficiencia, 2)
+
+
+# 4. Necesidad de riego
+def necesidad_riego(nivel_deposito, flujo, temperatura, humedad) -> np.ndarray:
+    riesgo_sequedad = (
+        (30 - nivel_deposito) / 30
+        + _max(0, (25 - humedad) / 25)
+        + _max(0, (temperatura - 22) / 5)
+    )
+    return riesgo_sequedad > 1
+
+
+# 5. Ajuste de nutrición
+def ajuste_nutricion(nivel_salud, ph, conductividad) -> np.ndarray:
+    ph, conductividad, nivel_salud = np.broadcast_arrays(ph, conductividad, nivel_salud)
+    return np.select(
+        [
+            (ph < 5.8) | (ph > 6.2),
+            (conductividad < 1.2) | (conductividad > 1.8),
+            nivel_salud < 75,
+        ],
+        ["Ajustar pH", "Ajustar Nutrientes", "Revisar salud"],
+        default="OK",
+    ).astype(object)
+
+
+# 6. Alertas críticas
+def alerta_critica(temperatura, co2, nivel_salud, luz) -> np.ndarray:
+    temperatura, co2, nivel_salud, luz = np.broadcast_arrays(temperatura, co2, nivel_salud, luz)
+    alerta_temp = (temperatura < 20) | (temperatura > 24)
+    alerta_co2 = (co2 < 400) | (co2 > 500)
+    alerta_salud = nivel_salud < 75
+    alerta_luz = luz < 50
+
+    resultado = np.select(
+        [alerta_temp, alerta_co2, alerta_salud, alerta_luz],
+        ["Temperatura fuera de rango", "CO2 fuera de rango", "Nivel de salud bajo", "Luz insuficiente"],
+        default="",
+    ).astype(object)
+    resultado[resultado == ""] = None
+
+    # Alerta inesperada: mismo número de llamadas a random() y en el mismo
+    # orden (fila a fila) que la versión escalar.
+    candidatos = np.flatnonzero(~(alerta_temp | alerta_co2 | alerta_salud | alerta_luz))
+    if candidatos.size:
+        sorteo = np.array([random.random() for _ in range(candidatos.size)])
+        plano = resultado.reshape(-1)
+        plano[candidatos[sorteo < 0.01]] = "Alerta inesperada"
+    return resultado
+
+
+def _columna(objetos: Sequence[Dict[str, Any]], variable: str) -> np.ndarray:
+    valores = [valores.get(variable) for valores in objetos]
+    # Con valores ausentes o no numéricos las funciones escalares fallan o se
+    # comportan distinto; el llamador debe usar entonces el bucle escalar.
+    if not all(isinstance(valor, (int, float)) for valor in valores):
+        raise TypeError(f"Valores no numéricos en '{variable}'")
+    return np.array(valores, dtype=float)
+
+
+def evaluar_pares(
+    clima: Dict[str, Dict[str, Any]],
+    plantas: Dict[str, Dict[str, Any]],
+    riego: Optional[Dict[str, Any]],
+    hora: int,
+) -> List[Tuple[str, str, float, float, float, Optional[bool], Optional[str], Optional[str]]]:
+    """Evalúa los seis algoritmos para todos los pares zona x especie.
+
+    Devuelve ``(zona, especie, estres, rendimiento, eficiencia, necesidad,
+    ajuste, alerta)`` por par, en el orden del bucle escalar (zonas por fuera).
+    Lanza ``TypeError`` si algún valor necesario no es numérico.
+    """
+    zonas, especies = list(clima), list(plantas)
+    if not zonas or not especies:
+        return []
+    climas, plantas_ = [clima[z] for z in zonas], [plantas[e] for e in especies]
+
+    # Zonas en filas y especies en columnas: el broadcasting forma la matriz.
+    temperatura = _columna(climas, "Temperatura")[:, None]
+    humedad = _columna(climas, "Humedad")[:, None]
+    co2 = _columna(climas, "CO2")[:, None]
+    luz = _columna(climas, "IntensidadLuz")[:, None]
+    salud = _columna(plantas_, "NivelSalud")[None, :]
+    crecimiento = _columna(plantas_, "Crecimiento")[None, :]
+    cantidad = _columna(plantas_, "CantidadFrutos")[None, :]
+    calidad = _columna(plantas_, "CalidadFrutos")[None, :]
+    forma = (len(zonas), len(especies))
+
+    estres = np.broadcast_to(indice_estres(temperatura, humedad, co2, salud), forma)
+    rendimiento = np.broadcast_to(rendimiento_frutos(cantidad, calidad, crecimiento), forma)
+    eficiencia = np.broadcast_to(eficiencia_luz(luz, hora, crecimiento), forma)
+    if riego is not None:
+        deposito, ph, conductividad = (
+            _columna([riego], variable)[0] for variable in ("NivelDeposito", "pH", "Conductividad")
+        )
+        necesidad = np.broadcast_to(
+            necesidad_riego(deposito, riego.get("Flujo"), temperatura, humedad), forma
+        ).tolist()
+        ajuste = np.broadcast_to(ajuste_nutricion(salud, ph, conductividad), forma).tolist()
+    else:
+        necesidad = ajuste = [[None] * len(especies) for _ in zonas]
+    alertas = alerta_critica(temperatura, co2, salud, luz).tolist()
+
+    estres, rendimiento, eficiencia = estres.tolist(), rendimiento.tolist(), eficiencia.tolist()
+    return [
+        (
+            zona, especie,
+            estres[i][j], rendimiento[i][j], eficiencia[i][j],
+            necesidad[i][j], ajuste[i][j], alertas[i][j],
+        )
+        for i, zona in enumerate(zonas)
+        for j, especie in enumerate(especies)
+    ]
@@ -0,0 +1,269 @@
+"""Codificaciones del payload entre ``middleware_cliente`` y ``middleware_servidor``.
+
+Además del JSON original existe un formato compacto ``esquema``: el orden y el
+tipo de las variables de cada sección se toman de ``models/*.xml``, de modo que
+en el cable solo viajan los nombres de zona/especie y los valores empaquetados
+con ``struct``, sin repetir el nombre de cada variable. Cualquier dato que no
+encaje en el esquema (variables nuevas, tipos inesperados, claves extra del
+payload) viaja como JSON en un bloque ``extras`` y la decodificación es exacta.
+
+El cuerpo de cada trama empieza por un byte de formato (``FORMATOS``), con el
+bit ``COMPRIMIDO`` activado si el resto va comprimido con zlib. Un cuerpo que
+empieza por ``{`` es JSON sin byte de formato: así se envía el JSON sin
+comprimir, compatible con los servidores anteriores a la negociación.
+
+Negociación: al conectar, el cliente envía en JSON
+``{"negociacion": {"formatos": [...], "compresion": [...], "esquema": huella}}``
+y el servidor responde ``{"formato": ..., "compresion": ...}`` eligiendo la
+primera opción que soporta; si las huellas del esquema no coinciden se usa JSON.
+Con ``"confirmaciones": true`` el cliente pide además que el servidor confirme
+los payloads ya guardados en la base de datos (ver ``protocolo.Confirmaciones``).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import struct
+import xml.etree.ElementTree as ET
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+MODELS_DIR = Path(__file__).resolve().parents[1] / "models"
+# Sección del payload -> modelo OPC UA del que se derivan sus variables.
+MODELOS = {
+    "clima": "ClimaModel.xml",
+    "plantas": "PlantasModel.xml",
+    "riego": "RiegoModel.xml",
+}
+
+FORMATOS = {"json": 0x00, "esquema": 0x01}
+COMPRIMIDO = 0x80
+COMPRESIONES = ("zlib",)
+# Por debajo de este tamaño zlib no compensa la cabecera que añade.
+MIN_COMPRIMIR = 256
+
+_TIPOS = {"Float": "d", "Double": "d", "Int32": "q", "Int64": "q", "String": "s"}
+_U16 = struct.Struct(">H")
+# Número de objetos reservado para indicar que la sección no está en el payload.
+_SECCION_AUSENTE = 0xFFFF
+_NS = "{http://opcfoundation.org/UA/2011/03/UANodeSet.xsd}"
+
+Esquema = Dict[str, List[Tuple[str, str]]]
+
+
+@lru_cache(maxsize=1)
+def cargar_esquema(models_dir: Path = MODELS_DIR) -> Esquema:
+    """Devuelve ``{seccion: [(variable, tipo_struct), ...]}`` según los XML."""
+    esquema: Esquema = {}
+    for seccion, archivo in MODELOS.items():
+        raiz = ET.parse(models_dir / archivo).getroot()
+        variables = []
+        for nodo in raiz.iter(f"{_NS}UAVariable"):
+            nombre = nodo.get("BrowseName", "").split(":")[-1]
+            variables.append((nombre, _TIPOS.get(nodo.get("DataType", ""), "s")))
+        esquema[seccion] = variables
+    return esquema
+
+
+def huella_esquema(esquema: Optional[Esquema] = None) -> str:
+    esquema = esquema or cargar_esquema()
+    return hashlib.sha1(json.dumps(esquema, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def mensaje_negociacion(formatos: List[str], compresion: List[str], confirmaciones: bool = False) -> bytes:
+    propuesta: Dict[str, Any] = {"formatos": formatos, "compresion": compresion, "esquema": huella_esquema()}
+    if confirmaciones:
+        propuesta["confirmaciones"] = True
+    return json.dumps({"negociacion": propuesta}).encode()
+
+
+def responder_negociacion(propuesta: Dict[str, Any]) -> Dict[str, Any]:
+    """Elige formato, compresión y confirmaciones a partir de la propuesta del cliente."""
+    formato = "json"
+    for candidato in propuesta.get("formatos", []):
+        if candidato == "esquema" and propuesta.get("esquema") != huella_esquema():
+            continue
+        if candidato in FORMATOS:
+            formato = candidato
+            break
+    compresion = next((c for c in propuesta.get("compresion", []) if c in COMPRESIONES), None)
+    return {"formato": formato, "compresion": compresion, "confirmaciones": bool(propuesta.get("confirmaciones"))}
+
+
+def codificar(payload: Dict[str, Any], formato: str = "json", compresion: Optional[str] = None) -> bytes:
+    if formato == "json":
+        cuerpo = json.dumps(payload, separators=(",", ":")).encode()
+    elif formato == "esquema":
+        cuerpo = _codificar_esquema(payload, cargar_esquema())
+    else:
+        raise ValueError(f"Formato desconocido: {formato}")
+
+    cabecera = FORMATOS[formato]
+    if compresion == "zlib" and len(cuerpo) >= MIN_COMPRIMIR:
+        cuerpo = zlib.compress(cuerpo, 6)
+        cabecera |= COMPRIMIDO
+    elif formato == "json":
+        # JSON sin comprimir viaja tal cual: lo entienden también los servidores
+        # que no negocian codificación.
+        return cuerpo
+    return bytes([cabecera]) + cuerpo
+
+
+def decodificar(datos: bytes) -> Dict[str, Any]:
+    """Decodifica el cuerpo de una trama en cualquiera de los formatos."""
+    if not datos:
+        raise ValueError("Mensaje vacío")
+    if datos[:1] == b"{":
+        return json.loads(datos)
+    cabecera, cuerpo = datos[0], datos[1:]
+    if cabecera & COMPRIMIDO:
+        cuerpo = zlib.decompress(cuerpo)
+    formato = cabecera & ~COMPRIMIDO
+    if formato == FORMATOS["json"]:
+        return json.loads(cuerpo)
+    if formato == FORMATOS["esquema"]:
+        return _decodificar_esquema(cuerpo, cargar_esquema())
+    raise ValueError(f"Byte de formato desconocido: {cabecera:#04x}")
+
+
+def _empaquetar_texto(partes: List[bytes], texto: str) -> None:
+    datos = texto.encode()
+    partes.append(_U16.pack(len(datos)))
+    partes.append(datos)
+
+
+def _desempaquetar_texto(cuerpo: bytes, pos: int) -> Tuple[str, int]:
+    (longitud,) = _U16.unpack_from(cuerpo, pos)
+    pos += _U16.size
+    return cuerpo[pos:pos + longitud].decode(), pos + longitud
+
+
+def _bytes_mapa(variables: List[Tuple[str, str]]) -> int:
+    """Bytes del mapa de bits que indica qué variables del esquema van empaquetadas."""
+    return max(1, (len(variables) + 7) // 8)
+
+
+def _encaja(valor: Any, tipo: str) -> bool:
+    # Solo se empaqueta lo que se puede recuperar idéntico: un int en una
+    # variable Float o un NaN viajan en `extras` para conservar su tipo.
+    if tipo == "d":
+        return type(valor) is float and not math.isnan(valor)
+    if tipo == "q":
+        return type(valor) is int and -(2 ** 63) <= valor < 2 ** 63
+    return type(valor) is str and len(valor.encode()) < 2 ** 16
+
+
+class _Plan:
+    """Disposición precalculada de una sección: numéricas primero, luego textos."""
+
+    _PYTIPOS = {"d": float, "q": int}
+
+    def __init__(self, variables: List[Tuple[str, str]]) -> None:
+        posiciones = {variable: indice for indice, (variable, _) in enumerate(variables)}
+        self.numericas = [(posiciones[v], v, t) for v, t in variables if t != "s"]
+        self.textos = [(posiciones[v], v) for v, t in variables if t == "s"]
+        self.nombres_numericos = [v for _, v, _ in self.numericas]
+        self.pytipos = [self._PYTIPOS[t] for _, _, t in self.numericas]
+        self.mascara_numerica = sum(1 << i for i, _, _ in self.numericas)
+        # Caso habitual: todas las numéricas presentes -> un solo pack/unpack.
+        self.completo = struct.Struct(">" + "".join(t for _, _, t in self.numericas))
+        self.bytes_mapa = _bytes_mapa(variables)
+
+
+@lru_cache(maxsize=None)
+def _plan(variables: Tuple[Tuple[str, str], ...]) -> _Plan:
+    return _Plan(list(variables))
+
+
+def _codificar_esquema(payload: Dict[str, Any], esquema: Esquema) -> bytes:
+    partes: List[bytes] = []
+    extras: Dict[str, Any] = {}
+
+    for seccion, variables in esquema.items():
+        if seccion not in payload:
+            partes.append(_U16.pack(_SECCION_AUSENTE))
+            continue
+        plan = _plan(tuple(variables))
+        objetos = payload[seccion] or {}
+        partes.append(_U16.pack(len(objetos)))
+        for objeto, valores in objetos.items():
+            _empaquetar_texto(partes, objeto)
+            numericos = [valores.get(v) for v in plan.nombres_numericos]
+            conocidas = set()
+            if all(type(v) is t and v == v for v, t in zip(numericos, plan.pytipos)):
+                presentes = plan.mascara_numerica
+                empaquetados = [plan.completo.pack(*numericos)]
+                conocidas.update(plan.nombres_numericos)
+            else:
+                presentes = 0
+                empaquetados = []
+                for indice, variable, tipo in plan.numericas:
+                    if variable in valores and _encaja(valores[variable], tipo):
+                        presentes |= 1 << indice
+                        empaquetados.append(struct.pack(f">{tipo}", valores[variable]))
+                        conocidas.add(variable)
+            for indice, variable in plan.textos:
+                if variable in valores and _encaja(valores[variable], "s"):
+                    presentes |= 1 << indice
+                    _empaquetar_texto(empaquetados, valores[variable])
+                    conocidas.add(variable)
+            partes.append(presentes.to_bytes(plan.bytes_mapa, "big"))
+            partes.extend(empaquetados)
+
+            if len(conocidas) != len(valores):
+                sobrantes = {k: v for k, v in valores.items() if k not in conocidas}
+                extras.setdefault("secciones", {}).setdefault(seccion, {})[objeto] = sobrantes
+
+    resto = {k: v for k, v in payload.items() if k not in esquema}
+    if resto:
+        extras["raiz"] = resto
+    _empaquetar_extras(partes, extras)
+    return b"".join(partes)
+
+
+def _empaquetar_extras(partes: List[bytes], extras: Dict[str, Any]) -> None:
+    datos = json.dumps(extras, separators=(",", ":")).encode() if extras else b""
+    partes.append(struct.pack(">I", len(datos)))
+    partes.append(datos)
+
+
+def _decodificar_esquema(cuerpo: bytes, esquema: Esquema) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {}
+    pos = 0
+    for seccion, variables in esquema.items():
+        (n_objetos,) = _U16.unpack_from(cuerpo, pos)
+        pos += _U16.size
+        if n_objetos == _SECCION_AUSENTE:
+            continue
+        plan = _plan(tuple(variables))
+        objetos: Dict[str, Dict[str, Any]] = {}
+        for _ in range(n_objetos):
+            objeto, pos = _desempaquetar_texto(cuerpo, pos)
+            presentes = int.from_bytes(cuerpo[pos:pos + plan.bytes_mapa], "big")
+            pos += plan.bytes_mapa
+            if presentes & plan.mascara_numerica == plan.mascara_numerica:
+                valores = dict(zip(plan.nombres_numericos, plan.completo.unpack_from(cuerpo, pos)))
+                pos += plan.completo.size
+            else:
+                valores = {}
+                for indice, variable, tipo in plan.numericas:
+                    if presentes >> indice & 1:
+                        (valores[variable],) = struct.unpack_from(f">{tipo}", cuerpo, pos)
+                        pos += 8
+            for indice, variable in plan.textos:
+                if presentes >> indice & 1:
+                    valores[variable], pos = _desempaquetar_texto(cuerpo, pos)
+            objetos[objeto] = valores
+        payload[seccion] = objetos
+
+    (longitud,) = struct.unpack_from(">I", cuerpo, pos)
+    pos += 4
+    extras = json.loads(cuerpo[pos:pos + longitud]) if longitud else {}
+    for seccion, objetos in extras.get("secciones", {}).items():
+        for objeto, sobrantes in objetos.items():
+            payload[seccion].setdefault(objeto, {}).update(sobrantes)
+    payload.update(extras.get("raiz", {}))
+    return payload
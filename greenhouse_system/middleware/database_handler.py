@@ -1,5 +1,17 @@
+import threading
+import time
+from datetime import datetime
+
 import mysql.connector
 
+try:
+    from greenhouse_system.database import estado_actual, rollups
+    from greenhouse_system.database.pool import obtener_pool
+except ModuleNotFoundError:
+    # Fallback si se ejecuta desde dentro del paquete sin resolución absoluta
+    from database import estado_actual, rollups  # type: ignore
+    from database.pool import obtener_pool  # type: ignore
+
 CONFIG = {
     "host": "127.0.0.1",
     "user": "root",
@@ -8,57 +20,234 @@ CONFIG = {
     "port": 3306
 }
 
+# Sentencias INSERT por tabla. Se comparten entre las inserciones individuales
+# y las inserciones por lotes (executemany). El timestamp es el de la muestra
+# (enviado por el middleware cliente), no el de la inserción.
+QUERIES = {
+    "clima_data": (
+        "INSERT INTO clima_data "
+        "(zona, temperatura, humedad, co2, intensidad_luz, presion, timestamp) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s)"
+    ),
+    "plantas_data": (
+        "INSERT INTO plantas_data "
+        "(especie, crecimiento, cantidad_frutos, calidad_frutos, nivel_salud, timestamp) "
+        "VALUES (%s, %s, %s, %s, %s, %s)"
+    ),
+    "riego_data": (
+        "INSERT INTO riego_data "
+        "(ph, conductividad, flujo, nivel_deposito, caudal_historico, timestamp) "
+        "VALUES (%s, %s, %s, %s, %s, %s)"
+    ),
+    "resultados_funciones": (
+        "INSERT INTO resultados_funciones "
+        "(zona, especie, indice_estres, rendimiento_frutos, eficiencia_luz, necesidad_riego, ajuste_nutricion, timestamp) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"
+    ),
+    "alertas_criticas": (
+        "INSERT INTO alertas_criticas "
+        "(zona, especie, tipo_alerta, timestamp) "
+        "VALUES (%s, %s, %s, %s)"
+    ),
+}
+
+# Cada lote actualiza también los agregados por minuto/hora/día de la tabla
+# ``rollups`` (ver database/rollups.py) y los últimos valores de
+# ``estado_actual`` (ver database/estado_actual.py), en la misma transacción.
+ROLLUPS_ACTIVOS = True
+ESTADO_ACTUAL_ACTIVO = True
+_auxiliares_preparadas = False
+
+# Errores con los que un lote se reintenta en lugar de descartarse: espera de
+# bloqueo agotada (1205), interbloqueo (1213) y servidor no disponible o
+# conexión perdida (2003, 2006, 2013, 2055), p. ej. durante un reinicio de MySQL.
+ERRORES_TRANSITORIOS = {1205, 1213, 2003, 2006, 2013, 2055}
+REINTENTOS_LOTE = 3
+ESPERA_REINTENTO = 0.5
+
 def conectar():
-    return mysql.connector.connect(**CONFIG)
+    """Devuelve una conexión del pool compartido; ``close()`` la devuelve al pool."""
+    return obtener_pool(CONFIG).obtener_conexion()
 
 def ejecutar_insert(query, valores):
+    cnx = None
     try:
         cnx = conectar()
         cursor = cnx.cursor()
         cursor.execute(query, valores)
         cnx.commit()
         cursor.close()
-        cnx.close()
         print("Inserción realizada correctamente.")
     except mysql.connector.Error as err:
         print("Error al insertar:", err)
+    finally:
+        # Devolver siempre la conexión al pool, también tras un error.
+        if cnx is not None:
+            cnx.close()
+
+def ejecutar_insert_lote(filas_por_tabla):
+    """Inserta las filas de varias tablas en una única transacción.
+
+    ``filas_por_tabla`` es un diccionario ``{tabla: [tupla_valores, ...]}`` con
+    las tablas definidas en ``QUERIES``. Cada tabla se escribe con un solo
+    ``executemany`` (que el conector convierte en un INSERT multi-fila) y todo
+    el lote se confirma o se deshace a la vez. Devuelve el número de filas
+    insertadas.
+
+    Si ``ROLLUPS_ACTIVOS``, los agregados del lote se suman a ``rollups`` con
+    un único INSERT ... ON DUPLICATE KEY UPDATE dentro de la misma transacción;
+    igual con la última muestra de cada zona/especie y ``ESTADO_ACTUAL_ACTIVO``.
+
+    Ante un error de ``ERRORES_TRANSITORIOS`` la transacción se repite hasta
+    ``REINTENTOS_LOTE`` veces. Si el lote no se puede escribir devuelve 0 y
+    las filas siguen siendo del llamador (``BufferInserciones.devolver``).
+    """
+    filas_por_tabla = {tabla: filas for tabla, filas in filas_por_tabla.items() if filas}
+    if not filas_por_tabla:
+        return 0
+
+    for intento in range(REINTENTOS_LOTE + 1):
+        try:
+            return _insertar_lote(filas_por_tabla)
+        except mysql.connector.Error as err:
+            if err.errno not in ERRORES_TRANSITORIOS or intento == REINTENTOS_LOTE:
+                print("Error al insertar lote:", err)
+                return 0
+            print(f"Error transitorio al insertar lote ({err}); reintento {intento + 1} de {REINTENTOS_LOTE}")
+            time.sleep(ESPERA_REINTENTO * 2 ** intento)
+    return 0
+
+
+def _insertar_lote(filas_por_tabla):
+    """Una transacción con todo el lote; deshace y relanza si falla."""
+    global _auxiliares_preparadas
+    total = 0
+    cnx = None
+    try:
+        cnx = conectar()
+        cursor = cnx.cursor()
+        if not _auxiliares_preparadas:
+            # Bases de datos creadas antes de estas tablas: se crean antes de
+            # abrir la transacción (un DDL la confirmaría).
+            cursor.execute(rollups.DDL)
+            cursor.execute(estado_actual.DDL)
+            _auxiliares_preparadas = True
+        for tabla, filas in filas_por_tabla.items():
+            cursor.executemany(QUERIES[tabla], filas)
+            total += len(filas)
+        if ROLLUPS_ACTIVOS:
+            agregados = rollups.acumular(filas_por_tabla)
+            if agregados:
+                cursor.executemany(rollups.UPSERT, agregados)
+        if ESTADO_ACTUAL_ACTIVO:
+            ultimas = estado_actual.filas_upsert(filas_por_tabla)
+            if ultimas:
+                cursor.executemany(estado_actual.UPSERT, ultimas)
+        cnx.commit()
+        cursor.close()
+        print(f"Lote insertado correctamente ({total} filas).")
+    except mysql.connector.Error:
+        if cnx is not None:
+            try:
+                cnx.rollback()
+            except mysql.connector.Error:
+                pass
+        raise
+    finally:
+        if cnx is not None:
+            cnx.close()
+    return total
+
+
+class BufferInserciones:
+    """Acumula filas de varios payloads y las escribe por lotes.
+
+    El buffer se vacía cuando alcanza ``max_filas`` o cuando han pasado
+    ``intervalo`` segundos desde el último vaciado. Es seguro usarlo desde
+    varios hilos.
+
+    Un lote que no se ha podido escribir vuelve al buffer con ``devolver`` y se
+    reintenta pasado ``intervalo``; como mucho se retienen ``max_retenidas``
+    filas mientras la base de datos no responde.
+    """
+
+    def __init__(self, max_filas=500, intervalo=1.0, max_retenidas=None):
+        self.max_filas = max_filas
+        self.intervalo = intervalo
+        self.max_retenidas = max_retenidas or 20 * max_filas
+        self._filas = {tabla: [] for tabla in QUERIES}
+        self._pendientes = 0
+        self._ultimo_vaciado = time.monotonic()
+        self._lock = threading.Lock()
+        self.descartadas = 0
+        self._reintentando = False
+
+    @property
+    def pendientes(self):
+        return self._pendientes
+
+    def agregar(self, tabla, valores):
+        with self._lock:
+            self._filas[tabla].append(tuple(valores))
+            self._pendientes += 1
+
+    def debe_vaciar(self):
+        if not self._pendientes:
+            return False
+        if self._pendientes >= self.max_filas and not self._reintentando:
+            return True
+        return time.monotonic() - self._ultimo_vaciado >= self.intervalo
+
+    def devolver(self, filas_por_tabla):
+        """Vuelve a poner delante las filas de un lote fallido. Devuelve False si no caben."""
+        total = sum(len(filas) for filas in filas_por_tabla.values())
+        with self._lock:
+            if self._pendientes + total > self.max_retenidas:
+                self.descartadas += total
+                return False
+            for tabla, filas in filas_por_tabla.items():
+                self._filas[tabla][:0] = filas
+            self._pendientes += total
+            # El reintento espera al siguiente intervalo aunque el buffer esté lleno.
+            self._reintentando = True
+            self._ultimo_vaciado = time.monotonic()
+        return True
+
+    def extraer(self):
+        """Retira y devuelve las filas pendientes sin escribirlas."""
+        with self._lock:
+            filas = self._filas
+            self._filas = {tabla: [] for tabla in QUERIES}
+            self._pendientes = 0
+            self._ultimo_vaciado = time.monotonic()
+            self._reintentando = False
+        return filas
+
+    def vaciar(self):
+        """Escribe todas las filas pendientes en una transacción."""
+        return ejecutar_insert_lote(self.extraer())
 
 # 1. Inserción en clima_data
-def insertar_clima(zona, temperatura, humedad, co2, intensidad_luz, presion):
-    query = ("INSERT INTO clima_data "
-             "(zona, temperatura, humedad, co2, intensidad_luz, presion) "
-             "VALUES (%s, %s, %s, %s, %s, %s)")
-    valores = (zona, temperatura, humedad, co2, intensidad_luz, presion)
-    ejecutar_insert(query, valores)
+def insertar_clima(zona, temperatura, humedad, co2, intensidad_luz, presion, timestamp=None):
+    valores = (zona, temperatura, humedad, co2, intensidad_luz, presion, timestamp or datetime.now())
+    ejecutar_insert(QUERIES["clima_data"], valores)
 
 # 2. Inserción en plantas_data
-def insertar_planta(especie, crecimiento, cantidad_frutos, calidad_frutos, nivel_salud):
-    query = ("INSERT INTO plantas_data "
-             "(especie, crecimiento, cantidad_frutos, calidad_frutos, nivel_salud) "
-             "VALUES (%s, %s, %s, %s, %s)")
-    valores = (especie, crecimiento, cantidad_frutos, calidad_frutos, nivel_salud)
-    ejecutar_insert(query, valores)
+def insertar_planta(especie, crecimiento, cantidad_frutos, calidad_frutos, nivel_salud, timestamp=None):
+    valores = (especie, crecimiento, cantidad_frutos, calidad_frutos, nivel_salud, timestamp or datetime.now())
+    ejecutar_insert(QUERIES["plantas_data"], valores)
 
 # 3. Inserción en riego_data
-def insertar_riego(ph, conductividad, flujo, nivel_deposito, caudal_historico):
-    query = ("INSERT INTO riego_data "
-             "(ph, conductividad, flujo, nivel_deposito, caudal_historico) "
-             "VALUES (%s, %s, %s, %s, %s)")
-    valores = (ph, conductividad, flujo, nivel_deposito, caudal_historico)
-    ejecutar_insert(query, valores)
+def insertar_riego(ph, conductividad, flujo, nivel_deposito, caudal_historico, timestamp=None):
+    valores = (ph, conductividad, flujo, nivel_deposito, caudal_historico, timestamp or datetime.now())
+    ejecutar_insert(QUERIES["riego_data"], valores)
 
 # 4. Inserción en resultados_funciones
-def insertar_resultado_funcion(zona, especie, indice_estres, rendimiento_frutos, eficiencia_luz, necesidad_riego, ajuste_nutricion):
-    query = ("INSERT INTO resultados_funciones "
-             "(zona, especie, indice_estres, rendimiento_frutos, eficiencia_luz, necesidad_riego, ajuste_nutricion) "
-             "VALUES (%s, %s, %s, %s, %s, %s, %s)")
-    valores = (zona, especie, indice_estres, rendimiento_frutos, eficiencia_luz, necesidad_riego, ajuste_nutricion)
-    ejecutar_insert(query, valores)
+def insertar_resultado_funcion(zona, especie, indice_estres, rendimiento_frutos, eficiencia_luz, necesidad_riego, ajuste_nutricion, timestamp=None):
+    valores = (zona, especie, indice_estres, rendimiento_frutos, eficiencia_luz, necesidad_riego, ajuste_nutricion, timestamp or datetime.now())
+    ejecutar_insert(QUERIES["resultados_funciones"], valores)
 
 # 5. Inserción en alertas_criticas
-def insertar_alerta(zona, especie, tipo_alerta):
-    query = ("INSERT INTO alertas_criticas "
-            "(zona, especie, tipo_alerta) "
-            "VALUES (%s, %s, %s)")
-    valores = (zona, especie, tipo_alerta)
-    ejecutar_insert(query, valores)
+def insertar_alerta(zona, especie, tipo_alerta, timestamp=None):
+    valores = (zona, especie, tipo_alerta, timestamp or datetime.now())
+    ejecutar_insert(QUERIES["alertas_criticas"], valores)
@@ -0,0 +1,172 @@
+"""Escritor de lotes que saca las inserciones MySQL del bucle de eventos.
+
+``handle_client`` solo analiza los payloads y encola sus filas; una tarea
+consumidora las acumula en un ``BufferInserciones`` y, al vaciarlo, ejecuta
+``ejecutar_insert_lote`` en un pool de hilos acotado. Mientras tanto el bucle
+sigue aceptando conexiones y procesando mensajes. Si la cola se llena (la BD
+no da abasto), ``encolar`` espera, y con ello deja de leerse el socket del
+cliente: la presión llega hasta el emisor a través de TCP.
+
+``al_escribir``, si se indica, recibe cada lote confirmado en la base de datos
+(p. ej. para anunciarlo al dashboard) desde el mismo hilo de escritura.
+
+``encolar`` admite además una función ``al_confirmar`` por payload, que se
+llama en el bucle de eventos cuando el lote con sus filas se ha confirmado
+en la base de datos (el servidor la usa para confirmar el payload al
+cliente).
+
+Un lote que no se puede escribir (tras los reintentos de
+``ejecutar_insert_lote``) vuelve al buffer con sus confirmaciones y se
+reintenta en el siguiente vaciado. Si el buffer ya retiene demasiadas filas
+se descarta sin confirmar: los clientes lo reenviarán.
+"""
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from greenhouse_system.middleware import database_handler as db
+
+
+class EscritorAsincrono:
+    """Cola acotada de filas + tarea consumidora + hilos de escritura."""
+
+    def __init__(
+        self,
+        buffer: db.BufferInserciones,
+        tamano_cola: int = 100,
+        hilos: int = 2,
+        al_escribir: Optional[Callable[[Dict[str, List[tuple]]], None]] = None,
+    ):
+        self.buffer = buffer
+        self.hilos = hilos
+        self.al_escribir = al_escribir
+        self._cola: asyncio.Queue = asyncio.Queue(maxsize=tamano_cola)
+        self._executor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="escritor_bd")
+        self._escrituras = asyncio.Semaphore(hilos)
+        self._en_curso: Set[asyncio.Future] = set()
+        # Confirmaciones de los payloads cuyas filas están en el buffer.
+        self._confirmaciones: List[Callable[[], None]] = []
+        self._tarea: asyncio.Task | None = None
+        self.esperas_cola = 0
+
+    @property
+    def pendientes(self) -> int:
+        return self._cola.qsize() + self.buffer.pendientes
+
+    def iniciar(self) -> None:
+        if self._tarea is None:
+            self._tarea = asyncio.create_task(self._consumir())
+
+    async def encolar(
+        self,
+        filas: Iterable[Tuple[str, tuple]],
+        al_confirmar: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """Encola las filas de un payload; espera si la cola está llena."""
+        if self._cola.full():
+            self.esperas_cola += 1
+        await self._cola.put((list(filas), al_confirmar))
+
+    async def cerrar(self) -> None:
+        """Vacía cola y buffer y espera a que terminen las escrituras en curso."""
+        if self._tarea is not None:
+            # El centinela hace que el consumidor vacíe lo pendiente y termine.
+            await self._cola.put(None)
+            await self._tarea
+            self._tarea = None
+        else:
+            self._pasar_cola_a_buffer()
+            if self.buffer.pendientes:
+                await self._lanzar_vaciado()
+        if self._en_curso:
+            await asyncio.gather(*self._en_curso, return_exceptions=True)
+
+    def vaciar_sincrono(self) -> None:
+        """Versión bloqueante de ``cerrar`` para usar desde un manejador de señales."""
+        self._pasar_cola_a_buffer()
+        # Espera a los lotes que ya estaban escribiéndose antes de escribir el resto.
+        self._executor.shutdown(wait=True)
+        self.buffer.vaciar()
+
+    async def _consumir(self) -> None:
+        while True:
+            try:
+                filas = await asyncio.wait_for(self._cola.get(), timeout=self.buffer.intervalo)
+            except asyncio.TimeoutError:
+                # Sin payloads nuevos: solo se comprueba la ventana de vaciado.
+                pass
+            else:
+                self._cola.task_done()
+                if filas is None:
+                    if self.buffer.pendientes:
+                        await self._lanzar_vaciado()
+                    return
+                self._agregar(*filas)
+            if self.buffer.debe_vaciar():
+                await self._lanzar_vaciado()
+
+    async def _lanzar_vaciado(self) -> None:
+        # Con todos los hilos ocupados el consumidor se detiene aquí, la cola se
+        # llena y los productores esperan en `encolar`.
+        await self._escrituras.acquire()
+        lote = self.buffer.extraer()
+        confirmaciones, self._confirmaciones = self._confirmaciones, []
+        loop = asyncio.get_running_loop()
+        futuro = loop.run_in_executor(self._executor, self._escribir, lote)
+        self._en_curso.add(futuro)
+        futuro.add_done_callback(partial(self._escritura_terminada, lote, confirmaciones))
+
+    def _escribir(self, lote: Dict[str, List[tuple]]) -> int:
+        total = db.ejecutar_insert_lote(lote)
+        if total and self.al_escribir is not None:
+            self.al_escribir(lote)
+        return total
+
+    def _escritura_terminada(
+        self,
+        lote: Dict[str, List[tuple]],
+        confirmaciones: List[Callable[[], None]],
+        futuro: asyncio.Future,
+    ) -> None:
+        self._en_curso.discard(futuro)
+        self._escrituras.release()
+        if futuro.cancelled():
+            return
+        if futuro.exception() is None and futuro.result():
+            for confirmar in confirmaciones:
+                confirmar()
+            return
+        if futuro.exception() is not None:
+            print(f"Error en la escritura del lote: {futuro.exception()}")
+        filas = sum(len(valores) for valores in lote.values())
+        if self.buffer.devolver(lote):
+            self._confirmaciones[:0] = confirmaciones
+            print(f"Lote de {filas} filas devuelto al buffer; se reintentará")
+        else:
+            print(f"[AVISO] Buffer lleno: descartado un lote de {filas} filas sin confirmar")
+
+    def _agregar(self, filas: List[Tuple[str, tuple]], al_confirmar: Optional[Callable[[], None]]) -> None:
+        for tabla, valores in filas:
+            self.buffer.agregar(tabla, valores)
+        if al_confirmar is not None:
+            if filas:
+                self._confirmaciones.append(al_confirmar)
+            else:
+                # Payload sin filas: no hay nada que esperar.
+                al_confirmar()
+
+    def _pasar_cola_a_buffer(self) -> None:
+        while True:
+            try:
+                filas = self._cola.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if filas is not None:
+                # En el vaciado síncrono ya no se confirma a los clientes:
+                # reenviarán esos payloads al reconectar.
+                for tabla, valores in filas[0]:
+                    self.buffer.agregar(tabla, valores)
+            self._cola.task_done()
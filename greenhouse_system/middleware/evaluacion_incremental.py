@@ -0,0 +1,121 @@
+"""Evaluación incremental de los algoritmos de ``algoritmos.py``.
+
+Con sensores que cambian poco entre ciclos, la mayoría de pares zona x especie
+llegan con las mismas entradas que en el payload anterior. ``EvaluadorIncremental``
+recuerda, para cada algoritmo, las últimas entradas y el resultado por clave y
+solo recalcula cuando cambian. La clave es el ámbito real de cada algoritmo:
+
+* ``indice_estres`` y ``eficiencia_luz``: (zona, especie).
+* ``rendimiento_frutos`` y ``ajuste_nutricion``: especie (solo usan valores de
+  la planta y, en el segundo, del riego, que es común).
+* ``necesidad_riego``: zona (clima de la zona y riego).
+
+``alerta_critica`` incluye una alerta aleatoria y se evalúa siempre.
+
+Opcionalmente (``suprimir_sin_cambios``) se omite la fila de
+``resultados_funciones`` de un par cuyos resultados no han cambiado, salvo que
+hayan pasado ``refresco`` segundos desde la última escrita.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from greenhouse_system.middleware import algoritmos
+
+Par = Tuple[str, str, Any, Any, Any, Any, Any, Optional[str]]
+
+
+class EvaluadorIncremental:
+    """Caché de entradas y resultados por algoritmo, con contadores."""
+
+    def __init__(self, suprimir_sin_cambios: bool = False, refresco: float = 60.0) -> None:
+        self.suprimir_sin_cambios = suprimir_sin_cambios
+        self.refresco = refresco
+        self._cache: Dict[str, Dict[Hashable, Tuple[tuple, Any]]] = {}
+        self._escritos: Dict[Tuple[str, str], Tuple[tuple, datetime]] = {}
+        self.recalculadas = 0
+        self.omitidas = 0
+        self.filas_suprimidas = 0
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {
+            "recalculadas": self.recalculadas,
+            "omitidas": self.omitidas,
+            "filas_suprimidas": self.filas_suprimidas,
+        }
+
+    def reiniciar(self) -> None:
+        self._cache.clear()
+        self._escritos.clear()
+
+    def evaluar(
+        self,
+        clima: Dict[str, Dict[str, Any]],
+        plantas: Dict[str, Dict[str, Any]],
+        riego: Optional[Dict[str, Any]],
+        hora_actual: int,
+    ) -> List[Par]:
+        """Mismo resultado que el bucle escalar de ``middleware_servidor.evaluar_pares``."""
+        pares: List[Par] = []
+        for zona, clima_zona in clima.items():
+            temperatura = clima_zona.get("Temperatura")
+            humedad = clima_zona.get("Humedad")
+            co2 = clima_zona.get("CO2")
+            luz = clima_zona.get("IntensidadLuz")
+            necesidad = None
+            if riego is not None:
+                necesidad = self._calcular(
+                    "necesidad_riego", zona, algoritmos.necesidad_riego,
+                    riego.get("NivelDeposito"), riego.get("Flujo"), temperatura, humedad,
+                )
+            for especie, planta in plantas.items():
+                salud = planta.get("NivelSalud")
+                crecimiento = planta.get("Crecimiento")
+                estres = self._calcular(
+                    "indice_estres", (zona, especie), algoritmos.indice_estres,
+                    temperatura, humedad, co2, salud,
+                )
+                rendimiento = self._calcular(
+                    "rendimiento_frutos", especie, algoritmos.rendimiento_frutos,
+                    planta.get("CantidadFrutos"), planta.get("CalidadFrutos"), crecimiento,
+                )
+                eficiencia = self._calcular(
+                    "eficiencia_luz", (zona, especie), algoritmos.eficiencia_luz,
+                    luz, hora_actual, crecimiento,
+                )
+                ajuste = None
+                if riego is not None:
+                    ajuste = self._calcular(
+                        "ajuste_nutricion", especie, algoritmos.ajuste_nutricion,
+                        salud, riego.get("pH"), riego.get("Conductividad"),
+                    )
+                problema = algoritmos.alerta_critica(temperatura, co2, salud, luz)
+                pares.append((zona, especie, estres, rendimiento, eficiencia, necesidad, ajuste, problema))
+        return pares
+
+    def debe_escribir(self, zona: str, especie: str, resultados: tuple, marca: datetime) -> bool:
+        """Indica si hay que guardar la fila de resultados de un par."""
+        if not self.suprimir_sin_cambios:
+            return True
+        anterior = self._escritos.get((zona, especie))
+        if (
+            anterior is not None
+            and anterior[0] == resultados
+            and (marca - anterior[1]).total_seconds() < self.refresco
+        ):
+            self.filas_suprimidas += 1
+            return False
+        self._escritos[(zona, especie)] = (resultados, marca)
+        return True
+
+    def _calcular(self, algoritmo: str, clave: Hashable, funcion: Callable[..., Any], *entradas: Any) -> Any:
+        cache = self._cache.setdefault(algoritmo, {})
+        previo = cache.get(clave)
+        if previo is not None and previo[0] == entradas:
+            self.omitidas += 1
+            return previo[1]
+        resultado = funcion(*entradas)
+        cache[clave] = (entradas, resultado)
+        self.recalculadas += 1
+        return resultado
@@ -0,0 +1,158 @@
+"""Lectura eficiente de las variables de un servidor OPC UA.
+
+El árbol de nodos se recorre una sola vez (al conectar o cuando el servidor
+deja de reconocer algún nodo) y los NodeIds resultantes se guardan; cada ciclo
+de lectura es después una única petición Read con todos los valores del
+servidor, en lugar de un ``read_value()`` por variable.
+
+Como alternativa al sondeo, ``suscribir`` crea una suscripción con monitored
+items sobre esos mismos nodos: el servidor solo envía notificaciones cuando un
+valor cambia y ``estado`` se mantiene al día con ellas.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from asyncua import Client, Node, ua
+
+# Estados que indican que los NodeIds guardados ya no son válidos (el servidor
+# se reinició o cambió su modelo) y hay que volver a recorrer el árbol.
+_ESTADOS_REBROWSE = {
+    ua.StatusCodes.BadNodeIdUnknown,
+    ua.StatusCodes.BadNodeIdInvalid,
+}
+
+
+def serialize_value(value):
+    """Convierte valores no serializables a formato JSON seguro"""
+    if isinstance(value, (int, float, str, bool)):
+        return value
+    elif hasattr(value, "isoformat"):  # datetime
+        return value.isoformat()
+    else:
+        return str(value)
+
+
+class LectorServidor:
+    """Lee los objetos ``relevant_nodes`` de un servidor con NodeIds cacheados."""
+
+    def __init__(self, client: Client, relevant_nodes: Iterable[str]) -> None:
+        self.client = client
+        self.relevant_nodes = list(relevant_nodes)
+        self._claves: List[Tuple[str, str]] = []
+        self._nodos: List[Node] = []
+        self.resoluciones = 0
+        # Modo suscripción: último valor conocido de cada variable.
+        self.estado: Dict[str, Dict[str, Any]] = {}
+        self.notificaciones = 0
+        self._por_nodo: Dict[ua.NodeId, Tuple[str, str]] = {}
+        self._al_cambiar: Optional[Callable[["LectorServidor"], None]] = None
+        self._suscripcion = None
+
+    @property
+    def resuelto(self) -> bool:
+        return bool(self._nodos)
+
+    @property
+    def nodos(self) -> List[Node]:
+        return list(self._nodos)
+
+    @property
+    def claves(self) -> List[Tuple[str, str]]:
+        """``(objeto, variable)`` de cada nodo, en el mismo orden que ``nodos``."""
+        return list(self._claves)
+
+    def invalidar(self) -> None:
+        """Descarta los NodeIds guardados; la próxima lectura recorrerá el árbol."""
+        self._claves = []
+        self._nodos = []
+
+    async def resolver(self) -> None:
+        """Recorre el árbol una vez y guarda los NodeIds de las variables de interés."""
+        claves: List[Tuple[str, str]] = []
+        nodos: List[Node] = []
+        objetos = await self.client.nodes.objects.get_children()
+        nombres = await self._leer_atributo(objetos, ua.AttributeIds.BrowseName)
+        for obj, nombre in zip(objetos, nombres):
+            if nombre is None or nombre.Name not in self.relevant_nodes:
+                continue
+            hijos = await obj.get_children()
+            clases = await self._leer_atributo(hijos, ua.AttributeIds.NodeClass)
+            variables = [hijo for hijo, clase in zip(hijos, clases) if clase == ua.NodeClass.Variable]
+            for var, var_name in zip(variables, await self._leer_atributo(variables, ua.AttributeIds.BrowseName)):
+                claves.append((nombre.Name, var_name.Name))
+                nodos.append(var)
+        self._claves = claves
+        self._nodos = nodos
+        self.resoluciones += 1
+
+    async def leer(self) -> Dict[str, Dict[str, Any]]:
+        """Lee todos los valores del servidor en una sola petición Read."""
+        if not self.resuelto:
+            await self.resolver()
+        resultados = await self.client.read_attributes(self._nodos, ua.AttributeIds.Value)
+        if any(r.StatusCode.value in _ESTADOS_REBROWSE for r in resultados):
+            await self.resolver()
+            resultados = await self.client.read_attributes(self._nodos, ua.AttributeIds.Value)
+
+        data: Dict[str, Dict[str, Any]] = {nombre: {} for nombre, _ in self._claves}
+        for (obj_name, var_name), resultado in zip(self._claves, resultados):
+            if resultado.StatusCode.is_good() and resultado.Value is not None:
+                data[obj_name][var_name] = serialize_value(resultado.Value.Value)
+        return data
+
+    async def suscribir(
+        self,
+        periodo_ms: float,
+        al_cambiar: Callable[["LectorServidor"], None],
+        deadband: float = 0.0,
+        tamano_cola: int = 1,
+    ) -> None:
+        """Sustituye el sondeo por notificaciones de cambio del servidor.
+
+        Args:
+            periodo_ms: Intervalo de publicación de la suscripción.
+            al_cambiar: Se invoca (en el bucle de eventos) tras cada notificación.
+            deadband: Deadband absoluto para las variables numéricas; 0 lo desactiva.
+            tamano_cola: Muestras que el servidor encola por variable entre publicaciones.
+        """
+        if not self.resuelto:
+            await self.resolver()
+        self.estado = await self.leer()
+        self._por_nodo = {nodo.nodeid: clave for nodo, clave in zip(self._nodos, self._claves)}
+        self._al_cambiar = al_cambiar
+        self._suscripcion = await self.client.create_subscription(periodo_ms, self)
+
+        # El deadband solo es válido en variables numéricas; el resto (p. ej.
+        # EspeciePlanta) se monitoriza sin filtro.
+        numericos, otros = [], []
+        for nodo, (obj_name, var_name) in zip(self._nodos, self._claves):
+            valor = self.estado.get(obj_name, {}).get(var_name)
+            es_numerico = isinstance(valor, (int, float)) and not isinstance(valor, bool)
+            (numericos if deadband > 0 and es_numerico else otros).append(nodo)
+        if numericos:
+            await self._suscripcion.deadband_monitor(numericos, deadband, queuesize=tamano_cola)
+        if otros:
+            await self._suscripcion.subscribe_data_change(otros, queuesize=tamano_cola)
+
+    async def cancelar_suscripcion(self) -> None:
+        if self._suscripcion is not None:
+            await self._suscripcion.delete()
+            self._suscripcion = None
+
+    def datachange_notification(self, node: Node, val: Any, data: Any) -> None:
+        """Manejador de asyncua para las notificaciones de la suscripción."""
+        clave = self._por_nodo.get(node.nodeid)
+        if clave is None:
+            return
+        obj_name, var_name = clave
+        self.estado.setdefault(obj_name, {})[var_name] = serialize_value(val)
+        self.notificaciones += 1
+        if self._al_cambiar is not None:
+            self._al_cambiar(self)
+
+    async def _leer_atributo(self, nodos: List[Node], atributo: ua.AttributeIds) -> List[Any]:
+        if not nodos:
+            return []
+        resultados = await self.client.read_attributes(nodos, atributo)
+        return [r.Value.Value if r.Value else None for r in resultados]
@@ -1,6 +1,8 @@
 import asyncio
-import json
 import sys
+import time
+from collections import deque
+from datetime import datetime
 from pathlib import Path
 from asyncua import Client, ua
 
@@ -29,8 +31,41 @@ def _ensure_package_root() -> None:
 
 _ensure_package_root()
 
+from greenhouse_system.middleware.lector_opcua import LectorServidor  # noqa:E402
+from greenhouse_system.middleware.protocolo import ConexionMiddleware, ErrorProtocolo  # noqa:E402
+from greenhouse_system.middleware.spool import SpoolLocal  # noqa:E402
+
 MIDDLEWARE_SERVER_IP = "127.0.0.1"
 MIDDLEWARE_SERVER_PORT = 5000
+# Codificaciones propuestas al servidor, por orden de preferencia.
+FORMATOS_PREFERIDOS = ["esquema", "json"]
+COMPRESION_PREFERIDA = ["zlib"]
+
+# Payloads que no se han podido entregar al servidor: se guardan en disco y se
+# reenvían en orden, de LOTE_DRENADO en LOTE_DRENADO, cuando vuelve a responder.
+DIRECTORIO_SPOOL = Path(__file__).resolve().parents[1] / "spool_middleware"
+SPOOL_MAX_BYTES = 64 * 1024 * 1024
+LOTE_DRENADO = 200
+# Un payload solo se da por entregado cuando el servidor confirma que sus filas
+# están en la base de datos. Sin confirmación en TIMEOUT_CONFIRMACION segundos
+# se cierra la conexión y los payloads pendientes vuelven al spool.
+CONFIRMACIONES = True
+TIMEOUT_CONFIRMACION = 5.0
+
+# "suscripcion": los servidores notifican los cambios (monitored items).
+# "sondeo": lectura completa de los tres servidores cada INTERVALO_SONDEO segundos.
+MODO_LECTURA = "suscripcion"
+INTERVALO_SONDEO = 5
+# En modo sondeo los tres servidores se leen a la vez; el que no responda en
+# este plazo queda fuera del payload, que se marca como parcial.
+TIMEOUT_LECTURA = 2.0
+# Parámetros de la suscripción OPC UA.
+PERIODO_PUBLICACION_MS = 500
+DEADBAND_ABSOLUTO = 0.0
+TAMANO_COLA_MONITOR = 1
+# Las notificaciones de los tres servidores que llegan dentro de esta ventana
+# se agrupan en un único payload.
+VENTANA_AGRUPACION = 0.05
 
 # Endpoints de los servidores OPC UA
 ENDPOINTS = {
@@ -39,69 +74,188 @@ ENDPOINTS = {
     "riego": "opc.tcp://127.0.0.1:4843/riego/"
 }
 
-def serialize_value(value):
-    """Convierte valores no serializables a formato JSON seguro"""
-    if isinstance(value, (int, float, str, bool)):
-        return value
-    elif hasattr(value, "isoformat"):  # datetime
-        return value.isoformat()
-    else:
-        return str(value)
-
-async def read_relevant_variables(client, relevant_nodes):
-    """Lee solo los nodos de interés definidos en relevant_nodes"""
-    data = {}
-    objects = await client.nodes.objects.get_children()
-    for obj in objects:
-        name = await obj.read_browse_name()
-        node_name = name.Name
-
-        # Solo procesar nodos que están en relevant_nodes
-        if node_name in relevant_nodes:
-            data[node_name] = {}
-            for var in await obj.get_children():
-                var_class = await var.read_node_class()
-                if var_class == ua.NodeClass.Variable:
-                    var_name = (await var.read_browse_name()).Name
-                    value = await var.read_value()
-                    data[node_name][var_name] = serialize_value(value)
-    return data
-
-async def send_to_server(json_data):
-    reader, writer = await asyncio.open_connection(MIDDLEWARE_SERVER_IP, MIDDLEWARE_SERVER_PORT)
-    writer.write(json_data.encode())
-    await writer.drain()
-    writer.close()
-    await writer.wait_closed()
+# Conexión persistente con el middleware servidor: todos los payloads viajan
+# como tramas con longitud por el mismo socket, en la codificación más compacta
+# que acepte el servidor (ver middleware/codificacion.py).
+conexion_servidor = ConexionMiddleware(
+    MIDDLEWARE_SERVER_IP,
+    MIDDLEWARE_SERVER_PORT,
+    formatos=FORMATOS_PREFERIDOS,
+    compresion=COMPRESION_PREFERIDA,
+    confirmaciones=CONFIRMACIONES,
+)
+
+# Se abre en main(): importar el módulo no debe crear el directorio del spool.
+spool = None
+# Payloads enviados fuera del spool que el servidor aún no ha confirmado:
+# (sesión, número en la conexión, hora de envío, payload).
+sin_confirmar = deque()
+
+async def send_to_server(payload):
+    return await conexion_servidor.enviar_payload(payload)
+
+async def drenar_spool():
+    """Reenvía en orden los payloads pendientes del spool. Devuelve los entregados.
+
+    Con confirmaciones, cada lote se borra del disco solo cuando el servidor lo
+    confirma; si no llega a tiempo, el lote sigue en el spool.
+    """
+    entregados = 0
+    while spool.pendientes:
+        lote = spool.leer_lote(LOTE_DRENADO)
+        await conexion_servidor.enviar_payloads(lote.payloads)
+        if conexion_servidor.confirmaciones:
+            await conexion_servidor.esperar_confirmacion(conexion_servidor.enviados, TIMEOUT_CONFIRMACION)
+        spool.confirmar(lote)
+        entregados += len(lote.payloads)
+    return entregados
+
+def revisar_confirmaciones():
+    """Descarta los payloads ya confirmados y devuelve los que hay que dar por perdidos.
+
+    Los pendientes se pierden si la conexión por la que salieron se ha cerrado
+    o si el más antiguo lleva más de TIMEOUT_CONFIRMACION segundos sin confirmar.
+    """
+    while (
+        sin_confirmar
+        and sin_confirmar[0][0] == conexion_servidor.sesion
+        and sin_confirmar[0][1] <= conexion_servidor.confirmado
+    ):
+        sin_confirmar.popleft()
+    if not sin_confirmar:
+        return []
+    caducado = time.monotonic() - sin_confirmar[0][2] > TIMEOUT_CONFIRMACION
+    if caducado or not conexion_servidor.conectada or sin_confirmar[0][0] != conexion_servidor.sesion:
+        perdidos = [payload for *_, payload in sin_confirmar]
+        sin_confirmar.clear()
+        return perdidos
+    return []
+
+def guardar_sin_confirmar():
+    """Devuelve a la cabeza del spool, en orden, los payloads enviados que el servidor no confirmó.
+
+    Son anteriores a todo lo que haya en el spool, así que se reenvían primero.
+    """
+    perdidos = [payload for *_, payload in sin_confirmar]
+    sin_confirmar.clear()
+    spool.reinsertar(perdidos)
+    return len(perdidos)
+
+def construir_payload(datos, faltantes=()):
+    """Payload con las secciones leídas; si falta alguna se marca como parcial."""
+    payload = dict(datos)
+    # Hora de la muestra: el servidor la usa para las filas aunque el payload
+    # llegue más tarde desde el spool.
+    payload["timestamp"] = datetime.now().isoformat()
+    if faltantes:
+        payload["parcial"] = True
+        payload["faltantes"] = list(faltantes)
+    return payload
+
+async def enviar_payload(payload):
+    """Envía el payload; si el servidor no está disponible lo guarda en el spool."""
+    perdidos = revisar_confirmaciones()
+    if perdidos:
+        print(f"[AVISO] {len(perdidos)} payloads sin confirmar por el servidor; se reenviarán desde el spool")
+        await conexion_servidor.cerrar()
+        spool.reinsertar(perdidos)
+    if spool.pendientes:
+        # Hay muestras anteriores sin entregar: el payload va detrás de ellas.
+        spool.agregar(payload)
+        try:
+            reenviados = await drenar_spool()
+        except (ConnectionError, OSError, ErrorProtocolo) as exc:
+            print(f"[AVISO] Servidor no disponible ({exc}); {spool.pendientes} payloads en el spool")
+            return
+        print(f"Servidor disponible: reenviados {reenviados} payloads del spool")
+        return
+    try:
+        enviados = await send_to_server(payload)
+    except (ConnectionError, OSError, ErrorProtocolo) as exc:
+        guardar_sin_confirmar()
+        spool.agregar(payload)
+        print(f"[AVISO] Servidor no disponible ({exc}); {spool.pendientes} payloads en el spool")
+        return
+    if conexion_servidor.confirmaciones:
+        sin_confirmar.append(
+            (conexion_servidor.sesion, conexion_servidor.enviados, time.monotonic(), payload)
+        )
+    parcial = f", faltan {payload['faltantes']}" if payload.get("parcial") else ""
+    print(f"Enviado payload de {enviados} bytes ({conexion_servidor.formato}{parcial})")
+
+async def leer_con_timeout(nombre, lector):
+    """Lee un servidor con plazo máximo; devuelve ``None`` si no responde a tiempo."""
+    try:
+        return await asyncio.wait_for(lector.leer(), TIMEOUT_LECTURA)
+    except asyncio.TimeoutError:
+        print(f"[AVISO] El servidor {nombre} no respondió en {TIMEOUT_LECTURA} s")
+    except (ua.UaError, ConnectionError, OSError) as exc:
+        print(f"[AVISO] Error leyendo el servidor {nombre}: {exc}")
+    return None
+
+async def bucle_sondeo(lectores):
+    while True:
+        # Lecturas concurrentes: la latencia del ciclo es la del servidor más
+        # lento (acotada por TIMEOUT_LECTURA), no la suma de los tres.
+        resultados = await asyncio.gather(
+            *(leer_con_timeout(nombre, lector) for nombre, lector in lectores.items())
+        )
+        datos = {nombre: data for nombre, data in zip(lectores, resultados) if data is not None}
+        faltantes = [nombre for nombre, data in zip(lectores, resultados) if data is None]
+
+        await enviar_payload(construir_payload(datos, faltantes))
+        await asyncio.sleep(INTERVALO_SONDEO)
+
+async def bucle_suscripcion(lectores):
+    """Envía un payload solo cuando algún servidor notifica cambios."""
+    hay_cambios = asyncio.Event()
+    for lector in lectores.values():
+        await lector.suscribir(
+            PERIODO_PUBLICACION_MS,
+            lambda _lector: hay_cambios.set(),
+            deadband=DEADBAND_ABSOLUTO,
+            tamano_cola=TAMANO_COLA_MONITOR,
+        )
+
+    while True:
+        await hay_cambios.wait()
+        await asyncio.sleep(VENTANA_AGRUPACION)
+        hay_cambios.clear()
+        datos = {
+            nombre: {obj: dict(valores) for obj, valores in lector.estado.items()}
+            for nombre, lector in lectores.items()
+        }
+        await enviar_payload(construir_payload(datos))
 
 async def main():
+    global spool
+    spool = SpoolLocal(DIRECTORIO_SPOOL, tamano_maximo=SPOOL_MAX_BYTES)
     async with Client(ENDPOINTS["clima"]) as clima_client, \
                Client(ENDPOINTS["plantas"]) as plantas_client, \
                Client(ENDPOINTS["riego"]) as riego_client:
 
         print("Middleware cliente conectado a servidores OPC UA")
         
-        # Definir solo los nodos que nos interesan
-        relevant_clima = ["Zona_A", "Zona_B"]
-        relevant_plantas = ["Tomates", "Pimientos"]
-        relevant_riego = ["Riego"]
-
-        while True:
-            clima_data = await read_relevant_variables(clima_client, relevant_clima)
-            plantas_data = await read_relevant_variables(plantas_client, relevant_plantas)
-            riego_data = await read_relevant_variables(riego_client, relevant_riego)
-
-            payload = {
-                "clima": clima_data,
-                "plantas": plantas_data,
-                "riego": riego_data,
-                "timestamp": str(asyncio.get_event_loop().time())
-            }
-
-            json_payload = json.dumps(payload)
-            await send_to_server(json_payload)
-            print(f"Enviado: {json.dumps(payload, indent=2)}\n")
-            await asyncio.sleep(5)
+        # Definir solo los nodos que nos interesan. Cada lector recorre el árbol
+        # una vez y después lee todos sus valores en una sola petición.
+        lectores = {
+            "clima": LectorServidor(clima_client, ["Zona_A", "Zona_B"]),
+            "plantas": LectorServidor(plantas_client, ["Tomates", "Pimientos"]),
+            "riego": LectorServidor(riego_client, ["Riego"]),
+        }
+        await asyncio.gather(*(lector.resolver() for lector in lectores.values()))
+
+        if MODO_LECTURA == "suscripcion":
+            await bucle_suscripcion(lectores)
+        else:
+            await bucle_sondeo(lectores)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    finally:
+        # Lo que quede en el spool (también lo enviado sin confirmar) se
+        # reenviará en el siguiente arranque.
+        if spool is not None:
+            guardar_sin_confirmar()
+            spool.cerrar()
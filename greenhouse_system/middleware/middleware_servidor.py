@@ -1,13 +1,12 @@
 import asyncio
 import json
 import signal
+import struct
+import zlib
 import sys
 from datetime import datetime
 from pathlib import Path
 
-import database_handler as db
-import algoritmos
-
 
 def _ensure_package_root() -> None:
     """Garantiza que el paquete `greenhouse_system` sea importable.
@@ -34,15 +33,75 @@ def _ensure_package_root() -> None:
 
 _ensure_package_root()
 
+import mysql.connector  # noqa:E402
+
+from greenhouse_system.database import particiones, rollups  # noqa:E402
 from greenhouse_system.informes.latex_generator import ReportGenerator  # noqa:E402
+from greenhouse_system.middleware import algoritmos, algoritmos_vectorizados  # noqa:E402
+from greenhouse_system.middleware import database_handler as db  # noqa:E402
+from greenhouse_system.middleware.escritor_asincrono import EscritorAsincrono  # noqa:E402
+from greenhouse_system.middleware.evaluacion_incremental import EvaluadorIncremental  # noqa:E402
+from greenhouse_system.middleware import codificacion, protocolo  # noqa:E402
+from greenhouse_system.middleware.publicador import Publicador  # noqa:E402
 
 HOST = "127.0.0.1"
 PORT = 5000
 
+# Escritura por lotes: se vacía el buffer al llegar a FLUSH_MAX_FILAS filas o
+# cada FLUSH_INTERVALO segundos, lo que ocurra antes.
+FLUSH_MAX_FILAS = 500
+FLUSH_INTERVALO = 1.0
+# Las escrituras se hacen fuera del bucle de eventos: como mucho
+# HILOS_ESCRITURA lotes a la vez y COLA_MAX_PAYLOADS payloads en espera antes
+# de dejar de leer de los sockets.
+HILOS_ESCRITURA = 2
+COLA_MAX_PAYLOADS = 100
+# A partir de este número de pares zona x especie los algoritmos se evalúan
+# con NumPy sobre la matriz completa en lugar de par a par. Por debajo el coste
+# fijo de NumPy pesa más que el bucle: según benchmarks/bench_algoritmos.py
+# (bucle par a par frente a NumPy) la versión NumPy es más lenta con 36 pares
+# (0,75x) y más rápida a partir de 64 (1,3x; 2,5x con 144).
+UMBRAL_VECTORIZADO = 64
+# Por debajo del umbral, solo se recalculan los algoritmos cuyas entradas han
+# cambiado desde el payload anterior. Con SUPRIMIR_SIN_CAMBIOS además se omite
+# la fila de resultados de un par que no ha cambiado (como mucho durante
+# REFRESCO_RESULTADOS segundos).
+EVALUACION_INCREMENTAL = True
+SUPRIMIR_SIN_CAMBIOS = False
+REFRESCO_RESULTADOS = 60.0
+# Mantenimiento de las tablas particionadas por fecha (ver
+# database/particiones.py): cada INTERVALO_MANTENIMIENTO segundos se crean los
+# periodos futuros y se eliminan las particiones con más de DIAS_RETENCION
+# días. Las tablas sin particionar no se tocan; None desactiva la retención.
+# En la misma tarea se purgan los rollups por minuto con más de
+# rollups.DIAS_RETENCION_MINUTOS días.
+INTERVALO_MANTENIMIENTO = 3600
+DIAS_RETENCION = particiones.DIAS_RETENCION
+# Cada lote escrito se anuncia a los dashboards suscritos en PUBLICADOR_PORT
+# (modo push, ver middleware/publicador.py). False desactiva la publicación.
+PUBLICAR_EVENTOS = True
+PUBLICADOR_PORT = 5001
+
+publicador = Publicador(HOST, PUBLICADOR_PORT)
+
+escritor = EscritorAsincrono(
+    db.BufferInserciones(FLUSH_MAX_FILAS, FLUSH_INTERVALO),
+    tamano_cola=COLA_MAX_PAYLOADS,
+    hilos=HILOS_ESCRITURA,
+    al_escribir=publicador.publicar_lote if PUBLICAR_EVENTOS else None,
+)
+
+evaluador = EvaluadorIncremental(SUPRIMIR_SIN_CAMBIOS, REFRESCO_RESULTADOS)
+
 
 class GracefulShutdown:
-    def __init__(self, report_generator: ReportGenerator | None = None):
+    def __init__(
+        self,
+        report_generator: ReportGenerator | None = None,
+        escritor_bd: EscritorAsincrono | None = None,
+    ):
         self.report_generator = report_generator or ReportGenerator()
+        self.escritor = escritor_bd or escritor
         self.server = None
         signal.signal(signal.SIGINT, self.shutdown)
         signal.signal(signal.SIGTERM, self.shutdown)
@@ -51,6 +110,12 @@ class GracefulShutdown:
         self.server = server
 
     def shutdown(self, signum, frame):
+        # Las filas pendientes deben llegar a la BD antes del informe final.
+        if self.escritor.pendientes:
+            print("Vaciando datos pendientes de escritura...")
+        self.escritor.vaciar_sincrono()
+        if EVALUACION_INCREMENTAL:
+            print(f"Evaluación incremental: {evaluador.estadisticas()}")
         print("Generando informe final...")
         try:
             result = self.report_generator.generate_daily_report("informe_final", compile_pdf=True)
@@ -67,120 +132,227 @@ class GracefulShutdown:
         sys.exit(0)
 
 
+def evaluar_pares(clima, plantas, riego, hora_actual) -> list:
+    """Aplica los algoritmos a cada par zona x especie.
+
+    Devuelve ``(zona, especie, estres, rendimiento, eficiencia, necesidad,
+    ajuste, alerta)`` por par. A partir de ``UMBRAL_VECTORIZADO`` pares se usa
+    la versión NumPy y por debajo, si está activa, la evaluación incremental;
+    los resultados son idénticos en todos los casos.
+    """
+    if len(clima) * len(plantas) >= UMBRAL_VECTORIZADO:
+        try:
+            return algoritmos_vectorizados.evaluar_pares(clima, plantas, riego, hora_actual)
+        except TypeError:
+            # Valores ausentes o no numéricos: se mantiene el comportamiento
+            # del bucle escalar.
+            pass
+    elif EVALUACION_INCREMENTAL:
+        return evaluador.evaluar(clima, plantas, riego, hora_actual)
+
+    pares = []
+    for zona, clima_zona in clima.items():
+        for especie, planta in plantas.items():
+            # Índice de estrés
+            estres = algoritmos.indice_estres(
+                clima_zona.get("Temperatura"),
+                clima_zona.get("Humedad"),
+                clima_zona.get("CO2"),
+                planta.get("NivelSalud")
+            )
+            # Rendimiento de frutos
+            rendimiento = algoritmos.rendimiento_frutos(
+                planta.get("CantidadFrutos"),
+                planta.get("CalidadFrutos"),
+                planta.get("Crecimiento")
+            )
+            # Eficiencia de luz
+            eficiencia = algoritmos.eficiencia_luz(
+                clima_zona.get("IntensidadLuz"),
+                hora_actual,
+                planta.get("Crecimiento")
+            )
+            necesidad = ajuste = None
+            if riego is not None:
+                # Necesidad de riego
+                necesidad = algoritmos.necesidad_riego(
+                    riego.get("NivelDeposito"),
+                    riego.get("Flujo"),
+                    clima_zona.get("Temperatura"),
+                    clima_zona.get("Humedad")
+                )
+                # Ajuste nutrición
+                ajuste = algoritmos.ajuste_nutricion(
+                    planta.get("NivelSalud"),
+                    riego.get("pH"),
+                    riego.get("Conductividad")
+                )
+            # ---- Alertas críticas ----
+            problema = algoritmos.alerta_critica(
+                clima_zona.get("Temperatura"),
+                clima_zona.get("CO2"),
+                planta.get("NivelSalud"),
+                clima_zona.get("IntensidadLuz")
+            )
+            pares.append((zona, especie, estres, rendimiento, eficiencia, necesidad, ajuste, problema))
+    return pares
+
+
+def marca_temporal(json_data) -> datetime:
+    """Hora de la muestra según el payload, o la actual si no trae una válida.
+
+    Los payloads reenviados desde el spool del cliente llegan con retraso, así
+    que sus filas deben llevar la hora original y no la de inserción.
+    """
+    try:
+        return datetime.fromisoformat(json_data["timestamp"])
+    except (KeyError, TypeError, ValueError):
+        # Clientes antiguos envían el reloj del bucle de eventos, no una fecha.
+        return datetime.now()
+
+
+def procesar_payload(json_data) -> list:
+    """Calcula los resultados de un payload y devuelve sus filas ``(tabla, valores)``."""
+    filas = []
+    marca = marca_temporal(json_data)
+    # ---- Inserción de datos crudos ----
+    for zona, values in json_data.get("clima", {}).items():
+        filas.append(("clima_data", (
+            zona,
+            values.get("Temperatura"),
+            values.get("Humedad"),
+            values.get("CO2"),
+            values.get("IntensidadLuz"),
+            values.get("Presion", 1013),  # Valor por defecto si no existe
+            marca
+        )))
+
+    for especie, values in json_data.get("plantas", {}).items():
+        filas.append(("plantas_data", (
+            especie,
+            values.get("Crecimiento"),
+            values.get("CantidadFrutos"),
+            values.get("CalidadFrutos"),
+            values.get("NivelSalud"),
+            marca
+        )))
+
+    for riego_name, values in json_data.get("riego", {}).items():
+        filas.append(("riego_data", (
+            values.get("pH"),
+            values.get("Conductividad"),
+            values.get("Flujo"),
+            values.get("NivelDeposito"),
+            values.get("CaudalHistorico"),
+            marca
+        )))
+
+    # ---- Procesamiento de algoritmos ----
+    # En un payload parcial puede faltar el servidor de riego: los resultados
+    # que dependen de él se guardan como NULL.
+    riego = (json_data.get("riego") or {}).get("Riego")
+    pares = evaluar_pares(json_data.get("clima", {}), json_data.get("plantas", {}), riego, marca.hour)
+    for zona, especie, estres, rendimiento, eficiencia, necesidad, ajuste, problema in pares:
+        # Insertar resultados
+        resultados = (estres, rendimiento, eficiencia, necesidad, ajuste)
+        if evaluador.debe_escribir(zona, especie, resultados, marca):
+            filas.append(("resultados_funciones", (zona, especie, *resultados, marca)))
+
+        # Si hay un problema (string), insertar; si es None, no hacer nada
+        if problema is not None:
+            filas.append(("alertas_criticas", (
+                zona,
+                especie,
+                problema,
+                marca
+            )))
+
+    return filas
+
+
+def mantener_bd() -> tuple:
+    """Mantenimiento de particiones y purga de los rollups por minuto antiguos."""
+    cnx = db.conectar()
+    try:
+        resumen = particiones.mantener_particiones(cnx, db.CONFIG["database"], DIAS_RETENCION)
+        cursor = cnx.cursor()
+        purgados = rollups.purgar_minutos(cursor)
+        cnx.commit()
+        cursor.close()
+        return resumen, purgados
+    finally:
+        cnx.close()
+
+
+async def tarea_mantenimiento():
+    """Ejecuta ``mantener_bd`` periódicamente fuera del bucle de eventos."""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            resumen, purgados = await loop.run_in_executor(None, mantener_bd)
+            for tabla, cambios in resumen.items():
+                print(f"Particiones de {tabla}: creadas {cambios['creadas']}, eliminadas {cambios['eliminadas']}")
+            if purgados:
+                print(f"Rollups por minuto purgados: {purgados}")
+        except mysql.connector.Error as err:
+            print(f"Error en el mantenimiento de la base de datos: {err}")
+        await asyncio.sleep(INTERVALO_MANTENIMIENTO)
+
+
+# Errores de un mensaje mal formado: se descarta ese mensaje y la conexión sigue.
+ERRORES_MENSAJE = (ValueError, TypeError, AttributeError, KeyError, IndexError, struct.error, zlib.error)
+
+
 async def handle_client(reader, writer):
     addr = writer.get_extra_info('peername')
     print(f"Conexión desde {addr}")
+    # Solo si el cliente las negocia: cada payload se confirma cuando sus
+    # filas están en la base de datos (ver protocolo.Confirmaciones).
+    confirmaciones = None
 
-    while True:
-        data = await reader.read(4096)
-        if not data:
-            break
-        message = data.decode()
-        try:
-            json_data = json.loads(message)
-            print("----- JSON recibido -----")
-            print(json.dumps(json_data, indent=2))
-            print("-------------------------\n")
-
-            # ---- Inserción de datos crudos ----
-            for zona, values in json_data.get("clima", {}).items():
-                db.insertar_clima(
-                    zona,
-                    values.get("Temperatura"),
-                    values.get("Humedad"),
-                    values.get("CO2"),
-                    values.get("IntensidadLuz"),
-                    values.get("Presion", 1013)  # Valor por defecto si no existe
-                )
+    try:
+        # Un mensaje por trama, aunque TCP parta o junte los envíos.
+        async for data in protocolo.iterar_mensajes(reader):
+            try:
+                json_data = codificacion.decodificar(data)
+                if not isinstance(json_data, dict):
+                    raise ValueError("el mensaje no es un objeto JSON")
 
-            for especie, values in json_data.get("plantas", {}).items():
-                db.insertar_planta(
-                    especie,
-                    values.get("Crecimiento"),
-                    values.get("CantidadFrutos"),
-                    values.get("CalidadFrutos"),
-                    values.get("NivelSalud")
-                )
+                if "negociacion" in json_data:
+                    acuerdo = codificacion.responder_negociacion(json_data["negociacion"])
+                    await protocolo.enviar_trama(writer, json.dumps(acuerdo).encode())
+                    if acuerdo["confirmaciones"]:
+                        confirmaciones = protocolo.Confirmaciones(writer)
+                    print(f"Codificación acordada con {addr}: {acuerdo}")
+                    continue
 
-            for riego_name, values in json_data.get("riego", {}).items():
-                db.insertar_riego(
-                    values.get("pH"),
-                    values.get("Conductividad"),
-                    values.get("Flujo"),
-                    values.get("NivelDeposito"),
-                    values.get("CaudalHistorico")
+                parcial = f" (parcial, faltan {json_data.get('faltantes')})" if json_data.get("parcial") else ""
+                print(
+                    f"Payload recibido ({len(data)} bytes): "
+                    f"{len(json_data.get('clima', {}))} zonas, "
+                    f"{len(json_data.get('plantas', {}))} especies{parcial}"
                 )
+                filas = procesar_payload(json_data)
+            except ERRORES_MENSAJE as exc:
+                print(f"Mensaje recibido no válido ({len(data)} bytes): {exc!r}")
+                if confirmaciones is not None:
+                    # Reenviarlo no lo arreglaría: se confirma para no bloquear al cliente.
+                    confirmaciones.registrar()()
+                continue
 
-            # ---- Procesamiento de algoritmos ----
-            hora_actual = datetime.now().hour
-            for zona, clima in json_data.get("clima", {}).items():
-                for especie, planta in json_data.get("plantas", {}).items():
-                    # Índice de estrés
-                    estres = algoritmos.indice_estres(
-                        clima.get("Temperatura"),
-                        clima.get("Humedad"),
-                        clima.get("CO2"),
-                        planta.get("NivelSalud")
-                    )
-                    # Rendimiento de frutos
-                    rendimiento = algoritmos.rendimiento_frutos(
-                        planta.get("CantidadFrutos"),
-                        planta.get("CalidadFrutos"),
-                        planta.get("Crecimiento")
-                    )
-                    # Eficiencia de luz
-                    eficiencia = algoritmos.eficiencia_luz(
-                        clima.get("IntensidadLuz"),
-                        hora_actual,
-                        planta.get("Crecimiento")
-                    )
-                    # Necesidad de riego
-                    necesidad = algoritmos.necesidad_riego(
-                        json_data["riego"]["Riego"].get("NivelDeposito"),
-                        json_data["riego"]["Riego"].get("Flujo"),
-                        clima.get("Temperatura"),
-                        clima.get("Humedad")
-                    )
-                    # Ajuste nutrición
-                    ajuste = algoritmos.ajuste_nutricion(
-                        planta.get("NivelSalud"),
-                        json_data["riego"]["Riego"].get("pH"),
-                        json_data["riego"]["Riego"].get("Conductividad")
-                    )
-
-                    # Insertar resultados
-                    db.insertar_resultado_funcion(
-                        zona,
-                        especie,
-                        estres,
-                        rendimiento,
-                        eficiencia,
-                        necesidad,
-                        ajuste
-                    )
-
-                    # ---- Alertas críticas ----
-                    problema = algoritmos.alerta_critica(
-                        clima.get("Temperatura"),
-                        clima.get("CO2"),
-                        planta.get("NivelSalud"),
-                        clima.get("IntensidadLuz")
-                    )
-
-                    # Si hay un problema (string), insertar; si es None, no hacer nada
-                    if problema is not None:
-                        db.insertar_alerta(
-                            zona,
-                            especie,
-                            problema
-                        )
-
-        except json.JSONDecodeError:
-            print("Mensaje recibido no es JSON:", message)
-
-    writer.close()
-    await writer.wait_closed()
-    print(f"Conexión cerrada {addr}")
+            # Solo se encola: la escritura ocurre en los hilos del escritor.
+            await escritor.encolar(filas, confirmaciones.registrar() if confirmaciones is not None else None)
+    except protocolo.ErrorProtocolo as exc:
+        print(f"Error de protocolo con {addr}: {exc}")
+    except ConnectionError as exc:
+        print(f"Conexión interrumpida con {addr}: {exc}")
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+        print(f"Conexión cerrada {addr}")
 
 
 async def main(shutdown_handler: GracefulShutdown | None = None):
@@ -190,9 +362,22 @@ async def main(shutdown_handler: GracefulShutdown | None = None):
     print(f"Middleware servidor escuchando en {addr}")
 
     shutdown_handler.register_server(server)
+    shutdown_handler.escritor.iniciar()
+    if PUBLICAR_EVENTOS:
+        try:
+            publicador.iniciar()
+        except OSError as exc:
+            # Sin publicador el dashboard sigue funcionando por sondeo.
+            print(f"No se pudo iniciar el publicador de eventos: {exc}")
+    mantenimiento = asyncio.create_task(tarea_mantenimiento())
 
-    async with server:
-        await server.serve_forever()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        mantenimiento.cancel()
+        await shutdown_handler.escritor.cerrar()
+        publicador.cerrar()
 
 
 if __name__ == "__main__":
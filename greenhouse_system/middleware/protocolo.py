@@ -0,0 +1,306 @@
+"""Framing del protocolo TCP entre ``middleware_cliente`` y ``middleware_servidor``.
+
+Cada mensaje viaja como una trama: una cabecera de 4 bytes (entero sin signo
+big-endian) con la longitud del cuerpo, seguida del cuerpo. Así el servidor
+procesa exactamente un mensaje por trama sea cual sea su tamaño, aunque TCP
+fragmente o junte varios envíos, y el cliente puede mantener una única
+conexión abierta para todos sus payloads.
+
+Por compatibilidad el servidor sigue aceptando el formato antiguo (un JSON
+sin cabecera por conexión): una trama válida nunca empieza por ``{`` porque
+eso supondría una longitud muy superior a ``MAX_TRAMA``.
+
+Si se negocian confirmaciones, el servidor numera los payloads de cada
+conexión (1, 2, 3...) y responde con tramas ``{"confirmado": n}`` cuando los
+payloads hasta ``n`` están confirmados en la base de datos. Solo entonces el
+cliente los da por entregados.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import struct
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Set
+
+from greenhouse_system.middleware import codificacion
+
+CABECERA = struct.Struct(">I")
+# Límite de seguridad: una cabecera corrupta no debe provocar reservas enormes.
+MAX_TRAMA = 16 * 1024 * 1024
+# Segundos que el cliente espera la respuesta a la negociación; un servidor
+# antiguo no responde y se continúa en JSON.
+TIMEOUT_NEGOCIACION = 2.0
+# Tras un intento de conexión fallido no se vuelve a intentar hasta pasado este
+# tiempo; mientras tanto los envíos fallan de inmediato.
+REINTENTO_MINIMO = 2.0
+
+
+class ErrorProtocolo(Exception):
+    """Trama mal formada o que supera ``MAX_TRAMA``."""
+
+
+def construir_trama(cuerpo: bytes) -> bytes:
+    if len(cuerpo) > MAX_TRAMA:
+        raise ErrorProtocolo(f"Mensaje de {len(cuerpo)} bytes supera el máximo de {MAX_TRAMA}")
+    return CABECERA.pack(len(cuerpo)) + cuerpo
+
+
+async def enviar_trama(writer: asyncio.StreamWriter, cuerpo: bytes) -> None:
+    writer.write(construir_trama(cuerpo))
+    await writer.drain()
+
+
+async def leer_trama(reader: asyncio.StreamReader, inicio: bytes = b"") -> bytes | None:
+    """Lee una trama completa. Devuelve ``None`` si la conexión se cerró limpiamente."""
+    try:
+        cabecera = inicio + await reader.readexactly(CABECERA.size - len(inicio))
+    except asyncio.IncompleteReadError as exc:
+        if not inicio and not exc.partial:
+            return None
+        raise ErrorProtocolo("Conexión cerrada en mitad de una cabecera") from exc
+
+    (longitud,) = CABECERA.unpack(cabecera)
+    if longitud > MAX_TRAMA:
+        raise ErrorProtocolo(f"Trama de {longitud} bytes supera el máximo de {MAX_TRAMA}")
+    try:
+        return await reader.readexactly(longitud)
+    except asyncio.IncompleteReadError as exc:
+        raise ErrorProtocolo(
+            f"Conexión cerrada tras {len(exc.partial)} de {longitud} bytes"
+        ) from exc
+
+
+async def iterar_mensajes(reader: asyncio.StreamReader) -> AsyncIterator[bytes]:
+    """Genera el cuerpo de cada mensaje recibido en la conexión.
+
+    Detecta el modo a partir del primer byte: tramas con longitud o el JSON
+    sin cabecera de los clientes antiguos. En este último caso se lee hasta el
+    cierre y se separan los objetos JSON concatenados.
+    """
+    primero = await reader.read(1)
+    if not primero:
+        return
+
+    if primero == b"{":
+        # Bytes no UTF-8 se sustituyen: el mensaje afectado no será JSON válido
+        # y el servidor lo descartará sin cerrar la conexión.
+        datos = (primero + await reader.read()).decode(errors="replace")
+        decoder = json.JSONDecoder()
+        posicion = 0
+        while posicion < len(datos):
+            try:
+                _, fin = decoder.raw_decode(datos, posicion)
+            except json.JSONDecodeError:
+                # Se entrega el resto tal cual para que el servidor lo registre.
+                yield datos[posicion:].encode()
+                return
+            yield datos[posicion:fin].encode()
+            posicion = fin
+            while posicion < len(datos) and datos[posicion].isspace():
+                posicion += 1
+        return
+
+    trama = await leer_trama(reader, primero)
+    while trama is not None:
+        yield trama
+        trama = await leer_trama(reader)
+
+
+class Confirmaciones:
+    """Lado servidor: numera los payloads de una conexión y confirma en orden.
+
+    ``registrar`` devuelve la función que hay que llamar cuando las filas del
+    payload estén en la base de datos. Los lotes pueden terminar en otro orden
+    (varios hilos de escritura), así que solo se envía el mayor número hasta el
+    que todos los payloads están listos.
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        self._writer = writer
+        self.recibidos = 0
+        self.confirmado = 0
+        self._listos: Set[int] = set()
+
+    def registrar(self) -> Callable[[], None]:
+        self.recibidos += 1
+        numero = self.recibidos
+        return lambda: self._listo(numero)
+
+    def _listo(self, numero: int) -> None:
+        self._listos.add(numero)
+        avance = self.confirmado
+        while avance + 1 in self._listos:
+            avance += 1
+            self._listos.remove(avance)
+        if avance > self.confirmado:
+            self.confirmado = avance
+            if not self._writer.is_closing():
+                self._writer.write(construir_trama(json.dumps({"confirmado": avance}).encode()))
+
+
+class ConexionMiddleware:
+    """Conexión TCP persistente del cliente hacia el middleware servidor.
+
+    Al conectar negocia la codificación de los payloads (ver ``codificacion``)
+    a partir de ``formatos`` y ``compresion``, en orden de preferencia. Si el
+    servidor no acepta la conexión, los envíos fallan con ``ConnectionError``
+    sin reintentar durante ``reintento_minimo`` segundos.
+
+    Con ``confirmaciones`` se piden al servidor las confirmaciones de escritura.
+    Si las acepta, ``enviados`` cuenta los payloads enviados por la conexión
+    actual (``sesion``) y ``confirmado`` el último confirmado; ambos vuelven a
+    cero al reconectar.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        formatos: Iterable[str] = ("json",),
+        compresion: Iterable[str] = (),
+        reintento_minimo: float = REINTENTO_MINIMO,
+        confirmaciones: bool = False,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.formatos = list(formatos)
+        self.compresiones = list(compresion)
+        self.formato = "json"
+        self.compresion: str | None = None
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self.reintento_minimo = reintento_minimo
+        self._proximo_intento = 0.0
+        self.pedir_confirmaciones = confirmaciones
+        self.confirmaciones = False
+        self.sesion = 0
+        self.enviados = 0
+        self.confirmado = 0
+        self._confirmacion = asyncio.Event()
+        self._lector: asyncio.Task | None = None
+
+    @property
+    def conectada(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def enviar(self, cuerpo: bytes) -> None:
+        """Envía un mensaje ya codificado, abriendo la conexión si aún no existe.
+
+        Ante un error de red se cierra la conexión y se propaga la excepción;
+        el siguiente envío intentará reconectar.
+        """
+        if not self.conectada:
+            await self._conectar()
+        try:
+            await enviar_trama(self._writer, cuerpo)
+        except (ConnectionError, OSError):
+            await self.cerrar()
+            raise
+        self.enviados += 1
+
+    async def enviar_payload(self, payload: Dict[str, Any]) -> int:
+        """Codifica ``payload`` con el formato negociado y lo envía. Devuelve los bytes enviados."""
+        if not self.conectada:
+            await self._conectar()
+        cuerpo = codificacion.codificar(payload, self.formato, self.compresion)
+        await self.enviar(cuerpo)
+        return len(cuerpo)
+
+    async def enviar_payloads(self, payloads: List[Dict[str, Any]]) -> int:
+        """Envía varios payloads seguidos con un único ``drain``. Devuelve los bytes enviados."""
+        if not self.conectada:
+            await self._conectar()
+        tramas = [
+            construir_trama(codificacion.codificar(payload, self.formato, self.compresion))
+            for payload in payloads
+        ]
+        try:
+            self._writer.writelines(tramas)
+            await self._writer.drain()
+        except (ConnectionError, OSError):
+            await self.cerrar()
+            raise
+        self.enviados += len(tramas)
+        return sum(len(trama) for trama in tramas)
+
+    async def esperar_confirmacion(self, numero: int, timeout: float) -> None:
+        """Espera a que el servidor confirme los payloads hasta ``numero``.
+
+        Si la conexión se cierra o la confirmación no llega en ``timeout``
+        segundos se cierra la conexión y se lanza ``ConnectionError``.
+        """
+        fin = time.monotonic() + timeout
+        while True:
+            self._confirmacion.clear()
+            if self.confirmado >= numero:
+                return
+            restante = fin - time.monotonic()
+            if not self.conectada or restante <= 0:
+                await self.cerrar()
+                raise ConnectionError(f"El servidor no confirmó los payloads hasta el {numero}")
+            try:
+                await asyncio.wait_for(self._confirmacion.wait(), restante)
+            except asyncio.TimeoutError:
+                pass
+
+    async def cerrar(self) -> None:
+        if self._writer is None:
+            return
+        writer, self._writer = self._writer, None
+        self._reader = None
+        if self._lector is not None and self._lector is not asyncio.current_task():
+            self._lector.cancel()
+        self._lector = None
+        self._confirmacion.set()
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+    async def _conectar(self) -> None:
+        if time.monotonic() < self._proximo_intento:
+            raise ConnectionRefusedError(f"{self.host}:{self.port} no disponible; se reintentará más tarde")
+        try:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        except OSError:
+            self._proximo_intento = time.monotonic() + self.reintento_minimo
+            raise
+        self.formato, self.compresion, self.confirmaciones = "json", None, False
+        self.sesion += 1
+        self.enviados = self.confirmado = 0
+        if self.formatos == ["json"] and not self.compresiones and not self.pedir_confirmaciones:
+            return
+        try:
+            await enviar_trama(
+                self._writer,
+                codificacion.mensaje_negociacion(self.formatos, self.compresiones, self.pedir_confirmaciones),
+            )
+            respuesta = await asyncio.wait_for(leer_trama(self._reader), TIMEOUT_NEGOCIACION)
+        except asyncio.TimeoutError:
+            return
+        except (ConnectionError, OSError, ErrorProtocolo):
+            await self.cerrar()
+            raise
+        if respuesta:
+            acuerdo = json.loads(respuesta)
+            self.formato = acuerdo.get("formato", "json")
+            self.compresion = acuerdo.get("compresion")
+            self.confirmaciones = bool(acuerdo.get("confirmaciones"))
+        if self.confirmaciones:
+            self._lector = asyncio.create_task(self._leer_confirmaciones(self._reader, self._writer))
+
+    async def _leer_confirmaciones(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                trama = await leer_trama(reader)
+                if trama is None:
+                    break
+                self.confirmado = max(self.confirmado, int(json.loads(trama).get("confirmado", 0)))
+                self._confirmacion.set()
+        except (ConnectionError, OSError, ErrorProtocolo, ValueError, TypeError, AttributeError):
+            pass
+        # El servidor ha cerrado: el próximo envío reconectará.
+        writer.close()
+        self._confirmacion.set()
@@ -0,0 +1,101 @@
+"""Publicación de las inserciones del middleware hacia los procesos del dashboard.
+
+Cada lote escrito en MySQL se anuncia a los suscriptores conectados por TCP
+(una línea JSON por evento) con las tablas y el número de filas nuevas. El
+dashboard (ver dashboard/eventos.py) se suscribe y avisa a los navegadores,
+que solo vuelven a consultar cuando hay datos nuevos.
+
+Es el middleware quien escucha: así pueden suscribirse a la vez varios
+procesos del dashboard (varios workers) y cualquiera puede reiniciarse sin
+afectar a los demás. Un suscriptor que no lee a tiempo se desconecta; la
+escritura en la base de datos nunca espera al dashboard.
+"""
+from __future__ import annotations
+
+import json
+import socket
+import threading
+from datetime import datetime
+from typing import Dict, List, Sequence
+
+HOST = "127.0.0.1"
+PORT = 5001
+# Tiempo máximo que un envío puede bloquear al hilo de escritura.
+TIMEOUT_ENVIO = 0.5
+
+
+class Publicador:
+    """Servidor TCP que difunde un evento JSON por línea a todos sus suscriptores."""
+
+    def __init__(self, host: str = HOST, port: int = PORT) -> None:
+        self.host = host
+        self.port = port
+        self._suscriptores: List[socket.socket] = []
+        self._lock = threading.Lock()
+        self._servidor: socket.socket | None = None
+        self.publicados = 0
+
+    @property
+    def suscriptores(self) -> int:
+        return len(self._suscriptores)
+
+    def iniciar(self) -> None:
+        """Empieza a aceptar suscriptores en un hilo aparte."""
+        if self._servidor is not None:
+            return
+        servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        servidor.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        servidor.bind((self.host, self.port))
+        servidor.listen()
+        self._servidor = servidor
+        threading.Thread(target=self._aceptar, name="publicador", daemon=True).start()
+        print(f"Publicador de eventos escuchando en {(self.host, self.port)}")
+
+    def cerrar(self) -> None:
+        servidor, self._servidor = self._servidor, None
+        if servidor is not None:
+            # ``shutdown`` despierta al hilo bloqueado en ``accept``.
+            try:
+                servidor.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            servidor.close()
+        with self._lock:
+            suscriptores, self._suscriptores = self._suscriptores, []
+        for conexion in suscriptores:
+            conexion.close()
+
+    def publicar(self, evento: Dict) -> None:
+        """Envía ``evento`` a todos los suscriptores; los que fallan se descartan."""
+        if not self._suscriptores:
+            return
+        linea = (json.dumps(evento, default=str) + "\n").encode("utf-8")
+        with self._lock:
+            caidos = []
+            for conexion in self._suscriptores:
+                try:
+                    conexion.sendall(linea)
+                except OSError:
+                    caidos.append(conexion)
+            for conexion in caidos:
+                self._suscriptores.remove(conexion)
+                conexion.close()
+            self.publicados += 1
+
+    def publicar_lote(self, filas_por_tabla: Dict[str, Sequence[tuple]]) -> None:
+        """Anuncia un lote ya confirmado en la base de datos."""
+        tablas = {tabla: len(filas) for tabla, filas in filas_por_tabla.items() if filas}
+        if tablas:
+            self.publicar({"tablas": tablas, "momento": datetime.now().isoformat()})
+
+    def _aceptar(self) -> None:
+        servidor = self._servidor
+        while servidor is not None and servidor is self._servidor:
+            try:
+                conexion, direccion = servidor.accept()
+            except OSError:
+                return
+            conexion.settimeout(TIMEOUT_ENVIO)
+            with self._lock:
+                self._suscriptores.append(conexion)
+            print(f"Dashboard suscrito a los eventos desde {direccion}")
@@ -0,0 +1,279 @@
+"""Spool en disco para los payloads que no se pueden entregar al middleware servidor.
+
+Mientras el servidor no está disponible, ``middleware_cliente`` añade cada
+payload al final del spool en lugar de perderlo; al reconectar lo vacía en
+lotes grandes y en el mismo orden en que se generaron. Cada payload conserva
+su ``timestamp`` original, de modo que las filas se guardan con la hora de la
+muestra y no con la de la entrega.
+
+Formato en disco (directorio ``directorio``):
+
+* ``segmento_<n>.log``: registros ``longitud (u32) + crc32 (u32) + JSON``
+  añadidos al final. Al superar ``tamano_segmento`` se abre el siguiente.
+* ``indice.json``: posición ``(segmento, offset)`` del primer registro aún no
+  confirmado. Se reescribe de forma atómica tras cada confirmación.
+
+Los payloads que se enviaron pero el servidor no confirmó se devuelven con
+``reinsertar``, que los coloca en cabeza (en un segmento con número menor que el
+del cursor) para que se reenvíen antes que las muestras posteriores.
+
+Si el spool supera ``tamano_maximo`` se descarta el segmento más antiguo
+completo (se pierden las muestras más viejas, nunca las recientes). Un
+registro truncado por una caída a mitad de escritura se detecta por longitud
+o CRC y se recorta al arrancar.
+
+``confirmar`` solo debe llamarse cuando el servidor ha confirmado el lote (ver
+las confirmaciones en ``protocolo``): que ``drain`` termine solo significa que
+los bytes están en el buffer del socket local. Así la entrega es "al menos una
+vez": si la conexión cae o el servidor se reinicia antes de la confirmación,
+el lote sigue en el spool y se reenvía, y puede llegar duplicado.
+"""
+from __future__ import annotations
+
+import json
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, NamedTuple, Optional, Tuple
+
+_REGISTRO = struct.Struct(">II")
+_PREFIJO = "segmento_"
+_SUFIJO = ".log"
+_INDICE = "indice.json"
+
+TAMANO_SEGMENTO = 1024 * 1024
+TAMANO_MAXIMO = 64 * 1024 * 1024
+
+
+class Lote(NamedTuple):
+    """Payloads leídos del spool y posición hasta la que llegan."""
+
+    payloads: List[Dict[str, Any]]
+    posicion: Tuple[int, int]
+
+
+class SpoolLocal:
+    """Cola FIFO persistente de payloads, en segmentos de solo-añadir."""
+
+    def __init__(
+        self,
+        directorio: str | Path,
+        tamano_segmento: int = TAMANO_SEGMENTO,
+        tamano_maximo: int = TAMANO_MAXIMO,
+        sincronizar: bool = False,
+    ) -> None:
+        self.directorio = Path(directorio)
+        self.tamano_segmento = tamano_segmento
+        self.tamano_maximo = tamano_maximo
+        # Con ``sincronizar`` cada registro se lleva al disco con fsync (sobrevive
+        # a un corte de luz, no solo a la caída del proceso).
+        self.sincronizar = sincronizar
+        self.escritos = 0
+        self.entregados = 0
+        self.descartados = 0
+        self.directorio.mkdir(parents=True, exist_ok=True)
+
+        self._tamanos: Dict[int, int] = {}
+        for ruta in self.directorio.glob(f"{_PREFIJO}*{_SUFIJO}"):
+            numero = int(ruta.name[len(_PREFIJO):-len(_SUFIJO)])
+            self._tamanos[numero] = ruta.stat().st_size
+        self._cursor = self._cargar_indice()
+        self._eliminar_anteriores(self._cursor[0])
+        if self._tamanos:
+            self._recortar_cola(max(self._tamanos))
+        self._pendientes = sum(self._contar(numero) for numero in self._tamanos)
+        self._escritura: Optional[BinaryIO] = None
+
+    @property
+    def pendientes(self) -> int:
+        return self._pendientes
+
+    @property
+    def tamano_bytes(self) -> int:
+        return sum(self._tamanos.values())
+
+    def __len__(self) -> int:
+        return self._pendientes
+
+    def agregar(self, payload: Dict[str, Any]) -> None:
+        """Añade un payload al final del spool."""
+        cuerpo = json.dumps(payload, separators=(",", ":")).encode()
+        registro = _REGISTRO.pack(len(cuerpo), zlib.crc32(cuerpo)) + cuerpo
+
+        numero = max(self._tamanos) if self._tamanos else self._cursor[0]
+        if self._tamanos.get(numero, 0) and self._tamanos[numero] + len(registro) > self.tamano_segmento:
+            numero += 1
+        archivo = self._archivo_escritura(numero)
+        archivo.write(registro)
+        archivo.flush()
+        if self.sincronizar:
+            os.fsync(archivo.fileno())
+        self._tamanos[numero] = self._tamanos.get(numero, 0) + len(registro)
+        self._pendientes += 1
+        self.escritos += 1
+
+        while self.tamano_bytes > self.tamano_maximo and len(self._tamanos) > 1:
+            self._descartar_mas_antiguo()
+
+    def reinsertar(self, payloads: List[Dict[str, Any]]) -> None:
+        """Devuelve ``payloads`` a la cabeza del spool, por delante de los pendientes.
+
+        Lo que queda del segmento del cursor se copia detrás de ellos en el
+        segmento nuevo, de modo que la lectura sigue empezando en el offset 0.
+        """
+        if not payloads:
+            return
+        numero, offset = self._cursor
+        registros = []
+        for payload in payloads:
+            cuerpo = json.dumps(payload, separators=(",", ":")).encode()
+            registros.append(_REGISTRO.pack(len(cuerpo), zlib.crc32(cuerpo)) + cuerpo)
+        if numero in self._tamanos:
+            # El archivo de escritura puede ser el del cursor, que se sustituye.
+            self._cerrar_escritura()
+            with open(self._ruta(numero), "rb") as archivo:
+                archivo.seek(offset)
+                registros.append(archivo.read())
+
+        cabeza = numero - 1
+        temporal = self._ruta(cabeza).with_suffix(".tmp")
+        with open(temporal, "wb") as archivo:
+            archivo.write(b"".join(registros))
+            archivo.flush()
+            if self.sincronizar:
+                os.fsync(archivo.fileno())
+        os.replace(temporal, self._ruta(cabeza))
+        self._tamanos[cabeza] = self._ruta(cabeza).stat().st_size
+        self._cursor = (cabeza, 0)
+        self._guardar_indice()
+        # Si se cae antes de borrar el segmento antiguo, al arrancar se reenvía
+        # su parte ya confirmada: duplicados, nunca pérdidas.
+        if numero in self._tamanos:
+            self._ruta(numero).unlink(missing_ok=True)
+            del self._tamanos[numero]
+        self._pendientes += len(payloads)
+        self.escritos += len(payloads)
+
+    def leer_lote(self, maximo: int) -> Lote:
+        """Lee hasta ``maximo`` payloads desde el cursor, sin confirmarlos."""
+        payloads: List[Dict[str, Any]] = []
+        numero, offset = self._cursor
+        for segmento in sorted(n for n in self._tamanos if n >= numero):
+            if segmento != numero:
+                numero, offset = segmento, 0
+            with open(self._ruta(segmento), "rb") as archivo:
+                archivo.seek(offset)
+                while len(payloads) < maximo:
+                    cuerpo = self._leer_registro(archivo)
+                    if cuerpo is None:
+                        break
+                    payloads.append(json.loads(cuerpo))
+                    offset = archivo.tell()
+            if len(payloads) >= maximo:
+                break
+        return Lote(payloads, (numero, offset))
+
+    def confirmar(self, lote: Lote) -> None:
+        """Marca como entregados los payloads de ``lote`` y libera segmentos leídos."""
+        if not lote.payloads:
+            return
+        self._cursor = lote.posicion
+        self._pendientes -= len(lote.payloads)
+        self.entregados += len(lote.payloads)
+        self._eliminar_anteriores(self._cursor[0])
+        if not self._pendientes:
+            # Spool vacío: se empieza un segmento nuevo en lugar de seguir
+            # creciendo el actual.
+            self._cerrar_escritura()
+            self._eliminar_anteriores(self._cursor[0] + 1)
+            self._cursor = (self._cursor[0] + 1, 0)
+        self._guardar_indice()
+
+    def cerrar(self) -> None:
+        self._cerrar_escritura()
+        self._guardar_indice()
+
+    # ---- utilidades internas ----
+
+    def _ruta(self, numero: int) -> Path:
+        return self.directorio / f"{_PREFIJO}{numero:08d}{_SUFIJO}"
+
+    def _archivo_escritura(self, numero: int) -> BinaryIO:
+        if self._escritura is not None and self._escritura.name != str(self._ruta(numero)):
+            self._cerrar_escritura()
+        if self._escritura is None:
+            self._escritura = open(self._ruta(numero), "ab")
+        return self._escritura
+
+    def _cerrar_escritura(self) -> None:
+        if self._escritura is not None:
+            self._escritura.close()
+            self._escritura = None
+
+    @staticmethod
+    def _leer_registro(archivo: BinaryIO) -> Optional[bytes]:
+        """Devuelve el siguiente cuerpo válido o ``None`` al llegar al final o a un registro roto."""
+        cabecera = archivo.read(_REGISTRO.size)
+        if len(cabecera) < _REGISTRO.size:
+            return None
+        longitud, crc = _REGISTRO.unpack(cabecera)
+        cuerpo = archivo.read(longitud)
+        if len(cuerpo) < longitud or zlib.crc32(cuerpo) != crc:
+            return None
+        return cuerpo
+
+    def _contar(self, numero: int) -> int:
+        """Registros sin confirmar del segmento ``numero``."""
+        total = 0
+        with open(self._ruta(numero), "rb") as archivo:
+            if numero == self._cursor[0]:
+                archivo.seek(self._cursor[1])
+            while self._leer_registro(archivo) is not None:
+                total += 1
+        return total
+
+    def _recortar_cola(self, numero: int) -> None:
+        """Elimina un registro incompleto al final del último segmento."""
+        with open(self._ruta(numero), "rb") as archivo:
+            valido = 0
+            while self._leer_registro(archivo) is not None:
+                valido = archivo.tell()
+        if valido < self._tamanos[numero]:
+            os.truncate(self._ruta(numero), valido)
+            self._tamanos[numero] = valido
+
+    def _descartar_mas_antiguo(self) -> None:
+        numero = min(self._tamanos)
+        perdidos = self._contar(numero)
+        self._ruta(numero).unlink(missing_ok=True)
+        del self._tamanos[numero]
+        self._pendientes -= perdidos
+        self.descartados += perdidos
+        if self._cursor[0] <= numero:
+            self._cursor = (min(self._tamanos), 0)
+            self._guardar_indice()
+        print(f"[AVISO] Spool lleno: descartadas {perdidos} muestras antiguas")
+
+    def _eliminar_anteriores(self, numero: int) -> None:
+        for anterior in [n for n in self._tamanos if n < numero]:
+            self._ruta(anterior).unlink(missing_ok=True)
+            del self._tamanos[anterior]
+
+    def _cargar_indice(self) -> Tuple[int, int]:
+        try:
+            indice = json.loads((self.directorio / _INDICE).read_text())
+            cursor = (int(indice["segmento"]), int(indice["offset"]))
+        except (OSError, ValueError, KeyError, TypeError):
+            cursor = (min(self._tamanos) if self._tamanos else 0, 0)
+        if self._tamanos and cursor[0] not in self._tamanos:
+            # El segmento del cursor ya no existe: se sigue por el primero que quede.
+            siguientes = [n for n in self._tamanos if n > cursor[0]]
+            cursor = (min(siguientes), 0) if siguientes else (cursor[0], 0)
+        return cursor
+
+    def _guardar_indice(self) -> None:
+        ruta = self.directorio / _INDICE
+        temporal = ruta.with_suffix(".tmp")
+        temporal.write_text(json.dumps({"segmento": self._cursor[0], "offset": self._cursor[1]}))
+        os.replace(temporal, ruta)